@@ -1,29 +1,111 @@
 import http.client
 import ssl
+import time
 from json import loads
+from queue import Empty, LifoQueue
+from threading import Lock
 from typing import List
 from urllib.parse import urlencode
 
 
 class HTTPRequests(object):
-    def __init__(self, web_address: str):
-        self._conn = http.client.HTTPSConnection(
-            web_address,
-            context=ssl._create_unverified_context())
+    def __init__(self, web_address: str, use_https: bool = True,
+                 timeout: float = None):
+        if use_https:
+            self._conn = http.client.HTTPSConnection(
+                web_address, timeout=timeout,
+                context=ssl._create_unverified_context())
+        else:
+            self._conn = http.client.HTTPConnection(web_address,
+                                                    timeout=timeout)
 
     def get_request(self, params: str = "") -> bytes:
         endpoint = f"/get?{params}" if params else "/get"
-        self._conn.request("GET", endpoint)
-        response = self._conn.getresponse()
+        try:
+            self._conn.request("GET", endpoint)
+            response = self._conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            # the next request starts on a new connection
+            self._conn.close()
+            raise
         if response.status != 200:
             raise RuntimeError(
                 f"ErrorCode: {response.status} {response.reason}")
-        return response.read()
+        return data
+
+    def close(self):
+        self._conn.close()
+
+
+# Thread safe HTTPRequests: a request takes an idle connection or opens a
+# new one while less than max_connections are open, and waits for an idle
+# connection otherwise. Requests are started at most requests_per_second
+# times a second, 0 does not limit them.
+class HTTPConnectionPool(object):
+    def __init__(self, web_address: str, use_https: bool = True,
+                 timeout: float = None, max_connections: int = 1,
+                 requests_per_second: float = 0):
+        if max_connections < 1:
+            raise RuntimeError("max_connections must be positive")
+        self._web_address = web_address
+        self._use_https = use_https
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._request_interval = 1 / requests_per_second \
+            if requests_per_second > 0 else 0
+        self._idle: LifoQueue = LifoQueue()
+        self._n_connections = 0
+        self._next_request_time = 0.0
+        self._lock = Lock()
+
+    def get_request(self, params: str = "") -> bytes:
+        self.__wait_rate_limit()
+        conn = self.__acquire()
+        try:
+            return conn.get_request(params)
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+
+    def __acquire(self) -> HTTPRequests:
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            is_new = self._n_connections < self._max_connections
+            if is_new:
+                self._n_connections += 1
+        if is_new:
+            return HTTPRequests(self._web_address, self._use_https,
+                                self._timeout)
+        return self._idle.get()
+
+    def __wait_rate_limit(self):
+        if not self._request_interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_time)
+            self._next_request_time = request_time + self._request_interval
+        if request_time > now:
+            time.sleep(request_time - now)
 
 
 class FishTextWebsiteHttpRequest(object):
-    def __init__(self):
-        self._website_requests = HTTPRequests("fish-text.ru")
+    def __init__(self, web_address: str = "fish-text.ru",
+                 use_https: bool = True, timeout: float = None,
+                 max_connections: int = 1, requests_per_second: float = 0):
+        self._website_requests = HTTPConnectionPool(
+            web_address, use_https, timeout, max_connections,
+            requests_per_second)
 
     def request_sentences(self, count: int) -> List[str]:
         return self._request_text("sentence", count)
@@ -43,6 +125,9 @@ class FishTextWebsiteHttpRequest(object):
         separator = ". " if text_type == "sentence" else "\\n\\n"
         return text.split(sep=separator)
 
+    def close(self):
+        self._website_requests.close()
+
     def _make_request(self, params: str) -> str:
         response = self._website_requests.get_request(params)
         response_dict = loads(response.decode("utf-8"))
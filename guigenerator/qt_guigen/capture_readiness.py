@@ -0,0 +1,70 @@
+from typing import List, Tuple
+
+import PySide6.QtCore as QtC
+import PySide6.QtWidgets as QtW
+
+
+# Watches a top-level window and tells when layout, polish and paint have
+# settled, so the screenshot can be taken without waiting for fixed timers
+class RenderReadinessWatcher(QtC.QObject):
+    SETTLE_EVENT_TYPES = (QtC.QEvent.Paint, QtC.QEvent.UpdateRequest,
+                          QtC.QEvent.LayoutRequest, QtC.QEvent.Polish,
+                          QtC.QEvent.PolishRequest, QtC.QEvent.Resize,
+                          QtC.QEvent.Move, QtC.QEvent.Show)
+    STABLE_ROUNDS = 2
+    POLL_INTERVAL_MILLIS = 2
+
+    def __init__(self, window: QtW.QWidget):
+        super().__init__()
+        self._window = window
+        self._activity_count = 0
+        self._is_painted = False
+        QtW.QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, watched: QtC.QObject, event: QtC.QEvent) -> bool:
+        if event.type() in self.SETTLE_EVENT_TYPES \
+                and watched.isWidgetType() \
+                and watched.window() is self._window:
+            self._activity_count += 1
+            if event.type() == QtC.QEvent.Paint:
+                self._is_painted = True
+        return False
+
+    def wait_until_settled(self, timeout_millis: int) -> bool:
+        timer = QtC.QElapsedTimer()
+        timer.start()
+        stable_rounds = 0
+        last_snapshot = None
+        while timer.elapsed() < timeout_millis:
+            self._activity_count = 0
+            QtW.QApplication.sendPostedEvents()
+            QtW.QApplication.processEvents(QtC.QEventLoop.AllEvents,
+                                           self.POLL_INTERVAL_MILLIS)
+            snapshot = self._get_layout_snapshot()
+            if self._is_settled() and snapshot == last_snapshot:
+                stable_rounds += 1
+                if stable_rounds >= self.STABLE_ROUNDS:
+                    return True
+            else:
+                stable_rounds = 0
+            last_snapshot = snapshot
+            QtC.QThread.msleep(self.POLL_INTERVAL_MILLIS)
+        return False
+
+    def detach(self):
+        QtW.QApplication.instance().removeEventFilter(self)
+
+    def _is_settled(self) -> bool:
+        return self._is_painted and self._activity_count == 0 \
+               and self._window.isVisible() \
+               and self._window.updatesEnabled()
+
+    def _get_layout_snapshot(self) -> List[Tuple[int, int, int, int, bool]]:
+        widgets = [self._window] + self._window.findChildren(QtW.QWidget)
+        snapshot = []
+        for widget in widgets:
+            geometry = widget.geometry()
+            snapshot.append((geometry.x(), geometry.y(), geometry.width(),
+                             geometry.height(),
+                             widget.isVisible() and widget.updatesEnabled()))
+        return snapshot
@@ -0,0 +1,158 @@
+import json
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+class ColumnarFileFormat(Enum):
+    PARQUET = ".parquet"
+    ARROW = ".arrow"
+
+
+# Collects the rows of one table in memory and writes them in bulk as
+# <name>-NNNNN.parquet or .arrow part files of rows_per_part rows; the parts
+# of a directory read as one table, e.g. with pyarrow.dataset. The buffered
+# rows of part NNNNN are also appended to a <name>-NNNNN.rows.part spool
+# file, so a resumed run gets back the rows of the items it has recorded:
+# the writer state is the number of parts and the spool size. A spool is
+# removed only once a later item is recorded. pyarrow is needed only by
+# this writer and is imported when the first part is written.
+class ColumnarTableWriter:
+    SPOOL_SUFFIX = ".rows.part"
+
+    def __init__(self, dir_path: Path, name: str,
+                 columns: List[Tuple[str, str]],
+                 file_format: ColumnarFileFormat, rows_per_part: int):
+        if rows_per_part < 1:
+            raise RuntimeError("Number of rows per part must be positive")
+        self._dir_path = dir_path
+        self._name = name
+        # column names and pyarrow type names
+        self._columns = columns
+        self._file_format = file_format
+        self._rows_per_part = rows_per_part
+        self._part = 0
+        self._rows: List[List[Any]] = []
+        self._spool_file = None
+
+    @classmethod
+    def get_part_name(cls, name: str, part: int,
+                      file_format: ColumnarFileFormat) -> str:
+        return f"{name}-{part:05d}{file_format.value}"
+
+    def open(self, state: Dict[str, Any] = None):
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+        self._rows = []
+        if state is None:
+            self.remove_parts(self._dir_path, self._name, self._file_format)
+            self.__remove_spools()
+            self._part = 0
+            self._spool_file = open(self.__get_spool_path(self._part), "w",
+                                    encoding="utf-8")
+            return
+
+        self._part = state["parts"]
+        spool_path = self.__get_spool_path(self._part)
+        if not spool_path.exists():
+            raise RuntimeError(f"Can not resume, {spool_path} is missing")
+        for part_path in self.__get_part_paths(self._dir_path, self._name,
+                                               self._file_format):
+            if self.__get_part_number(part_path) >= self._part:
+                part_path.unlink()
+        self.__remove_spools(keep=spool_path)
+        with open(spool_path, "r+", encoding="utf-8") as spool_file:
+            spool_file.truncate(state["spool_size"])
+            self._rows = [json.loads(line) for line in spool_file]
+        self._spool_file = open(spool_path, "a", encoding="utf-8")
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"parts": self._part, "spool_size": self._spool_file.tell()}
+
+    def write_rows(self, rows: List[List[Any]]):
+        self._rows.extend(rows)
+        self._spool_file.write(''.join(json.dumps(row, ensure_ascii=False)
+                                       + '\n' for row in rows))
+        if len(self._rows) >= self._rows_per_part:
+            self.__write_part()
+
+    def flush(self):
+        self._spool_file.flush()
+
+    def close(self):
+        if self._rows:
+            self.__write_part()
+        self._spool_file.close()
+        self._spool_file = None
+        self.__remove_spools()
+
+    @classmethod
+    def remove_parts(cls, dir_path: Path, name: str,
+                     file_format: ColumnarFileFormat):
+        for part_path in cls.__get_part_paths(dir_path, name, file_format):
+            part_path.unlink()
+
+    @classmethod
+    def merge(cls, src_dir_paths: List[Path], dst_dir_path: Path, name: str,
+              file_format: ColumnarFileFormat):
+        # moves the parts of every directory, numbering them on in the
+        # order of src_dir_paths
+        dst_dir_path.mkdir(parents=True, exist_ok=True)
+        cls.remove_parts(dst_dir_path, name, file_format)
+        part = 0
+        for src_dir_path in src_dir_paths:
+            for part_path in cls.__get_part_paths(src_dir_path, name,
+                                                  file_format):
+                part_path.replace(dst_dir_path / cls.get_part_name(
+                    name, part, file_format))
+                part += 1
+
+    def __write_part(self):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError("Columnar export needs pyarrow, "
+                               "install it with 'pip install pyarrow'")
+
+        schema = pa.schema([(column, pa.type_for_alias(type_name))
+                            for column, type_name in self._columns])
+        table = pa.Table.from_pydict(
+            {column: [row[i] for row in self._rows]
+             for i, (column, _) in enumerate(self._columns)}, schema=schema)
+        part_path = self._dir_path / self.get_part_name(
+            self._name, self._part, self._file_format)
+        if self._file_format == ColumnarFileFormat.PARQUET:
+            import pyarrow.parquet as pq
+            pq.write_table(table, part_path)
+        else:
+            with pa.OSFile(str(part_path), "wb") as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    writer.write_table(table)
+
+        # an item writes at most one part, so the item recorded before
+        # this one has moved past the previous spool
+        self._part += 1
+        self._rows = []
+        self._spool_file.close()
+        self._spool_file = open(self.__get_spool_path(self._part), "w",
+                                encoding="utf-8")
+        if self._part >= 2:
+            self.__get_spool_path(self._part - 2).unlink(missing_ok=True)
+
+    def __get_spool_path(self, part: int) -> Path:
+        return self._dir_path \
+            / f"{self._name}-{part:05d}{self.SPOOL_SUFFIX}"
+
+    def __remove_spools(self, keep: Path = None):
+        for spool_path in self._dir_path.glob(
+                f"{self._name}-[0-9]*{self.SPOOL_SUFFIX}"):
+            if spool_path != keep:
+                spool_path.unlink()
+
+    @classmethod
+    def __get_part_number(cls, part_path: Path) -> int:
+        return int(part_path.stem.rsplit('-', 1)[1])
+
+    @classmethod
+    def __get_part_paths(cls, dir_path: Path, name: str,
+                         file_format: ColumnarFileFormat) -> List[Path]:
+        return sorted(dir_path.glob(f"{name}-[0-9]*{file_format.value}"))
@@ -0,0 +1,58 @@
+import csv
+import io
+from pathlib import Path
+from typing import Dict, List, Any, TextIO, Tuple
+
+from guigenerator.utils import Utils
+
+
+# Keeps the CSV files of an exporter open for the whole run and collects
+# their rows in memory. The rows of a file are written out with a single
+# write by flush(), which the exporter calls once per item when its state
+# is recorded in the run manifest, and by close(). The sizes of the files
+# are tracked, so taking them needs no stat calls.
+class CsvWriterSession:
+    def __init__(self, dir_path: Path, pattern: str, **format_params):
+        self._dir_path = dir_path
+        self._pattern = pattern
+        self._format_params = format_params
+        self._files: Dict[str, TextIO] = {}
+        self._buffers: Dict[str, Tuple[io.StringIO, Any]] = {}
+        self._file_sizes: Dict[str, int] = {}
+
+    def open(self):
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+        self._file_sizes = Utils.get_file_sizes(self._dir_path,
+                                                self._pattern)
+
+    def write_rows(self, filename: str, rows: List[List[Any]]):
+        if filename not in self._buffers:
+            buffer = io.StringIO()
+            self._buffers[filename] = \
+                buffer, csv.writer(buffer, **self._format_params)
+        self._buffers[filename][1].writerows(rows)
+
+    def flush(self):
+        for filename, (buffer, _) in self._buffers.items():
+            if not buffer.tell():
+                continue
+            if filename not in self._files:
+                self._files[filename] = open(self._dir_path / filename, 'a',
+                                             newline='')
+            file = self._files[filename]
+            file.write(buffer.getvalue())
+            file.flush()
+            self._file_sizes[filename] = file.tell()
+            buffer.seek(0)
+            buffer.truncate()
+
+    def get_file_sizes(self) -> Dict[str, int]:
+        self.flush()
+        return dict(self._file_sizes)
+
+    def close(self):
+        self.flush()
+        for file in self._files.values():
+            file.close()
+        self._files = {}
+        self._buffers = {}
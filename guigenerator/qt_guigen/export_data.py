@@ -1,18 +1,26 @@
-import copy
 import csv
 from abc import ABC, abstractmethod
+from enum import Enum
+from json import load
 from pathlib import Path
-from typing import List, Dict, Tuple, ItemsView
+from typing import List, Dict, Tuple, Any
 
 from guigenerator.dto.coco_dto import LicenseDto, InfoDto, CategoryDto, \
-    ImageDto, AnnotationDto, CocoDto, LabelInputDto, LabelInputLinksDto
+    ImageDto, AnnotationDto, LabelInputDto
+from guigenerator.qt_guigen.columnar_tables import ColumnarTableWriter, \
+    ColumnarFileFormat
 from guigenerator.qt_guigen.config import PyQtGuiGenConfig
+from guigenerator.qt_guigen.csv_session import CsvWriterSession
+from guigenerator.qt_guigen.packed_labels import PackedLabelWriter
 from guigenerator.qt_guigen.screenshot import Screenshot
+from guigenerator.qt_guigen.tar_shards import TarShardWriter
 from guigenerator.qt_guigen.widgets import GeometryOutputDataFormat, \
     AttributesDataFormat, ValuesDataFormat
-from guigenerator.qt_guigen.widgets.widget_dict import WidgetDataDict
-from guigenerator.qt_guigen.widgets.widget_geometry import WidgetGeometry
-from guigenerator.qt_guigen.widgets.widget_names import WidgetNames
+from guigenerator.qt_guigen.widgets.widget_dict import WidgetDataDict, \
+    LabelInputIds
+from guigenerator.qt_guigen.widgets.attributes import AttrName
+from guigenerator.qt_guigen.widgets.widget_categories import \
+    WidgetCategories
 from guigenerator.utils import Utils
 
 
@@ -27,10 +35,6 @@ class ExportGeomDataFactory:
 
 
 class GeomDataExporter(ABC):
-    __geometry_config = PyQtGuiGenConfig.get_section("GeometryDataExport")
-    __attr_config = PyQtGuiGenConfig.get_section("AttributeDataExport")
-    _widget_name_to_index_dict: Dict[str, int] = None
-
     def __init__(self, dir_path: Path):
         self._dir_path: Path = dir_path
 
@@ -38,31 +42,32 @@ class GeomDataExporter(ABC):
     def dir_path(self) -> Path:
         return self._dir_path
 
-    @abstractmethod
     def export(self,
                image_geometry_list: List[Tuple[Screenshot, WidgetDataDict]]):
+        self.begin()
+        for screenshot, data_item in image_geometry_list:
+            self.export_item(screenshot, data_item)
+        self.finish()
+
+    def begin(self):
         pass
 
-    @classmethod
-    def _get_acceptable_widget_names_for_geometry(cls) -> List[str]:
-        except_list = cls.__geometry_config.get_list('widget_except_list')
-        return [name for name in WidgetNames.get_possible_enum_names() if
-                name not in except_list]
+    @abstractmethod
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        pass
 
-    @classmethod
-    def _get_acceptable_widget_names_for_attr(cls) -> List[str]:
-        acceptable_list = cls.__attr_config.get_list("widgets_for_export")
-        return acceptable_list
+    def finish(self):
+        pass
 
-    @classmethod
-    def _get_widget_name_to_index_dict(cls) -> Dict[str, int]:
-        if cls._widget_name_to_index_dict is None:
-            cls._widget_name_to_index_dict = {}
-            for index, name in enumerate(
-                    cls._get_acceptable_widget_names_for_geometry()):
-                cls._widget_name_to_index_dict[name] = index
+    def get_state(self) -> Dict[str, Any]:
+        return {}
 
-        return cls._widget_name_to_index_dict
+    def restore_state(self, state: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def merge_shards(self, shard_dir_paths: List[Path]):
+        pass
 
     def _create_file(self, filename: str, extension: str, text: str):
         filename: Path = Path(filename)
@@ -77,52 +82,85 @@ class GeomDataExporter(ABC):
             return Path(filename)
 
 
+class YoloLabelStorage(Enum):
+    # a label file per image
+    FILES = "files"
+    # labels appended to shard files with an index, see PackedLabelWriter
+    PACKED = "packed"
+
+
 class YoloGeomDataExporter(GeomDataExporter):
     __config = PyQtGuiGenConfig.get_section("YoloGeometryDataExport")
 
     LABEL_FILE_NAME = __config.get("label_file_name")
     LABEL_EXTENSION = __config.get("label_extension")
     GEOMETRY_EXTENSION = __config.get("geometry_files_extension")
+    LABEL_STORAGE = YoloLabelStorage(__config.get("label_storage"))
+    PACKED_NAME = __config.get("packed_name")
+    PACKED_ITEMS_PER_SHARD = __config.get_int("packed_items_per_shard")
 
     def __init__(self, dir_path: Path):
         super(YoloGeomDataExporter, self).__init__(dir_path)
+        self._packed_writer: PackedLabelWriter = None
+        self._packed_state: Dict[str, Any] = None
+        if self.LABEL_STORAGE == YoloLabelStorage.PACKED:
+            self._packed_writer = PackedLabelWriter(
+                dir_path, self.PACKED_NAME, self.PACKED_ITEMS_PER_SHARD)
 
-    def export(self,
-               image_geometry_list: List[Tuple[Screenshot, WidgetDataDict]]):
+    def begin(self):
+        label_text = self._create_label_text()
+        self._create_file(self.LABEL_FILE_NAME, self.LABEL_EXTENSION,
+                          label_text)
+        if self._packed_writer is not None:
+            self._packed_writer.open(self._packed_state)
+
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        geom_text = data_item \
+            .get_geometry_table(GeometryOutputDataFormat.YOLO) \
+            .group_by_name() \
+            .to_yolo_text(WidgetCategories.CLASS_INDEXES)
+        if self._packed_writer is not None:
+            self._packed_writer.write(screenshot.filestem, geom_text)
+            self._packed_writer.flush()
+            return
+
+        # begin() has created the directory
+        file_path = self.dir_path / Path(screenshot.filestem) \
+            .with_suffix(self.GEOMETRY_EXTENSION)
+        with open(file_path, "w") as out:
+            out.write(geom_text)
+
+    def finish(self):
+        if self._packed_writer is not None:
+            self._packed_writer.close()
+
+    def get_state(self) -> Dict[str, Any]:
+        if self._packed_writer is None:
+            return {}
+        return self._packed_writer.get_state()
+
+    def restore_state(self, state: Dict[str, Any]):
+        self._packed_state = state if state else None
+
+    def merge_shards(self, shard_dir_paths: List[Path]):
         label_text = self._create_label_text()
         self._create_file(self.LABEL_FILE_NAME, self.LABEL_EXTENSION,
                           label_text)
 
-        for screenshot, data_item in image_geometry_list:
-            geom_text = self._get_geometry_text(data_item.get_geometry_items())
-            self._create_file(screenshot.filestem, self.GEOMETRY_EXTENSION,
-                              geom_text)
-
-    def _get_geometry_text(self, widget_geometry: ItemsView[
-        str, dict[int, WidgetGeometry]]):
-        result_text: List[str] = []
-        for widget_name, widget_geometries_dict in widget_geometry:
-            result_text += \
-                self._create_geometry_text_for_all_widgets_of_this_name(
-                    widget_name, list(widget_geometries_dict.values()))
-        return ''.join(result_text)
-
-    def _create_geometry_text_for_all_widgets_of_this_name(self,
-                                                           widget_container_name,
-                                                           widget_geometries_list) \
-            -> List[str]:
-        name_to_index: Dict[str, int] = self._get_widget_name_to_index_dict()
-        text_list: List[str] = []
-        for widget_geometry in widget_geometries_list:
-            if widget_container_name in name_to_index.keys():
-                line = f'{name_to_index[widget_container_name]} ' \
-                       f'{widget_geometry}\n'
-                text_list.append(line)
-        return text_list
+        if self._packed_writer is not None:
+            PackedLabelWriter.merge(shard_dir_paths, self.dir_path,
+                                    self.PACKED_NAME)
+            return
+
+        for shard_dir_path in shard_dir_paths:
+            for geometry_file_path in shard_dir_path.glob(
+                    '*' + self.GEOMETRY_EXTENSION):
+                if geometry_file_path.stem != self.LABEL_FILE_NAME:
+                    Utils.move_file(geometry_file_path,
+                                    self.dir_path / geometry_file_path.name)
 
     def _create_label_text(self):
-        return '\n'.join(
-            self._get_acceptable_widget_names_for_geometry()) + '\n'
+        return '\n'.join(WidgetCategories.GEOMETRY_NAMES) + '\n'
 
 
 class CocoGeomDataExporter(GeomDataExporter, ABC):
@@ -130,94 +168,314 @@ class CocoGeomDataExporter(GeomDataExporter, ABC):
 
     GEOMETRY_FILE_NAME = __config.get("coco_file_name")
     GEOMETRY_EXTENSION = __config.get("coco_file_extension")
+    LABEL_INPUT_LINK_FILE_NAME = "label_input_link.json"
 
     def __init__(self, dir_path: Path):
         super(CocoGeomDataExporter, self).__init__(dir_path)
+        self._category_list: List[CategoryDto] = [
+            CategoryDto(WidgetCategories.CATEGORY_IDS[name], name)
+            for name in WidgetCategories.GEOMETRY_NAMES]
+
+        self._image_id = 1
+        self._annotation_id = 1
+        self._part_sizes: Dict[str, int] = None
+        self._coco_writer = StreamingCocoWriter(
+            self.dir_path, self.GEOMETRY_FILE_NAME + '.json',
+            self.LABEL_INPUT_LINK_FILE_NAME)
+
+    def begin(self):
+        self._coco_writer.open(self._part_sizes)
+
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        image_id = self._image_id
+        widget_data_dict = data_item
+
+        # the links hold widget ids, they are written with the annotation
+        # ids the label and the input get here
+        links = widget_data_dict.get_label_input_link_ids()
+        link_indexes = self.__create_link_indexes(links)
+        label_ids = [link.label_id for link in links]
+        input_ids = [link.input_id for link in links]
+
+        self._coco_writer.write_image(
+            ImageDto(image_id, screenshot.width, screenshot.height,
+                     screenshot.filename))
+        table = widget_data_dict \
+            .get_geometry_table(GeometryOutputDataFormat.COCO) \
+            .group_by_name() \
+            .select_names(WidgetCategories.GEOMETRY_NAMES)
+        for widget_name, id_, bbox, attributes in zip(
+                table.get_names(), table.rows["widget_id"].tolist(),
+                table.get_boxes().tolist(), table.get_attributes()):
+            link_index = link_indexes.get(id_)
+            if link_index is not None:
+                if widget_name == "Label":
+                    label_ids[link_index] = self._annotation_id
+                else:
+                    input_ids[link_index] = self._annotation_id
+
+            category_id = WidgetCategories.CATEGORY_IDS[widget_name]
+            annotDto = AnnotationDto(self._annotation_id, image_id,
+                                     category_id, bbox)
+            if attributes and \
+                    widget_name in WidgetCategories.ATTRIBUTE_NAME_SET:
+                annotDto.attributes.update(attributes)
+            self._coco_writer.write_annotation(annotDto)
+            self._annotation_id += 1
+
+        for label_id, input_id in zip(label_ids, input_ids):
+            self._coco_writer.write_label_input_link(
+                LabelInputDto(image_id, label_id, input_id))
+
+        self._coco_writer.flush()
+        self._image_id += 1
 
-    def export(self,
-               image_geometry_list: List[Tuple[Screenshot, WidgetDataDict]]):
-        license_ = LicenseDto()
-        info = InfoDto()
-
-        category_dict = {}
-        category_list = []
-        for i, category_name in enumerate(
-                self._get_acceptable_widget_names_for_geometry()):
-            category_dict[category_name] = i + 1
-            category_list.append(CategoryDto(i + 1, category_name))
-
-        image_list = []
-        annotation_list = []
-        label_input_list = []
-        annotation_id = 1
-        for image_id, image_geometry_item in enumerate(image_geometry_list,
-                                                       start=1):
-            screenshot, widget_data_dict = image_geometry_item
-
-            original_widget_ids_label_input_link = \
-                widget_data_dict.get_label_input_link_ids()
-            result_widget_ids_label_input_link = copy.deepcopy(
-                widget_data_dict.get_label_input_link_ids())
-
-            image_list.append(
-                ImageDto(image_id, screenshot.width, screenshot.height,
-                         screenshot.filename))
-            for widget_name, geometry_attr_dict in \
-                    widget_data_dict.get_attr_geometry_items_for_coco():
-
-                if widget_name not in \
-                        self._get_acceptable_widget_names_for_geometry():
-                    continue
-
-                for id_, value in geometry_attr_dict.items():
-                    for index, label_input in enumerate(
-                            original_widget_ids_label_input_link):
-
-                        if label_input.have_id(id_):
-                            if widget_name == "Label":
-                                result_widget_ids_label_input_link[
-                                    index].replace_label_id(annotation_id)
-                                print("Label")
-                                print(id_, annotation_id)
-                            else:
-                                result_widget_ids_label_input_link[
-                                    index].replace_input_id(annotation_id)
-                                print("input")
-                                print(id_, annotation_id)
-                            break
-
-                    geometry, attr_list = value
-                    bbox = [geometry.x, geometry.y, geometry.width,
-                            geometry.height]
-                    category_id = category_dict[widget_name]
-                    annotDto = AnnotationDto(annotation_id, image_id,
-                                             category_id, bbox)
-                    if attr_list and widget_name in \
-                            self._get_acceptable_widget_names_for_attr():
-                        annotDto.attributes \
-                            .update({attr.name.fancy_name: attr.state_name
-                                     for attr in attr_list})
-                    annotation_list.append(annotDto)
-                    annotation_id += 1
-
-                print(original_widget_ids_label_input_link)
-                print(result_widget_ids_label_input_link)
-
-            label_input_list.extend([LabelInputDto(image_id,
-                                                   label_input.label_id,
-                                                   label_input.input_id)
-                                     for label_input in
-                                     result_widget_ids_label_input_link])
-
-        coco_dto = CocoDto([license_], info, category_list, image_list,
-                           annotation_list)
+    @classmethod
+    def __create_link_indexes(cls, links: List[LabelInputIds]) \
+            -> Dict[int, int]:
+        # index of the first link of every widget id
+        link_indexes: Dict[int, int] = {}
+        for index, link in enumerate(links):
+            link_indexes.setdefault(link.label_id, index)
+            link_indexes.setdefault(link.input_id, index)
+        return link_indexes
+
+    def finish(self):
+        self._coco_writer.close([LicenseDto()], InfoDto(),
+                                self._category_list)
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"image_id": self._image_id,
+                "annotation_id": self._annotation_id,
+                "part_sizes": self._coco_writer.get_part_sizes()}
+
+    def restore_state(self, state: Dict[str, Any]):
+        # no item was recorded, the run starts afresh
+        if not state:
+            return
+        self._image_id = state["image_id"]
+        self._annotation_id = state["annotation_id"]
+        self._part_sizes = state["part_sizes"]
+
+    def merge_shards(self, shard_dir_paths: List[Path]):
+        coco_dict = None
+        links = []
+        for shard_dir_path in shard_dir_paths:
+            coco_path = shard_dir_path / (self.GEOMETRY_FILE_NAME + '.json')
+            if not coco_path.exists():
+                continue
+            with open(coco_path, "r") as fin:
+                shard_coco_dict = load(fin)
+            with open(shard_dir_path / self.LABEL_INPUT_LINK_FILE_NAME,
+                      "r") as fin:
+                shard_links = load(fin)["links"]
+
+            if coco_dict is None:
+                coco_dict = shard_coco_dict
+                links.extend(shard_links)
+                continue
+
+            image_id_offset = len(coco_dict["images"])
+            annotation_id_offset = len(coco_dict["annotations"])
+            # a link end is the annotation id of the widget, or its widget
+            # id when the widget has no annotation; only annotation ids of
+            # the link's image are renumbered
+            annotation_image_ids = {
+                annotation["id"]: annotation["image_id"]
+                for annotation in shard_coco_dict["annotations"]}
+            for image in shard_coco_dict["images"]:
+                image["id"] += image_id_offset
+                coco_dict["images"].append(image)
+            for annotation in shard_coco_dict["annotations"]:
+                annotation["id"] += annotation_id_offset
+                annotation["image_id"] += image_id_offset
+                coco_dict["annotations"].append(annotation)
+            for link in shard_links:
+                for id_key in ("label_id", "input_id"):
+                    if annotation_image_ids.get(link[id_key]) \
+                            == link["image_id"]:
+                        link[id_key] += annotation_id_offset
+                link["image_id"] += image_id_offset
+                links.append(link)
+
+        if coco_dict is None:
+            return
 
         filename = self.GEOMETRY_FILE_NAME + '.json'
-        Utils.write_to_json(coco_dto, str(self.dir_path / filename))
+        Utils.write_to_json(coco_dict, str(self.dir_path / filename))
+
+        filename = self.LABEL_INPUT_LINK_FILE_NAME
+        Utils.write_to_json({"links": links}, str(self.dir_path / filename))
+
+
+# Writes COCO images, annotations and label-input links as JSON lines
+# while the run goes, so nothing is kept in memory and a crashed run keeps
+# its annotations. close() assembles the final json files from the parts.
+class StreamingCocoWriter:
+    PART_SUFFIX = ".part"
+
+    def __init__(self, dir_path: Path, coco_file_name: str,
+                 label_input_link_file_name: str):
+        self._coco_path = dir_path / coco_file_name
+        self._link_path = dir_path / label_input_link_file_name
+        self._part_paths = {
+            "images": self._coco_path.with_suffix(".images" +
+                                                  self.PART_SUFFIX),
+            "annotations": self._coco_path.with_suffix(".annotations" +
+                                                       self.PART_SUFFIX),
+            "links": self._link_path.with_suffix(self.PART_SUFFIX)}
+        self._part_files = {}
+
+    def open(self, part_sizes: Dict[str, int] = None):
+        # part_sizes continue the parts of an interrupted run, dropping
+        # whatever was written after that point
+        for part_name, part_path in self._part_paths.items():
+            part_path.parent.mkdir(parents=True, exist_ok=True)
+            if part_sizes is None:
+                self._part_files[part_name] = open(part_path, "w")
+                continue
+
+            if not part_path.exists():
+                raise RuntimeError(f"Can not resume, {part_path} is missing")
+            part_file = open(part_path, "a")
+            part_file.truncate(part_sizes[part_name])
+            part_file.seek(0, 2)
+            self._part_files[part_name] = part_file
+
+    def get_part_sizes(self) -> Dict[str, int]:
+        return {part_name: part_file.tell()
+                for part_name, part_file in self._part_files.items()}
+
+    def write_image(self, image: ImageDto):
+        self.__write_part("images", image)
+
+    def write_annotation(self, annotation: AnnotationDto):
+        self.__write_part("annotations", annotation)
+
+    def write_label_input_link(self, link: LabelInputDto):
+        self.__write_part("links", link)
+
+    def flush(self):
+        for part_file in self._part_files.values():
+            part_file.flush()
+
+    def close(self, licenses: List[LicenseDto], info: InfoDto,
+              categories: List[CategoryDto]):
+        for part_file in self._part_files.values():
+            part_file.close()
+        self._part_files = {}
+
+        with open(self._coco_path, "w") as out:
+            out.write('{"licenses": ' + Utils.to_json_string(licenses))
+            out.write(', "info": ' + Utils.to_json_string(info))
+            out.write(', "categories": ' + Utils.to_json_string(categories))
+            out.write(', "images": ')
+            self.__copy_part_as_json_list(self._part_paths["images"], out)
+            out.write(', "annotations": ')
+            self.__copy_part_as_json_list(self._part_paths["annotations"],
+                                          out)
+            out.write('}')
+
+        with open(self._link_path, "w") as out:
+            out.write('{"links": ')
+            self.__copy_part_as_json_list(self._part_paths["links"], out)
+            out.write('}')
+
+        for part_path in self._part_paths.values():
+            part_path.unlink()
+
+    def __write_part(self, part_name: str, obj):
+        self._part_files[part_name].write(Utils.to_json_string(obj) + '\n')
+
+    @classmethod
+    def __copy_part_as_json_list(cls, part_path: Path, out):
+        out.write('[')
+        with open(part_path, "r") as part_file:
+            for line_number, line in enumerate(part_file):
+                if line_number:
+                    out.write(', ')
+                out.write(line.rstrip('\n'))
+        out.write(']')
+
+
+# Exports the records of a kind as CSV files, FILENAME_PREFIX + widget
+# name + FILE_EXTENSION, kept open in a CsvWriterSession for the whole
+# run. FORMAT_PARAMS are the csv.writer parameters of the files.
+class CsvExportMixin:
+    FILE_EXTENSION = ".csv"
+    FILENAME_PREFIX: str = None
+    FORMAT_PARAMS: Dict[str, Any] = {}
+
+    def __init__(self, dir_path: Path):
+        super().__init__(dir_path)
+        self._session = CsvWriterSession(dir_path, self.get_file_pattern(),
+                                         **self.FORMAT_PARAMS)
+
+    @classmethod
+    def get_file_pattern(cls) -> str:
+        return cls.FILENAME_PREFIX + '*' + cls.FILE_EXTENSION
+
+    def begin(self):
+        self._session.open()
+
+    def finish(self):
+        self._session.close()
+
+    def get_state(self) -> Dict[str, Any]:
+        # the state is taken after every item, the rows written so far
+        # have to reach the files before it is recorded
+        return {"file_sizes": self._session.get_file_sizes()}
+
+    def restore_state(self, state: Dict[str, Any]):
+        # no item was recorded, the run starts afresh
+        if not state:
+            return
+        Utils.truncate_files(self.dir_path, self.get_file_pattern(),
+                             state["file_sizes"])
+
+    def merge_shards(self, shard_dir_paths: List[Path]):
+        for shard_dir_path in shard_dir_paths:
+            for csv_path in shard_dir_path.glob(self.get_file_pattern()):
+                Utils.append_file(csv_path, self.dir_path / csv_path.name)
 
-        filename = "label_input_link.json"
-        label_input_dto = LabelInputLinksDto(label_input_list)
-        Utils.write_to_json(label_input_dto, str(self.dir_path / filename))
+
+# Exports the records of a kind as the columnar table TABLE_NAME with the
+# COLUMNS, see ColumnarTableWriter. The rows of an item are written out
+# with the item.
+class ColumnarExportMixin:
+    __config = PyQtGuiGenConfig.get_section("ColumnarDataExport")
+
+    TABLE_NAME: str = None
+    ROWS_PER_PART = __config.get_int("rows_per_part")
+    COLUMNS: List[Tuple[str, str]] = []
+
+    def __init__(self, dir_path: Path, file_format: ColumnarFileFormat):
+        super().__init__(dir_path)
+        self._file_format = file_format
+        self._table_writer = ColumnarTableWriter(
+            dir_path, self.TABLE_NAME, self.COLUMNS, file_format,
+            self.ROWS_PER_PART)
+        self._table_state: Dict[str, Any] = None
+
+    def begin(self):
+        self._table_writer.open(self._table_state)
+
+    def finish(self):
+        self._table_writer.close()
+
+    def get_state(self) -> Dict[str, Any]:
+        return self._table_writer.get_state()
+
+    def restore_state(self, state: Dict[str, Any]):
+        self._table_state = state if state else None
+
+    def merge_shards(self, shard_dir_paths: List[Path]):
+        ColumnarTableWriter.merge(shard_dir_paths, self.dir_path,
+                                  self.TABLE_NAME, self._file_format)
+
+    def _write_item_rows(self, rows: List[List[Any]]):
+        self._table_writer.write_rows(rows)
+        self._table_writer.flush()
 
 
 class ExportAttrDataFactory:
@@ -226,60 +484,104 @@ class ExportAttrDataFactory:
                      export_path: Path) -> 'AttrDataExporter':
         if data_format == AttributesDataFormat.CSV:
             return CSVAttrDataExporter(export_path)
+        elif data_format == AttributesDataFormat.PARQUET:
+            return ColumnarAttrDataExporter(export_path,
+                                            ColumnarFileFormat.PARQUET)
+        elif data_format == AttributesDataFormat.ARROW:
+            return ColumnarAttrDataExporter(export_path,
+                                            ColumnarFileFormat.ARROW)
         else:
             raise RuntimeError("No such otp format")
 
 
 class AttrDataExporter(ABC):
-    __config = PyQtGuiGenConfig.get_section("AttributeDataExport")
-    _widget_name_to_index_dict: Dict[str, int] = None
-
     def __init__(self, dir_path: Path):
         self._dir_path: Path = dir_path
-        self._widgets_for_export = self.__config.get_list("widgets_for_export")
+        self._widgets_for_export = WidgetCategories.ATTRIBUTE_NAME_SET
 
     @property
     def dir_path(self) -> Path:
         return self._dir_path
 
-    @abstractmethod
     def export(self,
                image_geometry_list: List[Tuple[Screenshot, WidgetDataDict]]):
+        self.begin()
+        for screenshot, data_item in image_geometry_list:
+            self.export_item(screenshot, data_item)
+        self.finish()
+
+    def begin(self):
         pass
 
+    @abstractmethod
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        pass
 
-class CSVAttrDataExporter(AttrDataExporter):
-    FILE_EXTENSION = ".csv"
-    FILENAME_PREFIX = "metadata_"
+    def finish(self):
+        pass
 
-    def __init__(self, dir_path: Path):
-        super().__init__(dir_path)
+    def get_state(self) -> Dict[str, Any]:
+        return {}
 
-    def export(self,
-               image_geometry_list: List[Tuple[Screenshot, WidgetDataDict]]):
-        for screenshot, data_item in image_geometry_list:
-            for widget_name, attr_dict in data_item.get_attr_items():
-                if widget_name in self._widgets_for_export:
-                    metadata_file_path = self.dir_path / Path(
-                        self.FILENAME_PREFIX + widget_name +
-                        self.FILE_EXTENSION)
-                    out_lines = []
-                    for widget_id, list_of_attr in attr_dict.items():
-                        main_screenshot_name = Path(screenshot.filename)
-                        widget_screenshot_name = widget_name + '-' + \
-                                                 main_screenshot_name.stem + \
-                                                 '-' + str(
-                            widget_id) \
-                                                 + main_screenshot_name.suffix
-                        out_lines.append(
-                            [widget_screenshot_name] + [attr.state_name for
-                                                        attr in list_of_attr])
-
-                    with open(metadata_file_path, 'a', newline='') as csvfile:
-                        writer = csv.writer(csvfile, delimiter=',',
-                                            quotechar='|',
-                                            quoting=csv.QUOTE_MINIMAL)
-                        writer.writerows(out_lines)
+    def restore_state(self, state: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def merge_shards(self, shard_dir_paths: List[Path]):
+        pass
+
+
+class CSVAttrDataExporter(CsvExportMixin, AttrDataExporter):
+    FILENAME_PREFIX = "metadata_"
+    FORMAT_PARAMS = {"delimiter": ',', "quotechar": '|',
+                     "quoting": csv.QUOTE_MINIMAL}
+
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        for widget_name, attr_dict in data_item.get_attr_items():
+            if widget_name in self._widgets_for_export:
+                metadata_file_path = self.dir_path / Path(
+                    self.FILENAME_PREFIX + widget_name +
+                    self.FILE_EXTENSION)
+                out_lines = []
+                for widget_id, list_of_attr in attr_dict.items():
+                    main_screenshot_name = Path(screenshot.filename)
+                    widget_screenshot_name = widget_name + '-' + \
+                                             main_screenshot_name.stem + \
+                                             '-' + str(
+                        widget_id) \
+                                             + main_screenshot_name.suffix
+                    out_lines.append(
+                        [widget_screenshot_name] + [attr.state_name for
+                                                    attr in list_of_attr])
+
+                self._session.write_rows(metadata_file_path.name, out_lines)
+
+
+# Attributes as one columnar table: a row per exported widget with a
+# column per attribute, null where the widget has no such attribute.
+class ColumnarAttrDataExporter(ColumnarExportMixin, AttrDataExporter):
+    TABLE_NAME = "attributes"
+    COLUMNS = [("image", "string"), ("widget_image", "string"),
+               ("widget_name", "string"), ("widget_id", "int32")] \
+        + [(attr_name.fancy_name, "string") for attr_name in AttrName]
+
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        main_screenshot_name = Path(screenshot.filename)
+        rows = []
+        for widget_name, attr_dict in data_item.get_attr_items():
+            if widget_name not in self._widgets_for_export:
+                continue
+            for widget_id, list_of_attr in attr_dict.items():
+                widget_screenshot_name = widget_name + '-' + \
+                                         main_screenshot_name.stem + '-' + \
+                                         str(widget_id) + \
+                                         main_screenshot_name.suffix
+                states = {attr.name: attr.state_name for attr in list_of_attr}
+                rows.append([screenshot.filename, widget_screenshot_name,
+                             widget_name, widget_id]
+                            + [states.get(attr_name)
+                               for attr_name in AttrName])
+        self._write_item_rows(rows)
 
 
 class ExportWidgetContentFactory:
@@ -288,62 +590,214 @@ class ExportWidgetContentFactory:
                      export_path: Path) -> 'WidgetContentExporter':
         if data_format == ValuesDataFormat.CSV:
             return CSVWidgetContentExporter(export_path)
+        elif data_format == ValuesDataFormat.PARQUET:
+            return ColumnarWidgetContentExporter(export_path,
+                                                 ColumnarFileFormat.PARQUET)
+        elif data_format == ValuesDataFormat.ARROW:
+            return ColumnarWidgetContentExporter(export_path,
+                                                 ColumnarFileFormat.ARROW)
         else:
             raise RuntimeError("No such otp format")
 
 
 class WidgetContentExporter(ABC):
-    __config = PyQtGuiGenConfig.get_section("WidgetValuesDataExport")
-    _widget_name_to_index_dict: Dict[str, int] = None
-
     def __init__(self, dir_path: Path):
         self._dir_path: Path = dir_path
-        self._widgets_for_export = self.__config.get_list("widgets_for_export")
+        self._widgets_for_export = WidgetCategories.VALUES_NAME_SET
 
     @property
     def dir_path(self) -> Path:
         return self._dir_path
 
-    @abstractmethod
     def export(self,
                image_geometry_list: List[Tuple[Screenshot, WidgetDataDict]]):
+        self.begin()
+        for screenshot, data_item in image_geometry_list:
+            self.export_item(screenshot, data_item)
+        self.finish()
+
+    def begin(self):
         pass
 
+    @abstractmethod
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        pass
 
-class CSVWidgetContentExporter(WidgetContentExporter):
-    FILE_EXTENSION = ".csv"
+    def finish(self):
+        pass
+
+    def get_state(self) -> Dict[str, Any]:
+        return {}
+
+    def restore_state(self, state: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def merge_shards(self, shard_dir_paths: List[Path]):
+        pass
+
+
+class CSVWidgetContentExporter(CsvExportMixin, WidgetContentExporter):
     FILENAME_PREFIX = "widget_vals_"
+    FORMAT_PARAMS = {"delimiter": ',', "quotechar": '|',
+                     "quoting": csv.QUOTE_NONE, "escapechar": '\\'}
+
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        for widget_name, widget_value_dict_by_widget_id in \
+                data_item.get_vals_items():
+            if widget_name in self._widgets_for_export:
+                widget_val_file_path = self.dir_path / Path(
+                    self.FILENAME_PREFIX + widget_name
+                    + self.FILE_EXTENSION)
+                out_lines = []
+                for widget_id, widget_value_dict in \
+                        widget_value_dict_by_widget_id.items():
+                    main_screenshot_name = Path(screenshot.filename)
+                    widget_screenshot_name = widget_name + '-' + \
+                                             main_screenshot_name.stem + \
+                                             '-' + str(
+                        widget_id) \
+                                             + main_screenshot_name.suffix
+                    for widget_value_name, widget_value in \
+                            widget_value_dict.items():
+                        out_lines.append([widget_screenshot_name] + [
+                            widget_value.__str__()])
+
+                self._session.write_rows(widget_val_file_path.name,
+                                         out_lines)
+
+
+# Widget content as one columnar table: a row per exported widget value.
+class ColumnarWidgetContentExporter(ColumnarExportMixin,
+                                    WidgetContentExporter):
+    TABLE_NAME = "content"
+    COLUMNS = [("image", "string"), ("widget_image", "string"),
+               ("widget_name", "string"), ("widget_id", "int32"),
+               ("value_name", "string"), ("value", "string")]
+
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        main_screenshot_name = Path(screenshot.filename)
+        rows = []
+        for widget_name, widget_value_dict_by_widget_id in \
+                data_item.get_vals_items():
+            if widget_name not in self._widgets_for_export:
+                continue
+            for widget_id, widget_value_dict in \
+                    widget_value_dict_by_widget_id.items():
+                widget_screenshot_name = widget_name + '-' + \
+                                         main_screenshot_name.stem + '-' + \
+                                         str(widget_id) + \
+                                         main_screenshot_name.suffix
+                for widget_value_name, widget_value in \
+                        widget_value_dict.items():
+                    rows.append([screenshot.filename, widget_screenshot_name,
+                                 widget_name, widget_id,
+                                 widget_value_name.value, str(widget_value)])
+        self._write_item_rows(rows)
+
+
+# Streams every item into tar shards, see TarShardWriter. The members of an
+# item are keyed by the screenshot stem: <key>.<image suffix> is the
+# screenshot, <key>.crop.<widget name>-<widget id>.<image suffix> are the
+# widget crops and <key>.json holds the YOLO, COCO, attribute and content
+# records of the item, with the label-input links given by widget ids.
+class TarShardExporter:
+    __config = PyQtGuiGenConfig.get_section("TarShardExport")
+
+    IS_ENABLED = __config.get_boolean("enabled")
+    SHARD_NAME = __config.get("shard_name")
+    MAX_SHARD_SIZE = __config.get_int("max_shard_size_mb") * 1024 * 1024
 
     def __init__(self, dir_path: Path):
-        super().__init__(dir_path)
+        self._dir_path: Path = dir_path
+        self._tar_writer = TarShardWriter(dir_path, self.SHARD_NAME,
+                                          self.MAX_SHARD_SIZE)
+        self._tar_state: Dict[str, Any] = None
+
+    @property
+    def dir_path(self) -> Path:
+        return self._dir_path
 
     def export(self,
                image_geometry_list: List[Tuple[Screenshot, WidgetDataDict]]):
+        self.begin()
         for screenshot, data_item in image_geometry_list:
-            for widget_name, widget_value_dict_by_widget_id in \
-                    data_item.get_vals_items():
-                if widget_name in self._widgets_for_export:
-                    widget_val_file_path = self.dir_path / Path(
-                        self.FILENAME_PREFIX + widget_name
-                        + self.FILE_EXTENSION)
-                    out_lines = []
-                    for widget_id, widget_value_dict in \
-                            widget_value_dict_by_widget_id.items():
-                        main_screenshot_name = Path(screenshot.filename)
-                        widget_screenshot_name = widget_name + '-' + \
-                                                 main_screenshot_name.stem + \
-                                                 '-' + str(
-                            widget_id) \
-                                                 + main_screenshot_name.suffix
-                        for widget_value_name, widget_value in \
-                                widget_value_dict.items():
-                            out_lines.append([widget_screenshot_name] + [
-                                widget_value.__str__()])
-
-                    with open(widget_val_file_path, 'a',
-                              newline='') as csvfile:
-                        writer = csv.writer(csvfile, delimiter=',',
-                                            quotechar='|',
-                                            quoting=csv.QUOTE_NONE,
-                                            escapechar='\\')
-                        writer.writerows(out_lines)
+            self.export_item(screenshot, data_item)
+        self.finish()
+
+    def begin(self):
+        self._tar_writer.open(self._tar_state)
+
+    def export_item(self, screenshot: Screenshot, data_item: WidgetDataDict):
+        # the images as the encoder tasks encoded them, the files are not
+        # read back
+        key = screenshot.filestem.split('-q')[0]
+        image_extension = screenshot.filesuffix.lstrip('.')
+
+        members = [(image_extension,
+                    screenshot.get_encoded_file(screenshot.fullpath))]
+        for widget_name, widget_id, crop_path in screenshot.widget_crops:
+            members.append((f"crop.{widget_name}-{widget_id}."
+                            f"{image_extension}",
+                            screenshot.get_encoded_file(crop_path)))
+        members.append(("json", Utils.to_json_string(
+            self._create_record(screenshot, data_item)).encode()))
+
+        self._tar_writer.write(key, members)
+        self._tar_writer.flush()
+
+    def finish(self):
+        self._tar_writer.close()
+
+    def get_state(self) -> Dict[str, Any]:
+        return self._tar_writer.get_state()
+
+    def restore_state(self, state: Dict[str, Any]):
+        self._tar_state = state if state else None
+
+    def merge_shards(self, shard_dir_paths: List[Path]):
+        TarShardWriter.merge(shard_dir_paths, self.dir_path,
+                             self.SHARD_NAME)
+
+    @classmethod
+    def _create_record(cls, screenshot: Screenshot,
+                       data_item: WidgetDataDict) -> Dict[str, Any]:
+        coco_table = data_item.get_geometry_table(
+            GeometryOutputDataFormat.COCO)
+        yolo_boxes = data_item.get_geometry_table(
+            GeometryOutputDataFormat.YOLO).get_boxes().tolist()
+
+        widgets = []
+        for widget_name, widget_id, bbox, yolo_bbox, attributes in zip(
+                coco_table.get_names(), coco_table.rows["widget_id"].tolist(),
+                coco_table.get_boxes().tolist(), yolo_boxes,
+                coco_table.get_attributes()):
+            if widget_name not in WidgetCategories.GEOMETRY_NAME_SET:
+                continue
+            widget = {"id": widget_id, "name": widget_name,
+                      "class_index": WidgetCategories.CLASS_INDEXES[
+                          widget_name],
+                      "category_id": WidgetCategories.CATEGORY_IDS[
+                          widget_name],
+                      "bbox": bbox, "yolo_bbox": yolo_bbox}
+            if attributes and \
+                    widget_name in WidgetCategories.ATTRIBUTE_NAME_SET:
+                widget["attributes"] = attributes
+            widgets.append(widget)
+
+        content = []
+        for widget_name, values_by_widget_id in data_item.get_vals_items():
+            if widget_name not in WidgetCategories.VALUES_NAME_SET:
+                continue
+            for widget_id, values in values_by_widget_id.items():
+                content.append({"id": widget_id, "name": widget_name,
+                                "values": {value_name.value: str(value)
+                                           for value_name, value
+                                           in values.items()}})
+
+        return {"image": screenshot.filename, "width": screenshot.width,
+                "height": screenshot.height, "widgets": widgets,
+                "label_input_links": [
+                    {"label_id": link.label_id, "input_id": link.input_id}
+                    for link in data_item.get_label_input_link_ids()],
+                "content": content}
@@ -1,7 +1,8 @@
+import argparse
 import sys
 from pathlib import Path
-from random import randint, choice
-from typing import List, Tuple, Union
+from random import Random
+from typing import Union, Any
 import matplotlib.pyplot as plt
 
 from PySide6 import QtWidgets as QtW
@@ -10,10 +11,15 @@ from PySide6 import QtCore as QtC
 from guigenerator.dto.tree_dto import NodeDto, TreeDto
 from guigenerator.qt_guigen.config import PyQtGuiGenConfig
 from guigenerator.qt_guigen.export_data import ExportAttrDataFactory, \
-    ExportWidgetContentFactory, ExportGeomDataFactory
+    ExportWidgetContentFactory, ExportGeomDataFactory, TarShardExporter
+from guigenerator.qt_guigen.run_manifest import RunManifest
 from guigenerator.qt_guigen.screenshot import ScreenshotHandler, Screenshot
 from guigenerator.qt_guigen.widgets import GeometryOutputDataFormat, \
     AttributesDataFormat, ValuesDataFormat
+from guigenerator.qt_guigen.widgets.qwidgets.qwidgets_factory import \
+    QWidgetFactory
+from guigenerator.qt_guigen.widgets.widget_categories import \
+    WidgetCategories
 from guigenerator.qt_guigen.widgets.widget_dict import WidgetDataDict, \
     WidgetDataDictFactory
 from guigenerator.qt_guigen.widgets.widgetobject.wo_abc import \
@@ -22,61 +28,148 @@ from guigenerator.qt_guigen.widgets.widgetobject.wo_concrete import \
     MenuItemWidget
 from guigenerator.qt_guigen.widgets.widgetobject.wo_factory import \
     WidgetObjectFactory
+from guigenerator.qt_guigen.writer_pool import BackgroundWriterPool
+from guigenerator.random_context import RandomContext
 from guigenerator.tree_guigen.gui_tree_gen import TreeGeneration
 from guigenerator.utils import Utils
 
+_rng = RandomContext.get_rng()
+
 
 class QtDatasetGeneration:
     __config = PyQtGuiGenConfig.get_section("DatasetGeneration")
 
     DATASET_SIZE = __config.get_int("dataset_size")
     EMPTY_SCREENSHOTS_RATIO = __config.get_float("empty_screenshots_ratio")
-    DATASET_ITEM_NUMBER_OF_WIDGETS = randint(__config.get_int("n_min_widgets"),
-                                             __config.get_int("n_max_widgets"))
+    N_MIN_WIDGETS = __config.get_int("n_min_widgets")
+    N_MAX_WIDGETS = __config.get_int("n_max_widgets")
+    RUN_SEED = int(__config.get("seed")) if __config.get("seed") else None
     STYLESHEETS = __config.get_list("stylesheets")
+    WRITER_THREADS = __config.get_int("writer_threads")
+    WRITER_MAX_PENDING = __config.get_int("writer_max_pending")
 
     TREE_DESCRIPTION_PATH = Utils.PROJ_ROOT_DIR / __config.get_path(
         "tree_description_path")
     GENERATED_TREE_PATH = Utils.PROJ_ROOT_DIR / __config.get_path(
         "generated_tree_path")
+    DUMP_GENERATED_TREE = __config.get_boolean("dump_generated_tree")
     EXPORT_WIDGET_GEOM_PATH = __config.get_path(
         "export_widget_geometries_dir_path")
     EXPORT_WIDGET_ATTR_PATH = __config.get_path(
         "export_widget_attributes_dir_path")
     EXPORT_WIDGET_CONTENT_PATH = __config.get_path(
         "export_widget_content_dir_path")
+    EXPORT_TAR_SHARDS_PATH = __config.get_path("export_tar_shards_dir_path")
+    ATTR_DATA_FORMAT = AttributesDataFormat(PyQtGuiGenConfig.get_section(
+        "AttributeDataExport").get("data_format"))
+    VALUES_DATA_FORMAT = ValuesDataFormat(PyQtGuiGenConfig.get_section(
+        "WidgetValuesDataExport").get("data_format"))
+    RUN_MANIFEST_PATH = __config.get_path("run_manifest_path")
 
     GENERATED_TREE_PATH.parent.mkdir(parents=True, exist_ok=True)
     EXPORT_WIDGET_GEOM_PATH.mkdir(parents=True, exist_ok=True)
     EXPORT_WIDGET_ATTR_PATH.mkdir(parents=True, exist_ok=True)
     EXPORT_WIDGET_CONTENT_PATH.mkdir(parents=True, exist_ok=True)
 
-    yolo_widget_data = None
-    coco_widget_data = None
+    widget_data = None
     widgets_counter_list = []
 
     @classmethod
-    def generate(cls):
-        yolo_widget_data_list: List[Tuple[Screenshot, 'WidgetDataDict']] = []
-        coco_widget_data_list: List[Tuple[Screenshot, 'WidgetDataDict']] = []
+    def generate(cls, item_range: range = None,
+                 show_distribution: bool = True, resume: bool = False,
+                 seed: int = None):
+        if item_range is None:
+            item_range = range(cls.DATASET_SIZE)
+        if seed is None:
+            seed = cls.get_run_seed()
+
+        manifest = RunManifest(cls.RUN_MANIFEST_PATH)
+        if resume:
+            manifest.load(item_range)
+            cls.widgets_counter_list.extend(manifest.get_distributions())
+            if manifest.is_finished:
+                print(f"Run in {manifest.path} is already finished")
+                manifest.close()
+                return
+        else:
+            manifest.start(item_range, seed)
+        seed = manifest.seed
+        print(f"Run seed is {seed}")
+        number_of_widgets = cls.get_number_of_widgets(seed)
 
         QtW.QApplication(sys.argv)
+        try:
+            with BackgroundWriterPool(cls.WRITER_THREADS,
+                                      cls.WRITER_MAX_PENDING) as writer_pool:
+                cls._generate_items(item_range, seed, number_of_widgets,
+                                    resume, manifest, writer_pool)
+        finally:
+            manifest.close()
+
+        if show_distribution:
+            cls.print_widgets_distribution()
 
-        for item_num in range(cls.DATASET_SIZE):
+    @classmethod
+    def _generate_items(cls, item_range: range, seed: int,
+                        number_of_widgets: int, resume: bool,
+                        manifest: RunManifest,
+                        writer_pool: BackgroundWriterPool):
+        yolo_geom_exporter = ExportGeomDataFactory.get_exporter(
+            GeometryOutputDataFormat.YOLO,
+            cls.EXPORT_WIDGET_GEOM_PATH)
+        coco_geom_exporter = ExportGeomDataFactory.get_exporter(
+            GeometryOutputDataFormat.COCO,
+            cls.EXPORT_WIDGET_GEOM_PATH)
+        attr_exporter \
+            = ExportAttrDataFactory.get_exporter(cls.ATTR_DATA_FORMAT,
+                                                 cls.EXPORT_WIDGET_ATTR_PATH)
+        widget_content_exporter \
+            = ExportWidgetContentFactory.get_exporter(cls.VALUES_DATA_FORMAT,
+                                                      cls.EXPORT_WIDGET_CONTENT_PATH)
+        exporters = (yolo_geom_exporter, coco_geom_exporter, attr_exporter,
+                     widget_content_exporter)
+        if TarShardExporter.IS_ENABLED:
+            exporters += (TarShardExporter(cls.EXPORT_TAR_SHARDS_PATH),)
+        for exporter in exporters:
+            if resume:
+                exporter.restore_state(manifest.exporter_states.get(
+                    type(exporter).__name__, {}))
+            writer_pool.submit_ordered(exporter.begin)
+
+        # annotations of an item are written as soon as the item is
+        # captured, so memory use does not grow with the dataset size.
+        # The item goes to the manifest only after its images are written
+        def _export_item(item_num_: int, item_seed_: int,
+                         screenshot_: Screenshot,
+                         widget_data: WidgetDataDict):
+            for exporter_ in exporters:
+                exporter_.export_item(screenshot_, widget_data)
+
+            written_files = [file_path.name for file_path
+                             in screenshot_.wait_written_files()]
+            manifest.record_item(
+                item_num_, item_seed_, written_files,
+                {type(exporter_).__name__: exporter_.get_state()
+                 for exporter_ in exporters},
+                widget_data.get_geometry_distrib())
+
+        for item_num in item_range:
+            if manifest.is_item_done(item_num):
+                continue
             print(f"------------------ {item_num + 1}")
+            QWidgetFactory.prepare_item(seed, item_num)
+            item_seed = RandomContext.seed_item(seed, item_num)
 
             is_main_widget_invisible = item_num >= cls.DATASET_SIZE \
                                        - cls.get_nmb_of_empty_widgets()
             root_widget_object = cls._generate_application_instance(
-                cls.DATASET_ITEM_NUMBER_OF_WIDGETS)
+                number_of_widgets)
 
+            # the geometries are taken once, every export format is
+            # derived from them
             def _do_while_taking_screenshot():
-                cls.yolo_widget_data = WidgetDataDictFactory.create_dict(
-                    root_widget_object,
-                    GeometryOutputDataFormat.YOLO)
-                cls.coco_widget_data = WidgetDataDictFactory.create_dict(
-                    root_widget_object,
-                    GeometryOutputDataFormat.COCO)
+                cls.widget_data = WidgetDataDictFactory.create_dict(
+                    root_widget_object)
 
             if is_main_widget_invisible:
                 for child_wo in root_widget_object.get_children():
@@ -85,46 +178,63 @@ class QtDatasetGeneration:
 
             screenshot = ScreenshotHandler.take_main_screenshot(
                 root_widget_object,
-                _do_while_taking_screenshot)
+                _do_while_taking_screenshot,
+                writer_pool,
+                item_num)
             if is_main_widget_invisible:
-                cls.yolo_widget_data = WidgetDataDictFactory.create_empty_dict(
-                    root_widget_object)
-                cls.coco_widget_data = WidgetDataDictFactory.create_empty_dict(
+                cls.widget_data = WidgetDataDictFactory.create_empty_dict(
                     root_widget_object)
 
-            yolo_widget_data_list.append(
-                (screenshot, cls.yolo_widget_data))
-            coco_widget_data_list.append((screenshot,
-                                          cls.coco_widget_data))
+            # the crops are submitted first, so the item is exported and
+            # recorded with all of its files
             ScreenshotHandler.extract_widget_screenshots(
                 screenshot,
                 root_widget_object,
-                cls.yolo_widget_data.get_geometry_items())
+                cls.widget_data.get_geometry_table(),
+                writer_pool)
+            # the tables of every format are derived here, the writer
+            # thread only reads them
+            cls.widget_data.get_geometry_table(GeometryOutputDataFormat.YOLO)
+            writer_pool.submit_ordered(_export_item, item_num, item_seed,
+                                       screenshot, cls.widget_data)
+            screenshot.release_pixels()
 
             cls.widgets_counter_list \
-                .append(cls.yolo_widget_data.get_geometry_distrib())
-
-        yolo_geom_exporter = ExportGeomDataFactory.get_exporter(
-            GeometryOutputDataFormat.YOLO,
-            cls.EXPORT_WIDGET_GEOM_PATH)
-        yolo_geom_exporter.export(yolo_widget_data_list)
+                .append(cls.widget_data.get_geometry_distrib())
 
-        coco_geom_exporter = ExportGeomDataFactory.get_exporter(
-            GeometryOutputDataFormat.COCO,
-            cls.EXPORT_WIDGET_GEOM_PATH)
-        coco_geom_exporter.export(coco_widget_data_list)
+        for exporter in exporters:
+            writer_pool.submit_ordered(exporter.finish)
+        writer_pool.submit_ordered(manifest.record_finished)
 
-        attr_exporter \
-            = ExportAttrDataFactory.get_exporter(AttributesDataFormat.CSV,
-                                                 cls.EXPORT_WIDGET_ATTR_PATH)
-        attr_exporter.export(yolo_widget_data_list)
+    @classmethod
+    def get_run_seed(cls) -> int:
+        return cls.RUN_SEED if cls.RUN_SEED is not None \
+            else RandomContext.create_run_seed()
 
-        widget_content_exporter \
-            = ExportWidgetContentFactory.get_exporter(ValuesDataFormat.CSV,
-                                                      cls.EXPORT_WIDGET_CONTENT_PATH)
-        widget_content_exporter.export(yolo_widget_data_list)
+    # one widget count for the whole run, derived from the run seed so that
+    # all shards of a run agree on it
+    @classmethod
+    def get_number_of_widgets(cls, run_seed: int) -> int:
+        return Random(run_seed).randint(cls.N_MIN_WIDGETS, cls.N_MAX_WIDGETS)
 
-        cls.print_widgets_distribution()
+    @classmethod
+    def redirect_output(cls, dir_path: Path):
+        cls.EXPORT_WIDGET_GEOM_PATH = dir_path / "geometry"
+        cls.EXPORT_WIDGET_ATTR_PATH = dir_path / "attributes"
+        cls.EXPORT_WIDGET_CONTENT_PATH = dir_path / "content"
+        cls.EXPORT_TAR_SHARDS_PATH = dir_path / "tar"
+        cls.RUN_MANIFEST_PATH = dir_path / "run_manifest.json"
+        cls.GENERATED_TREE_PATH = dir_path / cls.GENERATED_TREE_PATH.name
+        ScreenshotHandler.APP_SCREENSHOTS_PATH = dir_path / "images"
+        ScreenshotHandler.WIDGET_SCREENSHOTS_PATH = dir_path \
+            / "component_images"
+
+        for path in (cls.EXPORT_WIDGET_GEOM_PATH,
+                     cls.EXPORT_WIDGET_ATTR_PATH,
+                     cls.EXPORT_WIDGET_CONTENT_PATH,
+                     ScreenshotHandler.APP_SCREENSHOTS_PATH,
+                     ScreenshotHandler.WIDGET_SCREENSHOTS_PATH):
+            path.mkdir(parents=True, exist_ok=True)
 
     @classmethod
     def print_widgets_distribution(cls):
@@ -133,8 +243,7 @@ class QtDatasetGeneration:
         total = 0
         for d in cls.widgets_counter_list:
             for name, count in d.items():
-                if name in PyQtGuiGenConfig.get_section(
-                        "GeometryDataExport").get_list("widget_except_list"):
+                if name in WidgetCategories.EXCLUDED_NAMES:
                     continue
                 if name not in widget_distrib.keys():
                     widget_distrib[name] = 0
@@ -182,7 +291,7 @@ class QtDatasetGeneration:
     @classmethod
     def choose_stylesheet(cls) -> Path:
         stylesheets_dir = Utils.get_stylesheets_dir_path()
-        stylesheet = stylesheets_dir / choice(cls.STYLESHEETS)
+        stylesheet = stylesheets_dir / _rng.choice(cls.STYLESHEETS)
         print(f"Current stylesheet is {stylesheet.name}")
         return stylesheet
 
@@ -191,11 +300,12 @@ class QtDatasetGeneration:
     # gui exec which happens in take_main_screenshot function
     @classmethod
     def _generate_application_instance(cls, widget_nmbs: int):
-        TreeGeneration.generate_tree(widget_nmbs,
-                                     input_path=cls.TREE_DESCRIPTION_PATH.__str__(),
-                                     output_path=cls.GENERATED_TREE_PATH.__str__())
-        gui_root_widget_object = QtGuiGeneration.generate(
-            cls.GENERATED_TREE_PATH.__str__())
+        tree: TreeDto = TreeGeneration.create_tree(
+            widget_nmbs, input_path=cls.TREE_DESCRIPTION_PATH.__str__())
+        if cls.DUMP_GENERATED_TREE:
+            Utils.write_to_json(tree.root_node,
+                                cls.GENERATED_TREE_PATH.__str__())
+        gui_root_widget_object = QtGuiGeneration.generate_from_tree(tree)
         app = QtW.QApplication.instance()
         cls.set_stylesheet_or_leave_default(app)
         return gui_root_widget_object
@@ -212,6 +322,11 @@ class QtGuiGeneration:
         root_node: NodeDto = Utils.read_from_json(tree_path,
                                                   lambda d: NodeDto(**d))
         tree: TreeDto = TreeDto(root_node)
+        return cls.generate_from_tree(tree)
+
+    @classmethod
+    def generate_from_tree(cls, tree: TreeDto) -> Union[
+        ContainerWidgetObjectMixin, WidgetObjectMixin]:
         root_widget_object = cls._create_gui_from_tree(tree)
         return root_widget_object
 
@@ -247,5 +362,58 @@ class QtGuiGeneration:
         return child_widget_object
 
 
+def _parse_args(args=None) -> Any:
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        description="Generate a dataset of Qt GUI screenshots and "
+                    "annotations")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes; more than one "
+                             "enables sharded generation (default: "
+                             "n_workers from the config)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="run seed; an item depends only on the seed "
+                             "and its index (default: seed from the config "
+                             "or a random one)")
+    parser.add_argument("--item", type=int, default=None,
+                        help="generate only the item with this index, "
+                             "e.g. to reproduce it with --seed; needs "
+                             "--output-dir, so the outputs of the run are "
+                             "not overwritten")
+    parser.add_argument("--output-dir", type=Path, default=None,
+                        help="write images and annotations to this "
+                             "directory instead of the configured ones")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run: skip the items "
+                             "recorded in the run manifest and append to "
+                             "the existing outputs")
+
+    options = parser.parse_args(args)
+    if options.item is not None:
+        if options.output_dir is None:
+            parser.error("--item needs --output-dir")
+        if options.resume:
+            parser.error("--item can not be used with --resume")
+    return options
+
+
 if __name__ == "__main__":
-    QtDatasetGeneration.generate()
+    from guigenerator.qt_guigen.guigen.sharded_guigen import \
+        ShardedDatasetGeneration
+
+    options = _parse_args()
+    if options.output_dir is not None:
+        QtDatasetGeneration.redirect_output(options.output_dir)
+    n_workers = options.workers if options.workers is not None \
+        else ShardedDatasetGeneration.N_WORKERS
+    if options.item is not None:
+        QtDatasetGeneration.generate(range(options.item, options.item + 1),
+                                     seed=options.seed)
+    elif n_workers > 1:
+        ShardedDatasetGeneration.generate(n_workers, resume=options.resume,
+                                          seed=options.seed)
+    else:
+        QtDatasetGeneration.generate(resume=options.resume,
+                                     seed=options.seed)
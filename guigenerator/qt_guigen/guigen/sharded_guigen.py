@@ -0,0 +1,122 @@
+import os
+import shutil
+from multiprocessing import get_context
+from pathlib import Path
+from typing import List, Dict
+
+from guigenerator.qt_guigen.config import PyQtGuiGenConfig
+from guigenerator.qt_guigen.export_data import ExportGeomDataFactory, \
+    ExportAttrDataFactory, ExportWidgetContentFactory, TarShardExporter
+from guigenerator.qt_guigen.guigen.guigen import QtDatasetGeneration
+from guigenerator.qt_guigen.screenshot import ScreenshotHandler
+from guigenerator.qt_guigen.widgets import GeometryOutputDataFormat
+from guigenerator.utils import Utils
+
+
+# Runs QtDatasetGeneration in several worker processes. Every worker owns
+# a QApplication and a contiguous range of dataset items and writes them to
+# its own shard directory; the coordinator merges the shards afterwards.
+class ShardedDatasetGeneration:
+    __config = PyQtGuiGenConfig.get_section("DatasetGeneration")
+
+    N_WORKERS = __config.get_int("n_workers")
+    WORKER_QT_PLATFORM = __config.get("worker_qt_platform")
+    SHARDS_DIR_PATH = __config.get_path("shards_dir_path")
+
+    @classmethod
+    def generate(cls, n_workers: int = N_WORKERS, resume: bool = False,
+                 seed: int = None):
+        # every shard gets the run seed, items are seeded by their index
+        # and so do not depend on the number of workers
+        if seed is None:
+            seed = QtDatasetGeneration.get_run_seed()
+        item_ranges = cls.split_items(QtDatasetGeneration.DATASET_SIZE,
+                                      n_workers)
+        shard_dir_paths = [cls.get_shard_dir_path(shard_index)
+                           for shard_index in range(len(item_ranges))]
+        # file names are built from the global item index, so the shards
+        # never collide and the names do not depend on the shard either
+        shard_args = [(item_range.start, item_range.stop,
+                       str(shard_dir_path), resume, seed)
+                      for item_range, shard_dir_path
+                      in zip(item_ranges, shard_dir_paths)]
+        if not resume:
+            for shard_dir_path in shard_dir_paths:
+                shutil.rmtree(shard_dir_path, ignore_errors=True)
+
+        # spawn gives every worker a fresh interpreter without Qt state
+        # inherited from the coordinator; one shard per worker process
+        # because a process can create only one QApplication
+        context = get_context("spawn")
+        with context.Pool(processes=len(shard_args),
+                          maxtasksperchild=1) as pool:
+            shard_counters = pool.starmap(cls._generate_shard, shard_args)
+
+        cls.merge_shards(shard_dir_paths)
+        for counter_list in shard_counters:
+            QtDatasetGeneration.widgets_counter_list.extend(counter_list)
+        QtDatasetGeneration.print_widgets_distribution()
+
+    @classmethod
+    def split_items(cls, dataset_size: int, n_shards: int) -> List[range]:
+        if n_shards < 1:
+            raise RuntimeError("Number of shards must be positive")
+        bounds = [dataset_size * i // n_shards for i in range(n_shards + 1)]
+        return [range(start, stop) for start, stop in zip(bounds, bounds[1:])
+                if stop > start]
+
+    @classmethod
+    def get_shard_dir_path(cls, shard_index: int) -> Path:
+        return cls.SHARDS_DIR_PATH / f"shard-{shard_index:03d}"
+
+    @classmethod
+    def _generate_shard(cls, start: int, stop: int, shard_dir_path: str,
+                        resume: bool = False,
+                        seed: int = None) -> List[Dict[str, int]]:
+        if cls.WORKER_QT_PLATFORM:
+            os.environ["QT_QPA_PLATFORM"] = cls.WORKER_QT_PLATFORM
+
+        QtDatasetGeneration.redirect_output(Path(shard_dir_path))
+        QtDatasetGeneration.generate(range(start, stop),
+                                     show_distribution=False, resume=resume,
+                                     seed=seed)
+        return QtDatasetGeneration.widgets_counter_list
+
+    @classmethod
+    def merge_shards(cls, shard_dir_paths: List[Path]):
+        for shard_dir_path in shard_dir_paths:
+            cls._move_dir_content(shard_dir_path / "images",
+                                  ScreenshotHandler.APP_SCREENSHOTS_PATH)
+            cls._move_dir_content(shard_dir_path / "component_images",
+                                  ScreenshotHandler.WIDGET_SCREENSHOTS_PATH)
+
+        geometry_dir_paths = [path / "geometry" for path in shard_dir_paths]
+        for geom_format in GeometryOutputDataFormat:
+            ExportGeomDataFactory.get_exporter(
+                geom_format, QtDatasetGeneration.EXPORT_WIDGET_GEOM_PATH) \
+                .merge_shards(geometry_dir_paths)
+
+        ExportAttrDataFactory.get_exporter(
+            QtDatasetGeneration.ATTR_DATA_FORMAT,
+            QtDatasetGeneration.EXPORT_WIDGET_ATTR_PATH) \
+            .merge_shards([path / "attributes" for path in shard_dir_paths])
+
+        ExportWidgetContentFactory.get_exporter(
+            QtDatasetGeneration.VALUES_DATA_FORMAT,
+            QtDatasetGeneration.EXPORT_WIDGET_CONTENT_PATH) \
+            .merge_shards([path / "content" for path in shard_dir_paths])
+
+        if TarShardExporter.IS_ENABLED:
+            TarShardExporter(QtDatasetGeneration.EXPORT_TAR_SHARDS_PATH) \
+                .merge_shards([path / "tar" for path in shard_dir_paths])
+
+        for shard_dir_path in shard_dir_paths:
+            shutil.rmtree(shard_dir_path, ignore_errors=True)
+
+    @classmethod
+    def _move_dir_content(cls, src_dir_path: Path, dst_dir_path: Path):
+        if not src_dir_path.exists():
+            return
+        for file_path in src_dir_path.iterdir():
+            if file_path.is_file():
+                Utils.move_file(file_path, dst_dir_path / file_path.name)
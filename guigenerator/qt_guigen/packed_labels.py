@@ -0,0 +1,208 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from guigenerator.qt_guigen.config import PyQtGuiGenConfig
+
+
+# Labels of many images appended to a few shard files instead of a file per
+# image. <name>.index holds a JSON line per image with its stem, the shard
+# file and the byte range of its labels in it; a new shard file is started
+# every items_per_shard images. The writer state is the shard and the sizes
+# of the shard and the index, a resumed run truncates the files to it and
+# removes the later shards.
+class PackedLabelWriter:
+    INDEX_SUFFIX = ".index"
+    SHARD_SUFFIX = ".pack"
+
+    def __init__(self, dir_path: Path, name: str, items_per_shard: int):
+        if items_per_shard < 1:
+            raise RuntimeError("Number of items per shard must be positive")
+        self._dir_path = dir_path
+        self._name = name
+        self._items_per_shard = items_per_shard
+        self._shard = 0
+        self._shard_items = 0
+        self._shard_file = None
+        self._index_file = None
+
+    @classmethod
+    def get_index_path(cls, dir_path: Path, name: str) -> Path:
+        return dir_path / (name + cls.INDEX_SUFFIX)
+
+    @classmethod
+    def get_shard_name(cls, name: str, shard: int) -> str:
+        return f"{name}-{shard:05d}{cls.SHARD_SUFFIX}"
+
+    def open(self, state: Dict[str, Any] = None):
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+        index_path = self.get_index_path(self._dir_path, self._name)
+        if state is None:
+            self.remove_pack(self._dir_path, self._name)
+            self._shard = 0
+            self._shard_items = 0
+            self._index_file = open(index_path, "wb")
+            self._shard_file = open(self.__get_shard_path(), "wb")
+            return
+
+        self._shard = state["shard"]
+        self._shard_items = state["shard_items"]
+        self._index_file = self.__open_truncated(index_path,
+                                                 state["index_size"])
+        self._shard_file = self.__open_truncated(self.__get_shard_path(),
+                                                 state["shard_size"])
+        # the shards started after the state hold only dropped labels
+        self.remove_shards(self._dir_path, self._name, self._shard + 1)
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"shard": self._shard, "shard_items": self._shard_items,
+                "shard_size": self._shard_file.tell(),
+                "index_size": self._index_file.tell()}
+
+    def write(self, stem: str, text: str):
+        if self._shard_items == self._items_per_shard:
+            self._shard_file.close()
+            self._shard += 1
+            self._shard_items = 0
+            self._shard_file = open(self.__get_shard_path(), "wb")
+
+        data = text.encode()
+        entry = {"stem": stem,
+                 "shard": self.get_shard_name(self._name, self._shard),
+                 "offset": self._shard_file.tell(), "size": len(data)}
+        self._shard_file.write(data)
+        self._index_file.write((json.dumps(entry) + "\n").encode())
+        self._shard_items += 1
+
+    def flush(self):
+        self._shard_file.flush()
+        self._index_file.flush()
+
+    def close(self):
+        for file in (self._shard_file, self._index_file):
+            if file is not None:
+                file.close()
+        self._shard_file = None
+        self._index_file = None
+
+    @classmethod
+    def remove_pack(cls, dir_path: Path, name: str):
+        cls.get_index_path(dir_path, name).unlink(missing_ok=True)
+        cls.remove_shards(dir_path, name)
+
+    @classmethod
+    def remove_shards(cls, dir_path: Path, name: str, first_shard: int = 0):
+        # removes the shards numbered first_shard and on
+        for shard_path in dir_path.glob(f"{name}-*{cls.SHARD_SUFFIX}"):
+            shard = shard_path.stem[len(name) + 1:]
+            if shard.isdigit() and int(shard) >= first_shard:
+                shard_path.unlink()
+
+    @classmethod
+    def merge(cls, src_dir_paths: List[Path], dst_dir_path: Path, name: str):
+        # moves the shard files of every pack, numbering them on, and
+        # joins the indexes in the order of src_dir_paths
+        dst_dir_path.mkdir(parents=True, exist_ok=True)
+        cls.remove_pack(dst_dir_path, name)
+        shard = 0
+        with open(cls.get_index_path(dst_dir_path, name), "w") as out:
+            for src_dir_path in src_dir_paths:
+                index_path = cls.get_index_path(src_dir_path, name)
+                if not index_path.exists():
+                    continue
+                shard_names: Dict[str, str] = {}
+                for entry in PackedLabelReader.read_index(index_path):
+                    if entry["shard"] not in shard_names:
+                        shard_names[entry["shard"]] = \
+                            cls.get_shard_name(name, shard)
+                        shard += 1
+                    entry["shard"] = shard_names[entry["shard"]]
+                    out.write(json.dumps(entry) + "\n")
+                for src_name, dst_name in shard_names.items():
+                    (src_dir_path / src_name).replace(dst_dir_path / dst_name)
+
+    def __get_shard_path(self) -> Path:
+        return self._dir_path / self.get_shard_name(self._name, self._shard)
+
+    @classmethod
+    def __open_truncated(cls, path: Path, size: int):
+        if not path.exists():
+            raise RuntimeError(f"Can not resume, {path} is missing")
+        file = open(path, "ab")
+        file.truncate(size)
+        file.seek(0, 2)
+        return file
+
+
+class PackedLabelReader:
+    def __init__(self, dir_path: Path, name: str):
+        self._dir_path = dir_path
+        # a stem written again, e.g. by a resumed run, takes the last entry
+        self._entries: Dict[str, Tuple[str, int, int]] = {
+            entry["stem"]: (entry["shard"], entry["offset"], entry["size"])
+            for entry in self.read_index(
+                PackedLabelWriter.get_index_path(dir_path, name))}
+
+    @classmethod
+    def read_index(cls, index_path: Path) -> List[Dict[str, Any]]:
+        with open(index_path, "r") as fin:
+            return [json.loads(line) for line in fin]
+
+    def get_stems(self) -> List[str]:
+        return list(self._entries.keys())
+
+    def read(self, stem: str) -> str:
+        shard_name, offset, size = self._entries[stem]
+        with open(self._dir_path / shard_name, "rb") as fin:
+            fin.seek(offset)
+            return fin.read(size).decode()
+
+    def expand(self, dst_dir_path: Path, extension: str) -> int:
+        # writes the classic Darknet layout, a label file per image
+        dst_dir_path.mkdir(parents=True, exist_ok=True)
+        stems_by_shard: Dict[str, List[str]] = {}
+        for stem, (shard_name, _, _) in self._entries.items():
+            stems_by_shard.setdefault(shard_name, []).append(stem)
+
+        for shard_name, stems in stems_by_shard.items():
+            with open(self._dir_path / shard_name, "rb") as fin:
+                for stem in stems:
+                    _, offset, size = self._entries[stem]
+                    fin.seek(offset)
+                    with open(dst_dir_path / (stem + extension), "wb") as out:
+                        out.write(fin.read(size))
+        return len(self._entries)
+
+
+def _parse_args(args=None) -> Any:
+    if args is None:
+        args = sys.argv[1:]
+
+    config = PyQtGuiGenConfig.get_section("YoloGeometryDataExport")
+    parser = argparse.ArgumentParser(
+        description="Expand packed YOLO labels to a label file per image")
+    parser.add_argument("dir", type=Path,
+                        help="directory with the packed labels")
+    parser.add_argument("--output-dir", type=Path, default=None,
+                        help="write the label files to this directory "
+                             "(default: the packed labels directory)")
+    parser.add_argument("--name", default=config.get("packed_name"),
+                        help="name of the pack (default: packed_name from "
+                             "the config)")
+    parser.add_argument("--extension",
+                        default=config.get("geometry_files_extension"),
+                        help="extension of the label files (default: "
+                             "geometry_files_extension from the config)")
+
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    options = _parse_args()
+    output_dir = options.output_dir if options.output_dir is not None \
+        else options.dir
+    n_files = PackedLabelReader(options.dir, options.name) \
+        .expand(output_dir, options.extension)
+    print(f"Wrote {n_files} label files to {output_dir}")
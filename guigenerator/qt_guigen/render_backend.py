@@ -0,0 +1,60 @@
+from abc import ABC, abstractmethod
+from enum import Enum
+
+import PySide6.QtCore as QtC
+import PySide6.QtGui as QtG
+import PySide6.QtWidgets as QtW
+
+
+class RenderBackendType(Enum):
+    # grab the area of the window from the screen framebuffer
+    SCREEN = "screen"
+    # render the window itself into an image, works without a display
+    # (QT_QPA_PLATFORM=offscreen)
+    WIDGET = "widget"
+
+
+class RenderBackendFactory:
+    @classmethod
+    def get_backend(cls, backend_type: RenderBackendType) -> 'RenderBackend':
+        if backend_type == RenderBackendType.SCREEN:
+            return ScreenRenderBackend()
+        elif backend_type == RenderBackendType.WIDGET:
+            return WidgetRenderBackend()
+        else:
+            raise RuntimeError(f"Wrong render backend: {backend_type}")
+
+
+class RenderBackend(ABC):
+    @abstractmethod
+    def capture(self, window: QtW.QWidget, margin: int) -> QtG.QImage:
+        pass
+
+
+class ScreenRenderBackend(RenderBackend):
+    def capture(self, window: QtW.QWidget, margin: int) -> QtG.QImage:
+        x = window.geometry().x() - margin
+        y = window.geometry().y() - margin
+        w = window.geometry().width() + 2 * margin
+        h = window.geometry().height() + 2 * margin
+
+        win_id = 0
+        return QtG.QGuiApplication.primaryScreen() \
+            .grabWindow(win_id, x, y, w, h).toImage()
+
+
+class WidgetRenderBackend(RenderBackend):
+    MARGIN_COLOR = QtG.QColorConstants.White
+
+    def capture(self, window: QtW.QWidget, margin: int) -> QtG.QImage:
+        w = window.geometry().width() + 2 * margin
+        h = window.geometry().height() + 2 * margin
+
+        image = QtG.QImage(w, h, QtG.QImage.Format_RGB32)
+        image.fill(self.MARGIN_COLOR)
+        painter = QtG.QPainter(image)
+        try:
+            window.render(painter, QtC.QPoint(margin, margin))
+        finally:
+            painter.end()
+        return image
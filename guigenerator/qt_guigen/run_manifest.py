@@ -0,0 +1,116 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Any
+
+
+# Journal of a generation run: a header line followed by one JSON line per
+# finished item. A record is written with a single write and fsync'ed, so
+# after a crash the file holds every finished item and at most a torn last
+# line, which load() drops. Every record carries the exporters' state after
+# the item, which is what a resumed run continues from.
+class RunManifest:
+    VERSION = 1
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._file = None
+        self._items: Dict[int, Dict[str, Any]] = {}
+        self._exporter_states: Dict[str, Dict[str, Any]] = {}
+        self._is_finished = False
+        self._seed: int = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    @property
+    def is_finished(self) -> bool:
+        return self._is_finished
+
+    @property
+    def exporter_states(self) -> Dict[str, Dict[str, Any]]:
+        return self._exporter_states
+
+    def start(self, item_range: range, seed: int):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._items = {}
+        self._exporter_states = {}
+        self._is_finished = False
+        self._seed = seed
+        self._file = open(self._path, "w")
+        self.__write_record(self.__create_header(item_range, seed))
+
+    def load(self, item_range: range):
+        if not self._path.exists():
+            raise RuntimeError(f"No run manifest to resume: {self._path}")
+
+        valid_size = 0
+        records = []
+        with open(self._path, "rb") as fin:
+            for line in fin:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_size += len(line)
+
+        # a resumed run continues with the seed the run was started with
+        if not records or records[0] != self.__create_header(
+                item_range, records[0].get("seed")):
+            raise RuntimeError(f"Run manifest {self._path} was written for "
+                               f"other run settings")
+        self._seed = records[0]["seed"]
+
+        for record in records[1:]:
+            if record.get("finished"):
+                self._is_finished = True
+            else:
+                self._items[record["index"]] = record
+                self._exporter_states = record["exporters"]
+
+        self._file = open(self._path, "r+")
+        self._file.truncate(valid_size)
+        self._file.seek(valid_size)
+
+    def is_item_done(self, item_index: int) -> bool:
+        return item_index in self._items
+
+    def get_distributions(self) -> List[Dict[str, int]]:
+        return [record["distribution"] for record in self._items.values()]
+
+    def record_item(self, item_index: int, item_seed: int, files: List[str],
+                    exporter_states: Dict[str, Dict[str, Any]],
+                    distribution: Dict[str, int]):
+        record = {"index": item_index, "seed": item_seed, "files": files,
+                  "exporters": exporter_states,
+                  "distribution": distribution}
+        self.__write_record(record)
+        self._items[item_index] = record
+        self._exporter_states = exporter_states
+
+    def record_finished(self):
+        self.__write_record({"finished": True})
+        self._is_finished = True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __write_record(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    @classmethod
+    def __create_header(cls, item_range: range,
+                        seed: int) -> Dict[str, Any]:
+        return {"version": cls.VERSION, "item_start": item_range.start,
+                "item_stop": item_range.stop, "seed": seed}
@@ -1,23 +1,42 @@
+import io
+from concurrent.futures import Future
 from datetime import datetime
+from enum import Enum
 from pathlib import Path
-from random import choice
-from typing import Dict, Callable, Tuple
+from typing import Dict, Callable, Tuple, List
 
+import numpy as np
 import PySide6.QtGui as QtG
 import PySide6.QtWidgets as QtW
 from PIL import Image
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import QTimer, QElapsedTimer
 
 import \
     guigenerator.qt_guigen.widgets.widgetobject.wo_concrete as wo
+from guigenerator.qt_guigen.capture_readiness import RenderReadinessWatcher
 from guigenerator.qt_guigen.config import PyQtGuiGenConfig
-from guigenerator.qt_guigen.widgets.widget_geometry import WidgetGeometry, \
-    WidgetGeometryUtils
+from guigenerator.qt_guigen.render_backend import RenderBackendFactory, \
+    RenderBackendType
+from guigenerator.qt_guigen.widgets import GeometryOutputDataFormat
+from guigenerator.qt_guigen.widgets.geometry_table import GeometryTable
+from guigenerator.qt_guigen.widgets.widget_categories import \
+    WidgetCategories
 from guigenerator.qt_guigen.widgets.widget_names import WidgetNames
 from guigenerator.qt_guigen.widgets.widgetobject.wo_abc import \
     ContainerWidgetObjectMixin
+from guigenerator.qt_guigen.writer_pool import BackgroundWriterPool
+from guigenerator.random_context import RandomContext
 from guigenerator.utils import Utils
 
+_rng = RandomContext.get_rng()
+
+
+class CaptureMode(Enum):
+    # capture after fixed millis_before_* delays
+    TIMERS = "timers"
+    # capture as soon as the window has settled, delays are upper bounds
+    READY = "ready"
+
 
 class ScreenshotHandler:
     __config = PyQtGuiGenConfig.get_section("DatasetGeneration")
@@ -29,25 +48,44 @@ class ScreenshotHandler:
     MILLIS_BEFORE_TAB_PRESSED = __config.get_int("millis_before_tab_pressed")
     MILLIS_BEFORE_SCREENSHOT = __config.get_int("millis_before_screenshot")
     MILLIS_BEFORE_APP_EXIT = __config.get_int("millis_before_app_exit")
+    CAPTURE_MODE = CaptureMode(__config.get("capture_mode"))
+    RENDER_BACKEND = RenderBackendFactory.get_backend(
+        RenderBackendType(__config.get("render_backend")))
 
     SCREENSHOT_MARGIN = PyQtGuiGenConfig.get_section("WidgetGeometry").get_int(
         "default_screenshot_margin")
-    WIDGETS_FOR_EXPORT = PyQtGuiGenConfig.get_section(
-        "AttributeDataExport").get_list("widgets_for_export")
+    WIDGETS_FOR_EXPORT = WidgetCategories.ATTRIBUTE_NAMES
 
     FOCUS_WIDGET_NAMES = __config.get_list("focus_widgets")
 
+    # without image files the encoded images go only into the tar shards
+    __tar_config = PyQtGuiGenConfig.get_section("TarShardExport")
+    WRITE_IMAGE_FILES = not __tar_config.get_boolean("enabled") \
+        or __tar_config.get_boolean("image_files")
+
+    SCREENSHOT_NAME_PREFIX = "img"
+
     APP_SCREENSHOTS_PATH.mkdir(parents=True, exist_ok=True)
     WIDGET_SCREENSHOTS_PATH.mkdir(parents=True, exist_ok=True)
 
     @classmethod
     def take_main_screenshot(cls, main_window: wo.MainWindowWidget,
-                             do_while_taking: Callable) -> 'Screenshot':
+                             do_while_taking: Callable,
+                             writer_pool: BackgroundWriterPool = None,
+                             item_index: int = None) -> 'Screenshot':
         take_mw_screenshot_function, screenshot \
             = cls.__get_take_main_window_screenshot_function(
-            main_window.widget)
+            main_window.widget, writer_pool, item_index)
+        focus_widget_function = cls.__get_func_to_focus_widget(main_window)
+
+        if cls.CAPTURE_MODE == CaptureMode.READY:
+            cls.__take_when_ready(main_window.widget, focus_widget_function,
+                                  take_mw_screenshot_function,
+                                  do_while_taking)
+            return screenshot
+
         QTimer.singleShot(cls.MILLIS_BEFORE_TAB_PRESSED,
-                          cls.__get_func_to_focus_widget(main_window))
+                          focus_widget_function)
         QTimer.singleShot(cls.MILLIS_BEFORE_SCREENSHOT,
                           take_mw_screenshot_function)
         QTimer.singleShot(cls.MILLIS_BEFORE_SCREENSHOT, do_while_taking)
@@ -57,6 +95,24 @@ class ScreenshotHandler:
 
         return screenshot
 
+    @classmethod
+    def __take_when_ready(cls, main_window: QtW.QMainWindow,
+                          focus_widget_function: Callable,
+                          take_mw_screenshot_function: Callable,
+                          do_while_taking: Callable):
+        timer = QElapsedTimer()
+        timer.start()
+        watcher = RenderReadinessWatcher(main_window)
+        try:
+            watcher.wait_until_settled(cls.MILLIS_BEFORE_TAB_PRESSED)
+            focus_widget_function()
+            watcher.wait_until_settled(
+                max(0, cls.MILLIS_BEFORE_SCREENSHOT - timer.elapsed()))
+            take_mw_screenshot_function()
+            do_while_taking()
+        finally:
+            watcher.detach()
+
     @classmethod
     def __get_func_to_focus_widget(
             cls,
@@ -83,86 +139,199 @@ class ScreenshotHandler:
             wo_class = getattr(wo, class_name)
             children.extend(root_widget.find_descendants(wo_class))
         if children:
-            chosen_widget = choice(children)
+            chosen_widget = _rng.choice(children)
         else:
             chosen_widget = root_widget
         return chosen_widget
 
     @classmethod
-    def __get_take_main_window_screenshot_function(cls,
-                                                   main_window:
-                                                   QtW.QMainWindow):
+    def __get_take_main_window_screenshot_function(
+            cls,
+            main_window: QtW.QMainWindow,
+            writer_pool: BackgroundWriterPool = None,
+            item_index: int = None):
+
+        # names built from the item index stay the same when a resumed run
+        # generates an interrupted item again
+        if item_index is None:
+            name_stem = f'{cls.SCREENSHOT_NAME_PREFIX}-' \
+                        f'{datetime.now().strftime("%Y%m%d-%H%M%S-%f")}'
+        else:
+            name_stem = f'{cls.SCREENSHOT_NAME_PREFIX}-{item_index:06d}'
 
-        screenshot: QtG.QPixmap = QtG.QPixmap()
         if len(cls.SCREENSHOT_QUALITIES) > 1:
             filenames = [
-                f'img-{datetime.now().strftime("%Y%m%d-%H%M%S-%f")}-q' \
-                f'{quality}.{cls.SCREENSHOT_FORMAT}'
+                f'{name_stem}-q{quality}.{cls.SCREENSHOT_FORMAT}'
                 for quality in cls.SCREENSHOT_QUALITIES]
         else:
-            filenames = [
-                f'img-{datetime.now().strftime("%Y%m%d-%H%M%S-%f")}.'
-                f'{cls.SCREENSHOT_FORMAT}']
+            filenames = [f'{name_stem}.{cls.SCREENSHOT_FORMAT}']
 
         def _take_screenshot_function():
-            x = main_window.geometry().x() - cls.SCREENSHOT_MARGIN
-            y = main_window.geometry().y() - cls.SCREENSHOT_MARGIN
-            w = main_window.geometry().width() + 2 * cls.SCREENSHOT_MARGIN
-            h = main_window.geometry().height() + 2 * \
-                cls.SCREENSHOT_MARGIN
-
-            win_id = 0
-            screenshot = QtG.QGuiApplication.primaryScreen().grabWindow(win_id,
-                                                                        x, y,
-                                                                        w, h)
+            image = cls.RENDER_BACKEND.capture(main_window,
+                                               cls.SCREENSHOT_MARGIN)
+            screenshot.set_image(image)
 
             for i, filename in enumerate(filenames):
-                save_path = str(
-                    Path(cls.APP_SCREENSHOTS_PATH) / Path(filename))
+                save_path = Path(cls.APP_SCREENSHOTS_PATH) / Path(filename)
                 q = int(cls.SCREENSHOT_QUALITIES[i])
-                screenshot.save(save_path, quality=q)
+                cls.__save_screenshot_region(writer_pool, screenshot, None,
+                                             save_path, q)
 
         best_screenshot_filename = max(enumerate(filenames),
                                        key=lambda x: cls.SCREENSHOT_QUALITIES[
                                            x[0]])[1]
         best_screenshot_save_path = Path(
             cls.APP_SCREENSHOTS_PATH) / best_screenshot_filename
-        return _take_screenshot_function, Screenshot(best_screenshot_save_path)
+        screenshot = Screenshot(best_screenshot_save_path)
+        return _take_screenshot_function, screenshot
+
+    @classmethod
+    def encode_pixels(cls, pixels: np.ndarray, suffix: str,
+                      quality: int = -1) -> bytes:
+        img = Image.fromarray(pixels)
+        suffix = suffix.lower()
+        image_format = Image.registered_extensions().get(suffix)
+        if image_format is None:
+            raise RuntimeError(f"Unknown image format: {suffix}")
+        out = io.BytesIO()
+        if quality < 0:
+            img.save(out, image_format)
+        elif suffix == ".png":
+            # same quality to zlib level mapping as QImage.save uses
+            img.save(out, image_format,
+                     compress_level=(100 - min(quality, 100)) * 9 // 91)
+        elif suffix in (".jpg", ".jpeg"):
+            img.save(out, image_format, quality=min(quality, 100))
+        else:
+            img.save(out, image_format)
+        return out.getvalue()
+
+    @classmethod
+    def save_pixels(cls, pixels: np.ndarray, save_path: Path,
+                    quality: int = -1):
+        save_path.write_bytes(cls.encode_pixels(pixels, save_path.suffix,
+                                                quality))
+
+    @classmethod
+    def __save_screenshot_region(cls, writer_pool: BackgroundWriterPool,
+                                 screenshot: 'Screenshot',
+                                 box: Tuple[int, int, int, int],
+                                 save_path: Path, quality: int = -1):
+        # the task gets the image that owns the memory the pixel view
+        # points to, so the screenshot may release its buffer before the
+        # task has run. The task gives the encoded image, which the tar
+        # shards take without reading the file back
+        def _save(image: QtG.QImage, pixels: np.ndarray) -> bytes:
+            region = pixels if box is None \
+                else Screenshot.crop_pixels(pixels, *box)
+            data = cls.encode_pixels(region, save_path.suffix, quality)
+            if cls.WRITE_IMAGE_FILES:
+                save_path.write_bytes(data)
+            return data
+
+        if writer_pool is None:
+            future = Future()
+            future.set_result(_save(screenshot.image, screenshot.pixels))
+        else:
+            future = writer_pool.submit(_save, screenshot.image,
+                                        screenshot.pixels)
+        screenshot.add_written_file(save_path, future)
 
     @classmethod
     def extract_widget_screenshots(cls, screenshot: 'Screenshot',
                                    main_window: ContainerWidgetObjectMixin,
-                                   widgets_geom_dict: Dict[
-                                       str, Dict[int, WidgetGeometry]]):
-
-        main_window_w = main_window.widget.geometry().width() + 2 * \
-                        cls.SCREENSHOT_MARGIN
-        main_window_h = main_window.widget.geometry().height() + 2 * \
-                        cls.SCREENSHOT_MARGIN
-
-        img: Image = Image.open(screenshot.fullpath)
-        for widget_name, geom_dict in widgets_geom_dict:
-            if widget_name in cls.WIDGETS_FOR_EXPORT:
-                for widget_id, widget_geom in geom_dict.items():
-                    geom = WidgetGeometryUtils.convert_yolo_to_coco(
-                        widget_geom, main_window_w, main_window_h)
-                    left, upper = int(geom.x), int(geom.y)
-                    right, lower = left + int(geom.width), upper + int(
-                        geom.height)
-                    widget_img = img.copy().crop((left, upper, right, lower))
-
-                    filename = Path(
-                        widget_name + '-' + screenshot.filestem.split('-q')[
-                            0] + '-' + str(widget_id)
-                        + screenshot.filesuffix)
-                    widget_img.save(
-                        Path(cls.WIDGET_SCREENSHOTS_PATH) / filename)
+                                   geometry_table: GeometryTable,
+                                   writer_pool: BackgroundWriterPool = None):
+        if geometry_table.format != GeometryOutputDataFormat.COCO:
+            geometry_table = geometry_table.to_pixels(screenshot.width,
+                                                      screenshot.height)
+        table = geometry_table.group_by_name() \
+            .select_names(cls.WIDGETS_FOR_EXPORT)
+        clipped_boxes = table.clip(screenshot.width,
+                                   screenshot.height).get_boxes()
+        is_visible = (clipped_boxes[:, 2] > 0) & (clipped_boxes[:, 3] > 0)
+        table = table.select(is_visible)
+
+        stem = screenshot.filestem.split('-q')[0]
+        for widget_name, widget_id, (left, upper, w, h) in zip(
+                table.get_names(), table.rows["widget_id"].tolist(),
+                table.get_boxes().tolist()):
+            filename = Path(widget_name + '-' + stem + '-' + str(widget_id)
+                            + screenshot.filesuffix)
+            save_path = Path(cls.WIDGET_SCREENSHOTS_PATH) / filename
+            cls.__save_screenshot_region(
+                writer_pool, screenshot, (left, upper, left + w, upper + h),
+                save_path)
+            screenshot.add_widget_crop(widget_name, widget_id, save_path)
 
 
 class Screenshot:
     def __init__(self, fullpath: Path):
         self._fullpath = fullpath
         self._size: Tuple[int, int] = -1, -1
+        self._image: QtG.QImage = None
+        self._pixels: np.ndarray = None
+        # the encoding task of every image file, by file path
+        self._written_files: Dict[Path, Future] = {}
+        self._widget_crops: List[Tuple[str, int, Path]] = []
+
+    def set_image(self, image: QtG.QImage):
+        # RGB888 rows are padded to 4 bytes, so the pixel array is a view
+        # over the image memory that skips the padding
+        self._image = image.convertToFormat(QtG.QImage.Format_RGB888)
+        w, h = self._image.width(), self._image.height()
+        buffer = np.frombuffer(self._image.constBits(), dtype=np.uint8,
+                               count=self._image.bytesPerLine() * h)
+        self._pixels = buffer.reshape(h, self._image.bytesPerLine())[
+                       :, :w * 3].reshape(h, w, 3)
+        self._size = w, h
+
+    @property
+    def pixels(self) -> np.ndarray:
+        if self._pixels is None:
+            with Image.open(str(self.fullpath)) as img:
+                self._pixels = np.asarray(img.convert("RGB"))
+            self._size = self._pixels.shape[1], self._pixels.shape[0]
+        return self._pixels
+
+    @property
+    def image(self) -> QtG.QImage:
+        return self._image
+
+    def add_written_file(self, file_path: Path, future: Future):
+        self._written_files[file_path] = future
+
+    def add_widget_crop(self, widget_name: str, widget_id: int,
+                        file_path: Path):
+        self._widget_crops.append((widget_name, widget_id, file_path))
+
+    @property
+    def widget_crops(self) -> List[Tuple[str, int, Path]]:
+        return self._widget_crops
+
+    def wait_written_files(self) -> List[Path]:
+        # raises if writing any of the files failed
+        for future in self._written_files.values():
+            future.result()
+        return list(self._written_files)
+
+    def get_encoded_file(self, file_path: Path) -> bytes:
+        # waits for the file to be encoded, raises if that failed
+        return self._written_files[file_path].result()
+
+    def release_pixels(self):
+        self._image = None
+        self._pixels = None
+
+    def crop(self, left: int, upper: int, right: int,
+             lower: int) -> np.ndarray:
+        return self.crop_pixels(self.pixels, left, upper, right, lower)
+
+    @classmethod
+    def crop_pixels(cls, pixels: np.ndarray, left: int, upper: int,
+                    right: int, lower: int) -> np.ndarray:
+        h, w = pixels.shape[:2]
+        return pixels[max(0, upper):min(h, lower), max(0, left):min(w, right)]
 
     def _set_size(self):
         with Image.open(str(self.fullpath)) as img:
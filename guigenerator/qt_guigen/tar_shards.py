@@ -0,0 +1,104 @@
+import io
+import tarfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+# Writes samples one after another to <name>-NNNNN.tar shard files. The
+# members of a sample are named <key>.<extension>, which is the layout
+# WebDataset and similar streaming readers expect. A new shard is started
+# when the next sample would make the shard larger than max_shard_size.
+# The writer state is the shard and its size, a resumed run truncates the
+# shard to it, removes the later shards and appends to it.
+class TarShardWriter:
+    SHARD_SUFFIX = ".tar"
+
+    def __init__(self, dir_path: Path, name: str, max_shard_size: int):
+        if max_shard_size < 1:
+            raise RuntimeError("Maximum shard size must be positive")
+        self._dir_path = dir_path
+        self._name = name
+        self._max_shard_size = max_shard_size
+        self._shard = 0
+        self._tar: tarfile.TarFile = None
+
+    @classmethod
+    def get_shard_name(cls, name: str, shard: int) -> str:
+        return f"{name}-{shard:05d}{cls.SHARD_SUFFIX}"
+
+    def open(self, state: Dict[str, Any] = None):
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+        if state is None:
+            self.remove_shards(self._dir_path, self._name)
+            self._shard = 0
+            self._tar = tarfile.open(self.__get_shard_path(), "w")
+            return
+
+        self._shard = state["shard"]
+        shard_path = self.__get_shard_path()
+        if not shard_path.exists():
+            raise RuntimeError(f"Can not resume, {shard_path} is missing")
+        # the shards started after the state hold only dropped samples
+        self.remove_shards(self._dir_path, self._name, self._shard + 1)
+        # tarfile appends only to archives that end with the end of archive
+        # blocks, they are written again after the dropped samples
+        with open(shard_path, "r+b") as shard_file:
+            shard_file.truncate(state["shard_size"])
+            shard_file.seek(state["shard_size"])
+            shard_file.write(bytes(2 * tarfile.BLOCKSIZE))
+        self._tar = tarfile.open(shard_path, "a")
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"shard": self._shard, "shard_size": self._tar.offset}
+
+    def write(self, key: str, members: List[Tuple[str, bytes]]):
+        sample_size = sum(tarfile.BLOCKSIZE
+                          + self.__get_padded_size(len(data))
+                          for _, data in members)
+        if self._tar.offset > 0 \
+                and self._tar.offset + sample_size > self._max_shard_size:
+            self._tar.close()
+            self._shard += 1
+            self._tar = tarfile.open(self.__get_shard_path(), "w")
+
+        for extension, data in members:
+            info = tarfile.TarInfo(f"{key}.{extension}")
+            info.size = len(data)
+            self._tar.addfile(info, io.BytesIO(data))
+
+    def flush(self):
+        self._tar.fileobj.flush()
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+    @classmethod
+    def remove_shards(cls, dir_path: Path, name: str, first_shard: int = 0):
+        # removes the shards numbered first_shard and on
+        for shard_path in dir_path.glob(f"{name}-*{cls.SHARD_SUFFIX}"):
+            shard = shard_path.stem[len(name) + 1:]
+            if shard.isdigit() and int(shard) >= first_shard:
+                shard_path.unlink()
+
+    @classmethod
+    def merge(cls, src_dir_paths: List[Path], dst_dir_path: Path, name: str):
+        # moves the shards of every directory, numbering them on in the
+        # order of src_dir_paths
+        dst_dir_path.mkdir(parents=True, exist_ok=True)
+        cls.remove_shards(dst_dir_path, name)
+        shard = 0
+        for src_dir_path in src_dir_paths:
+            for shard_path in sorted(
+                    src_dir_path.glob(f"{name}-*{cls.SHARD_SUFFIX}")):
+                shard_path.replace(
+                    dst_dir_path / cls.get_shard_name(name, shard))
+                shard += 1
+
+    def __get_shard_path(self) -> Path:
+        return self._dir_path / self.get_shard_name(self._name, self._shard)
+
+    @classmethod
+    def __get_padded_size(cls, size: int) -> int:
+        return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
@@ -0,0 +1,248 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from enum import Enum
+from http.client import HTTPException
+from pathlib import Path
+from string import punctuation, whitespace
+from typing import Any, Callable, Dict, List
+
+from guigenerator.http_requests import FishTextWebsiteHttpRequest
+from guigenerator.qt_guigen.config import PyQtGuiGenConfig
+
+
+class TextKind(Enum):
+    SENTENCE = "sentence"
+    TITLE = "title"
+    PARAGRAPH = "paragraph"
+    # words of the sentences of an extra request
+    WORD = "word"
+
+
+# Read only text corpus file. It starts with the magic, the format version
+# and the size of a JSON table, the table gives the source of the texts and
+# the offset, size and number of the texts of every kind. The texts of a
+# kind follow as a zlib block of NUL separated UTF-8 strings. The file is
+# memory-mapped and a kind is decompressed when its texts are first taken.
+class TextCorpusCache:
+    MAGIC = b"GGTC"
+    VERSION = 1
+    __HEADER = struct.Struct("<4sII")
+    __SEPARATOR = "\0"
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._texts: Dict[TextKind, List[str]] = {}
+        with open(path, "rb") as fin:
+            try:
+                self._map = mmap.mmap(fin.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+            except ValueError:
+                raise RuntimeError(f"Text corpus {path} is empty")
+        if len(self._map) < self.__HEADER.size:
+            raise RuntimeError(f"Text corpus {path} is truncated")
+        magic, version, table_size = self.__HEADER.unpack_from(self._map)
+        if magic != self.MAGIC:
+            raise RuntimeError(f"{path} is not a text corpus")
+        if version != self.VERSION:
+            raise RuntimeError(
+                f"Text corpus {path} has version {version}, expected "
+                f"{self.VERSION}; refresh it with "
+                f"python -m guigenerator.qt_guigen.text_corpus")
+        self._data_offset = self.__HEADER.size + table_size
+        try:
+            self._table = json.loads(self._map[
+                self.__HEADER.size:self._data_offset].decode("utf-8"))
+        except ValueError:
+            raise RuntimeError(f"Text corpus {path} is corrupt")
+
+    @property
+    def source(self) -> str:
+        return self._table["source"]
+
+    @property
+    def created(self) -> str:
+        return self._table["created"]
+
+    def get_texts(self, kind: TextKind) -> List[str]:
+        if kind not in self._texts:
+            if kind.value not in self._table["kinds"]:
+                raise RuntimeError(
+                    f"Text corpus {self._path} has no {kind.value} texts")
+            entry = self._table["kinds"][kind.value]
+            start = self._data_offset + entry["offset"]
+            try:
+                block = zlib.decompress(
+                    self._map[start:start + entry["size"]])
+                texts = block.decode("utf-8").split(self.__SEPARATOR) \
+                    if entry["count"] else []
+            except (zlib.error, ValueError):
+                raise RuntimeError(f"Text corpus {self._path} is corrupt")
+            self._texts[kind] = texts
+        return self._texts[kind]
+
+    def close(self):
+        self._map.close()
+
+    @classmethod
+    def write(cls, path: Path, texts: Dict[TextKind, List[str]],
+              source: str):
+        # writes a temporary file and moves it over the old corpus, so the
+        # corpus is either the old or the new one
+        blocks = []
+        kinds: Dict[str, Dict[str, int]] = {}
+        offset = 0
+        for kind, kind_texts in texts.items():
+            joint_texts = cls.__SEPARATOR.join(
+                text.replace(cls.__SEPARATOR, "") for text in kind_texts)
+            block = zlib.compress(joint_texts.encode("utf-8"), 9)
+            kinds[kind.value] = {"offset": offset, "size": len(block),
+                                 "count": len(kind_texts)}
+            blocks.append(block)
+            offset += len(block)
+
+        table = json.dumps({
+            "source": source,
+            "created": datetime.now(timezone.utc).isoformat(
+                timespec="seconds"),
+            "kinds": kinds}).encode("utf-8")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(cls.__HEADER.pack(cls.MAGIC, cls.VERSION, len(table)))
+            out.write(table)
+            for block in blocks:
+                out.write(block)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, path)
+
+
+# Gives the text corpus of the rand_words text generation. The corpus is
+# fetched from the website once into a local cache, generation reads only
+# the cache; a missing cache is fetched when refresh_if_missing is set.
+# The requests of a refresh run concurrently over fetch_connections
+# connections, a failed request is retried with exponential backoff.
+class TextCorpusManager:
+    __CONFIG = PyQtGuiGenConfig.get_section("TextCorpus")
+    CACHE_PATH = PyQtGuiGenConfig.get_section("DatasetGeneration") \
+        .get_path("text_corpus_cache_path")
+    REFRESH_IF_MISSING = __CONFIG.get_boolean("refresh_if_missing")
+    WEBSITE = __CONFIG.get("website")
+    USE_HTTPS = __CONFIG.get_boolean("use_https")
+    REQUEST_COUNT = __CONFIG.get_int("request_count")
+    TEXTS_PER_REQUEST = __CONFIG.get_int("texts_per_request")
+    FETCH_ATTEMPTS = __CONFIG.get_int("fetch_attempts")
+    FETCH_RETRY_DELAY = __CONFIG.get_float("fetch_retry_delay_seconds")
+    REQUEST_TIMEOUT = __CONFIG.get_float("request_timeout_seconds")
+    FETCH_CONNECTIONS = __CONFIG.get_int("fetch_connections")
+    REQUESTS_PER_SECOND = __CONFIG.get_float("requests_per_second")
+
+    __cache: TextCorpusCache = None
+
+    @classmethod
+    def get_cache(cls) -> TextCorpusCache:
+        if cls.__cache is None:
+            if not cls.CACHE_PATH.exists():
+                if not cls.REFRESH_IF_MISSING:
+                    raise RuntimeError(
+                        f"Text corpus {cls.CACHE_PATH} is missing, fetch it "
+                        f"with python -m guigenerator.qt_guigen.text_corpus")
+                cls.refresh()
+            cls.__cache = TextCorpusCache(cls.CACHE_PATH)
+        return cls.__cache
+
+    @classmethod
+    def refresh(cls, website: str = None, use_https: bool = None,
+                cache_path: Path = None) -> Dict[TextKind, int]:
+        website = cls.WEBSITE if website is None else website
+        use_https = cls.USE_HTTPS if use_https is None else use_https
+        cache_path = cls.CACHE_PATH if cache_path is None else cache_path
+        requests = FishTextWebsiteHttpRequest(
+            website, use_https, cls.REQUEST_TIMEOUT, cls.FETCH_CONNECTIONS,
+            cls.REQUESTS_PER_SECOND)
+        # the sentences of the last request are split into words
+        fetches = [(kind, request)
+                   for _ in range(cls.REQUEST_COUNT)
+                   for kind, request in (
+                       (TextKind.SENTENCE, requests.request_sentences),
+                       (TextKind.TITLE, requests.request_titles),
+                       (TextKind.PARAGRAPH, requests.request_paragraphs))]
+        fetches.append((TextKind.WORD, requests.request_sentences))
+
+        # the results are taken in the order of the requests, so the
+        # corpus does not depend on which request finishes first
+        fetched: Dict[TextKind, List[str]] = {kind: [] for kind in TextKind}
+        executor = ThreadPoolExecutor(max_workers=cls.FETCH_CONNECTIONS,
+                                      thread_name_prefix="fetcher")
+        try:
+            futures = [(kind, executor.submit(cls.__fetch, request, website))
+                       for kind, request in fetches]
+            for kind, future in futures:
+                fetched[kind].extend(future.result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            requests.close()
+
+        # the website repeats texts, every text is kept once
+        texts = {kind: list(dict.fromkeys(kind_texts))
+                 for kind, kind_texts in fetched.items()}
+        texts[TextKind.WORD] = [word.strip(punctuation).strip(whitespace)
+                                for sentence in texts[TextKind.WORD]
+                                for word in sentence.split()]
+
+        TextCorpusCache.write(cache_path, texts, website)
+        if cache_path == cls.CACHE_PATH and cls.__cache is not None:
+            cls.__cache.close()
+            cls.__cache = None
+        return {kind: len(kind_texts) for kind, kind_texts in texts.items()}
+
+    @classmethod
+    def __fetch(cls, request: Callable[[int], List[str]],
+                website: str) -> List[str]:
+        for attempt in range(1, cls.FETCH_ATTEMPTS + 1):
+            try:
+                return request(cls.TEXTS_PER_REQUEST)
+            except (OSError, HTTPException, RuntimeError, ValueError,
+                    KeyError) as e:
+                if attempt >= cls.FETCH_ATTEMPTS:
+                    raise RuntimeError(
+                        f"Can not fetch the text corpus from {website}: "
+                        f"{e!r}") from e
+                time.sleep(cls.FETCH_RETRY_DELAY * 2 ** (attempt - 1))
+
+
+def _parse_args(args=None) -> Any:
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        description="Fetch the text corpus from the website into the cache")
+    parser.add_argument("--website", default=TextCorpusManager.WEBSITE,
+                        help="host[:port] of the website (default: website "
+                             "from the config)")
+    parser.add_argument("--http", action="store_true",
+                        help="use plain HTTP instead of HTTPS")
+    parser.add_argument("--output", type=Path,
+                        default=TextCorpusManager.CACHE_PATH,
+                        help="cache file (default: text_corpus_cache_path "
+                             "from the config)")
+
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    options = _parse_args()
+    use_https = False if options.http else None
+    counts = TextCorpusManager.refresh(options.website, use_https,
+                                       options.output)
+    print("Wrote " + ", ".join(f"{count} {kind.value}s"
+                                for kind, count in counts.items())
+          + f" to {options.output}")
@@ -10,9 +10,13 @@ class GeometryOutputDataFormat(Enum):
 
 class AttributesDataFormat(Enum):
     CSV = "CSV"
+    PARQUET = "PARQUET"
+    ARROW = "ARROW"
 
 class ValuesDataFormat(Enum):
     CSV = "CSV"
+    PARQUET = "PARQUET"
+    ARROW = "ARROW"
 
 
 class MainWindowAccessObject:
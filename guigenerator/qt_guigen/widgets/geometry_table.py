@@ -0,0 +1,181 @@
+from typing import Dict, List, Mapping, Tuple
+
+import numpy as np
+
+from guigenerator.qt_guigen.widgets import GeometryOutputDataFormat
+from guigenerator.qt_guigen.widgets.attributes import Attr, AttrName
+from guigenerator.qt_guigen.widgets.widget_categories import WidgetCategories
+from guigenerator.qt_guigen.widgets.widget_geometry import WidgetGeometry
+
+
+# Geometries of the annotated widgets of one image as a NumPy structured
+# array, one row per widget in the order the widgets were visited: the
+# widget name as a class id, the widget id, the box and a column per
+# attribute: the state index, NO_STATE if the widget has no such
+# attribute, or for attributes without state names the value, None if
+# the widget has no such attribute. YOLO tables hold normalised center
+# boxes, COCO tables pixel boxes given by the top left point.
+class GeometryTable:
+    NO_STATE = -1
+    ATTR_NAMES: List[AttrName] = list(AttrName)
+    BOX_FIELDS = ["x", "y", "w", "h"]
+
+    # class ids of the widget names, see WidgetCategories.NAMES
+    __names: Tuple[str, ...] = WidgetCategories.NAMES
+    __name_ids: Mapping[str, int] = WidgetCategories.NAME_IDS
+
+    def __init__(self, format_: GeometryOutputDataFormat, rows: np.ndarray):
+        self._format = format_
+        self._rows = rows
+
+    @property
+    def format(self) -> GeometryOutputDataFormat:
+        return self._format
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @classmethod
+    def get_dtype(cls, format_: GeometryOutputDataFormat) -> np.dtype:
+        coordinate_type = np.float64 \
+            if format_ == GeometryOutputDataFormat.YOLO else np.int64
+        return np.dtype(
+            [("class_id", np.int16), ("widget_id", np.int32)]
+            + [(field, coordinate_type) for field in cls.BOX_FIELDS]
+            + [(attr_name.fancy_name,
+                np.object_ if attr_name.state_names is None else np.int8)
+               for attr_name in cls.ATTR_NAMES])
+
+    @classmethod
+    def create(cls, format_: GeometryOutputDataFormat,
+               records: List[Tuple]) -> 'GeometryTable':
+        return cls(format_, np.array(records, dtype=cls.get_dtype(format_)))
+
+    @classmethod
+    def create_record(cls, widget_name: str, widget_id: int,
+                      geometry: WidgetGeometry,
+                      attr_list: List[Attr]) -> Tuple:
+        states = {attr.name: attr.state if attr.name.state_names is None
+                  else int(attr.state) for attr in attr_list}
+        return (cls.get_name_id(widget_name), widget_id, geometry.x,
+                geometry.y, geometry.width, geometry.height) \
+            + tuple(states.get(attr_name, None
+                               if attr_name.state_names is None
+                               else cls.NO_STATE)
+                    for attr_name in cls.ATTR_NAMES)
+
+    @classmethod
+    def get_name_id(cls, name: str) -> int:
+        if name not in cls.__name_ids:
+            raise RuntimeError(f"Unknown widget name: {name}")
+        return cls.__name_ids[name]
+
+    @classmethod
+    def get_name_lookup(cls, values: Dict[str, int]) -> np.ndarray:
+        # values by class id, -1 for the names missing in values; names
+        # without a class id have no rows
+        lookup = np.full(len(cls.__names), -1, dtype=np.int64)
+        for name, value in values.items():
+            if name in cls.__name_ids:
+                lookup[cls.__name_ids[name]] = value
+        return lookup
+
+    def get_names(self) -> List[str]:
+        return [self.__names[class_id]
+                for class_id in self._rows["class_id"].tolist()]
+
+    def select(self, mask: np.ndarray) -> 'GeometryTable':
+        return GeometryTable(self._format, self._rows[mask])
+
+    def select_names(self, names: List[str]) -> 'GeometryTable':
+        return self.select(np.isin(self._rows["class_id"],
+                                   [self.__name_ids[name]
+                                    for name in names
+                                    if name in self.__name_ids]))
+
+    def group_by_name(self) -> 'GeometryTable':
+        # rows of a name together, names in the order they first appear
+        _, first_rows, name_indexes = np.unique(
+            self._rows["class_id"], return_index=True, return_inverse=True)
+        name_order = np.argsort(np.argsort(first_rows))
+        return GeometryTable(self._format, self._rows[np.argsort(
+            name_order[name_indexes.ravel()], kind="stable")])
+
+    def get_distribution(self) -> Dict[str, int]:
+        class_ids, first_rows, counts = np.unique(
+            self._rows["class_id"], return_index=True, return_counts=True)
+        order = np.argsort(first_rows)
+        return {self.__names[class_id]: count for class_id, count
+                in zip(class_ids[order].tolist(), counts[order].tolist())}
+
+    def get_boxes(self) -> np.ndarray:
+        return np.stack([self._rows[field] for field in self.BOX_FIELDS],
+                        axis=1) if len(self) \
+            else np.zeros((0, 4), dtype=self._rows["x"].dtype)
+
+    def get_attributes(self) -> List[Dict[str, str]]:
+        # attribute state names, or values, of every row for the
+        # attributes it has
+        columns = [(attr_name, self._rows[attr_name.fancy_name].tolist())
+                   for attr_name in self.ATTR_NAMES]
+        return [{attr_name.fancy_name: states[row]
+                 if attr_name.state_names is None
+                 else attr_name.state_names[states[row]]
+                 for attr_name, states in columns
+                 if states[row] not in (None, self.NO_STATE)}
+                for row in range(len(self))]
+
+    def normalize(self, screen_width: int,
+                  screen_height: int) -> 'GeometryTable':
+        self.__check_format(GeometryOutputDataFormat.COCO)
+        rows = self._rows.astype(
+            self.get_dtype(GeometryOutputDataFormat.YOLO))
+        rows["x"] = (rows["x"] + rows["w"] / 2.0) / screen_width
+        rows["y"] = (rows["y"] + rows["h"] / 2.0) / screen_height
+        rows["w"] /= screen_width
+        rows["h"] /= screen_height
+        return GeometryTable(GeometryOutputDataFormat.YOLO, rows)
+
+    def to_pixels(self, screen_width: int,
+                  screen_height: int) -> 'GeometryTable':
+        # truncates as int() does, as the per widget conversion did
+        self.__check_format(GeometryOutputDataFormat.YOLO)
+        w = self._rows["w"] * screen_width
+        h = self._rows["h"] * screen_height
+        rows = self._rows.astype(
+            self.get_dtype(GeometryOutputDataFormat.COCO))
+        rows["x"] = np.trunc(self._rows["x"] * screen_width - w / 2.0)
+        rows["y"] = np.trunc(self._rows["y"] * screen_height - h / 2.0)
+        rows["w"] = np.trunc(w)
+        rows["h"] = np.trunc(h)
+        return GeometryTable(GeometryOutputDataFormat.COCO, rows)
+
+    def clip(self, screen_width: int, screen_height: int) -> 'GeometryTable':
+        # boxes cut to the screen, boxes outside it get a zero size
+        self.__check_format(GeometryOutputDataFormat.COCO)
+        rows = self._rows.copy()
+        for start, size, limit in (("x", "w", screen_width),
+                                   ("y", "h", screen_height)):
+            end = np.clip(rows[start] + rows[size], 0, limit)
+            rows[start] = np.clip(rows[start], 0, limit)
+            rows[size] = np.maximum(end - rows[start], 0)
+        return GeometryTable(self._format, rows)
+
+    def to_yolo_text(self, class_ids: Dict[str, int]) -> str:
+        # a "class x y w h" line per row whose name has a class id
+        self.__check_format(GeometryOutputDataFormat.YOLO)
+        output_ids = self.get_name_lookup(class_ids)[self._rows["class_id"]]
+        is_exported = output_ids >= 0
+        boxes = self.get_boxes()[is_exported].tolist()
+        return ''.join(f'{class_id} {x} {y} {w} {h}\n'
+                       for class_id, (x, y, w, h)
+                       in zip(output_ids[is_exported].tolist(), boxes))
+
+    def __check_format(self, format_: GeometryOutputDataFormat):
+        if self._format != format_:
+            raise RuntimeError(f"Geometry table holds {self._format} "
+                               f"boxes, not {format_} ones")
@@ -1,4 +1,3 @@
-from random import randint, choice, random
 from typing import List, Tuple
 
 from PySide6 import QtWidgets as QtW, QtGui as QtG, QtCore as QtC
@@ -15,9 +14,12 @@ from guigenerator.qt_guigen.widgets.random_values_generation \
     RandNumbersGeneration
 from guigenerator.qt_guigen.widgets.random_values_generation.random_text_gen \
     import \
-    RandomTextGeneration, TextGenerationStrategy
+    RandomTextGeneration, TextGenerationStrategy, HtmlDocumentPool
+from guigenerator.random_context import RandomContext
 from guigenerator.utils import Utils
 
+_rng = RandomContext.get_rng()
+
 DATASET_GENERATION_CONFIG = PyQtGuiGenConfig.get_section("DatasetGeneration")
 CHECKBOX_SIZES = DATASET_GENERATION_CONFIG.get_list("checkbox_sizes")
 RADIO_SIZES = DATASET_GENERATION_CONFIG.get_list("radio_sizes")
@@ -25,12 +27,17 @@ ROW_EMPHASIZE_COLORS_LIST = DATASET_GENERATION_CONFIG \
     .get_list("table_item_selection_color")
 GEN_STRAT = TextGenerationStrategy(DATASET_GENERATION_CONFIG
                                    .get("text_generation_strat"))
+HTML_POOL_SIZE = DATASET_GENERATION_CONFIG.get_int("html_pool_size")
+HTML_POOL_REFRESH_ITEMS = DATASET_GENERATION_CONFIG \
+    .get_int("html_pool_refresh_items")
 
 
 class QWidgetFactory:
     _checkbox_count = 0
     _radio_count = 0
     _rand_text_gen = RandomTextGeneration(GEN_STRAT)
+    _html_pool = HtmlDocumentPool(_rand_text_gen, HTML_POOL_SIZE,
+                                  HTML_POOL_REFRESH_ITEMS)
     _alignments = [QtC.Qt.AlignLeft, QtC.Qt.AlignCenter, QtC.Qt.AlignRight]
 
     @classmethod
@@ -38,6 +45,11 @@ class QWidgetFactory:
         cls._checkbox_count = 0
         cls._radio_count = 0
 
+    # called before the item is seeded
+    @classmethod
+    def prepare_item(cls, run_seed: int, item_index: int):
+        cls._html_pool.prepare(run_seed, item_index)
+
     @classmethod
     def create_qtable(cls) -> QtW.QTableWidget:
         __QTABLE_HHEADER_LABELS_PROB = 0.5
@@ -46,48 +58,36 @@ class QWidgetFactory:
         __QTABLE_ROW_COUNT_RANGE = 3, 20
         __QTABLE_COL_COUNT_RANGE = 2, 5
 
-        def _generate_table_item(first_letter: str = "") \
-                -> QtW.QTableWidgetItem:
-            if first_letter == "":
-                label = cls._rand_text_gen.gen_random_str_of_words(1, 1)
-            else:
-                label = cls._rand_text_gen \
-                    .gen_random_str_of_words_starting_with_letter(
-                    1, 1, letter).capitalize()
-            return QtW.QTableWidgetItem(label)
-
-        def _generate_label_texts(item_amount: int) -> List[str]:
-            return [
-                cls._rand_text_gen.gen_random_str_of_words(1, 1)
-                for _ in range(item_amount)]
-
-        row_count = randint(*__QTABLE_ROW_COUNT_RANGE)
-        col_count = randint(*__QTABLE_COL_COUNT_RANGE)
+        row_count = _rng.randint(*__QTABLE_ROW_COUNT_RANGE)
+        col_count = _rng.randint(*__QTABLE_COL_COUNT_RANGE)
         qtable = QtW.QTableWidget(row_count, col_count)
 
         is_same_fist_letter = PyQtGuiGenConfig \
             .get_section("DatasetGeneration") \
             .get_boolean("same_first_letter_for_tables_and_lists")
         if is_same_fist_letter:
-            letter = choice(cls._rand_text_gen.get_possible_starting_letters())
-            for row in range(row_count):
-                for col in range(col_count):
-                    qtable.setItem(row, col, _generate_table_item(letter))
+            letter = _rng.choice(cls._rand_text_gen.get_possible_starting_letters())
+            labels = [word.capitalize() for word in cls._rand_text_gen
+                      .gen_random_words_starting_with_letter(
+                          row_count * col_count, letter)]
         else:
-            for row in range(row_count):
-                for col in range(col_count):
-                    qtable.setItem(row, col, _generate_table_item())
-
-        if random() < 0.8 and ROW_EMPHASIZE_COLORS_LIST:
-            row_to_emphasize = randint(0, row_count)
-            color = choice(ROW_EMPHASIZE_COLORS_LIST)
+            labels = cls._rand_text_gen.gen_random_words(
+                row_count * col_count)
+        for i, label in enumerate(labels):
+            qtable.setItem(i // col_count, i % col_count,
+                           QtW.QTableWidgetItem(label))
+
+        if _rng.random() < 0.8 and ROW_EMPHASIZE_COLORS_LIST:
+            row_to_emphasize = _rng.randint(0, row_count)
+            color = _rng.choice(ROW_EMPHASIZE_COLORS_LIST)
             qtable.setStyleSheet(
                 f"QTableWidget::item{{selection-background-color: {color} }}")
             qtable.selectRow(row_to_emphasize)
 
-        if random() < __QTABLE_HHEADER_LABELS_PROB:
-            qtable.setHorizontalHeaderLabels(_generate_label_texts(col_count))
-        if random() < 1.0 - __QTABLE_ENABLED_PROB:
+        if _rng.random() < __QTABLE_HHEADER_LABELS_PROB:
+            qtable.setHorizontalHeaderLabels(
+                cls._rand_text_gen.gen_random_words(col_count))
+        if _rng.random() < 1.0 - __QTABLE_ENABLED_PROB:
             qtable.setEnabled(False)
 
         qtable.setSizePolicy(QtW.QSizePolicy.MinimumExpanding,
@@ -101,15 +101,15 @@ class QWidgetFactory:
         __QCHECKBOX_FOCUS_PROB = 0.5
 
         checkbox = QtW.QCheckBox()
-        if random() < __QCHECKBOX_CHECKED_PROB:
+        if _rng.random() < __QCHECKBOX_CHECKED_PROB:
             checkbox.setChecked(True)
-        if random() < 1.0 - __QCHECKBOX_ENABLED_PROB:
+        if _rng.random() < 1.0 - __QCHECKBOX_ENABLED_PROB:
             checkbox.setEnabled(False)
-        if random() > 1 / len(CHECKBOX_SIZES):
+        if _rng.random() > 1 / len(CHECKBOX_SIZES):
             cls._checkbox_count += 1
             obj_name = f"checkbox{cls._checkbox_count}"
             checkbox.setObjectName(obj_name)
-            size = choice(CHECKBOX_SIZES)
+            size = _rng.choice(CHECKBOX_SIZES)
             checkbox.setStyleSheet(
                 f"""QCheckBox#{obj_name}::indicator {{
                 width: {size}px;
@@ -117,7 +117,7 @@ class QWidgetFactory:
                 }}
                 """
             )
-        if random() < __QCHECKBOX_FOCUS_PROB:
+        if _rng.random() < __QCHECKBOX_FOCUS_PROB:
             checkbox.setFocus()
 
         return checkbox
@@ -155,15 +155,15 @@ class QWidgetFactory:
         __QRADIO_FOCUS_PROB = 0.5
 
         radio = QtW.QRadioButton()
-        if random() < __QRADIO_CHECKED_PROB:
+        if _rng.random() < __QRADIO_CHECKED_PROB:
             radio.setChecked(True)
-        if random() < 1.0 - __QRADIO_ENABLED_PROB:
+        if _rng.random() < 1.0 - __QRADIO_ENABLED_PROB:
             radio.setEnabled(False)
-        if random() > 1 / len(RADIO_SIZES):
+        if _rng.random() > 1 / len(RADIO_SIZES):
             cls._radio_count += 1
             obj_name = f"radio{cls._checkbox_count}"
             radio.setObjectName(obj_name)
-            size = choice(CHECKBOX_SIZES)
+            size = _rng.choice(CHECKBOX_SIZES)
             radio.setStyleSheet(
                 f"""QRadioButton#{obj_name}::indicator {{
                 width: {size}px;
@@ -171,7 +171,7 @@ class QWidgetFactory:
                 }}
                 """
             )
-        if random() < __QRADIO_FOCUS_PROB:
+        if _rng.random() < __QRADIO_FOCUS_PROB:
             radio.setFocus()
         return radio
 
@@ -219,11 +219,11 @@ class QWidgetFactory:
                 central_widget = QtW.QWidget()
                 central_widget.setObjectName("centralWidget")
 
-                if (random() > 0.1):
+                if (_rng.random() > 0.1):
                     central_widget.setStyleSheet(
                         f"#centralWidget {{ border-image: url("
                         f"../../../resources/bg/"
-                        f"{choice(Utils.get_background_names())}) "
+                        f"{_rng.choice(Utils.get_background_names())}) "
                         f"0 0 0 0 stretch stretch; }}")
                 central_widget.setLayout(layout)
                 window_.setCentralWidget(central_widget)
@@ -248,13 +248,13 @@ class QWidgetFactory:
         palette.setColor(QtG.QPalette.ColorRole.PlaceholderText,
                          QtG.QColorConstants.DarkGray)
         line_edit.setPalette(palette)
-        if random() < __QEDIT_TEXT_FILLED_PROB:
+        if _rng.random() < __QEDIT_TEXT_FILLED_PROB:
             line_edit.setText(
                 cls._rand_text_gen.gen_random_str_of_words(1, 2))
-        if random() < 1.0 - __QEDIT_ENABLED_PROB:
+        if _rng.random() < 1.0 - __QEDIT_ENABLED_PROB:
             line_edit.setEnabled(False)
 
-        if random() < __QEDIT_FOCUS_PROB:
+        if _rng.random() < __QEDIT_FOCUS_PROB:
             line_edit.setFocus()
 
         line_edit.setSizePolicy(QtW.QSizePolicy.Minimum, QtW.QSizePolicy.Fixed)
@@ -272,14 +272,14 @@ class QWidgetFactory:
         palette.setColor(QtG.QPalette.ColorRole.PlaceholderText,
                          QtG.QColorConstants.DarkGray)
         ch_line_edit.setPalette(palette)
-        if random() < __QCHECKABLE_EDIT_TEXT_FILLED_PROB:
+        if _rng.random() < __QCHECKABLE_EDIT_TEXT_FILLED_PROB:
             ch_line_edit.setText(
                 cls._rand_text_gen.gen_random_str_of_words(1, 2))
-        if random() < __QCHECKABLE_EDIT_CHECKED_PROB:
+        if _rng.random() < __QCHECKABLE_EDIT_CHECKED_PROB:
             ch_line_edit.checkbox.setChecked(True)
-        if random() < 1.0 - __QCHECKABLE_EDIT_ENABLED_PROB:
+        if _rng.random() < 1.0 - __QCHECKABLE_EDIT_ENABLED_PROB:
             ch_line_edit.setEnabled(False)
-        if random() < __QCHECKABLE_EDIT_FOCUS_PROB:
+        if _rng.random() < __QCHECKABLE_EDIT_FOCUS_PROB:
             ch_line_edit.setFocus()
         return ch_line_edit
 
@@ -292,15 +292,15 @@ class QWidgetFactory:
 
         button = QtW.QPushButton()
         button.setSizePolicy(QtW.QSizePolicy.Fixed, QtW.QSizePolicy.Fixed)
-        if random() < __QBUTTON_HAS_ICON_PROB:
-            p = QtG.QPixmap(str(choice(Utils.get_icon_paths())))
+        if _rng.random() < __QBUTTON_HAS_ICON_PROB:
+            p = QtG.QPixmap(str(_rng.choice(Utils.get_icon_paths())))
             button.setIcon(p)
-        if random() < 1.0 - __QBUTTON_ENABLED_PROB:
+        if _rng.random() < 1.0 - __QBUTTON_ENABLED_PROB:
             button.setEnabled(False)
-        if random() < __QBUTTION_TEXT_PROB or button.icon().isNull():
+        if _rng.random() < __QBUTTION_TEXT_PROB or button.icon().isNull():
             button.setText(
                 cls._rand_text_gen.gen_random_str_of_words(1, 1))
-        if random() < __QBUTTION_FOCUS_PROB:
+        if _rng.random() < __QBUTTION_FOCUS_PROB:
             button.setFocus()
 
         return button
@@ -312,16 +312,15 @@ class QWidgetFactory:
         __QCOMBOBOX_FOCUS_PROB = 2
 
         cb_items = []
-        if random() < __QCOMBOBOX_TEXT_FILLED_PROB:
-            for i in range(randint(5, 30)):
-                cb_items.append(
-                    cls._rand_text_gen.gen_random_str_of_words(1, 1))
+        if _rng.random() < __QCOMBOBOX_TEXT_FILLED_PROB:
+            cb_items.extend(
+                cls._rand_text_gen.gen_random_words(_rng.randint(5, 30)))
         else:
             cb_items.append("")
         combobox = QtW.QComboBox()
         combobox.addItems(cb_items)
         combobox.setCurrentIndex(0)
-        if random() < 1.0 - __QCOMBOBOX_ENABLED_PROB:
+        if _rng.random() < 1.0 - __QCOMBOBOX_ENABLED_PROB:
             combobox.setEnabled(False)
         combobox.setSizePolicy(QtW.QSizePolicy.Minimum, QtW.QSizePolicy.Fixed)
         return combobox
@@ -334,15 +333,15 @@ class QWidgetFactory:
         __QCHECKBOX_FOCUS_PROB = 0.5
 
         text = cls._rand_text_gen.gen_random_str_of_words(1, 2) \
-            if random() < __QCOMBOBOX_TEXT_FILLED_PROB else ""
+            if _rng.random() < __QCOMBOBOX_TEXT_FILLED_PROB else ""
         combobox = QCheckableComboBox()
         combobox.addItems([text])
         combobox.setCurrentIndex(0)
-        if random() < __QCHECKBOX_CHECKED_PROB:
+        if _rng.random() < __QCHECKBOX_CHECKED_PROB:
             combobox.checkbox.setChecked(True)
-        if random() < 1.0 - __QCOMBOBOX_ENABLED_PROB:
+        if _rng.random() < 1.0 - __QCOMBOBOX_ENABLED_PROB:
             combobox.setEnabled(False)
-        if random() < __QCHECKBOX_FOCUS_PROB:
+        if _rng.random() < __QCHECKBOX_FOCUS_PROB:
             combobox.setFocus()
         return combobox
 
@@ -351,7 +350,7 @@ class QWidgetFactory:
         group_box = QtW.QGroupBox()
         alignment_types = [QtC.Qt.AlignLeft, QtC.Qt.AlignHCenter,
                            QtC.Qt.AlignHCenter]
-        group_box.setAlignment(choice(alignment_types))
+        group_box.setAlignment(_rng.choice(alignment_types))
         return group_box
 
     @classmethod
@@ -359,14 +358,14 @@ class QWidgetFactory:
         __QLIST_ITEMS_RANGE = 7, 25
         __QLIST_FOCUS_PROB = 0.5
         list_ = QtW.QListWidget()
-        items_count = randint(*__QLIST_ITEMS_RANGE)
+        items_count = _rng.randint(*__QLIST_ITEMS_RANGE)
         list_.addItems(
             [cls._rand_text_gen.gen_random_str_of_words(1, 4)
              for _
              in range(items_count)])
-        if random() < __QLIST_FOCUS_PROB:
+        if _rng.random() < __QLIST_FOCUS_PROB:
             list_.setFocus()
-            list_.setCurrentRow(randint(0, items_count))
+            list_.setCurrentRow(_rng.randint(0, items_count))
 
         list_.setSizePolicy(QtW.QSizePolicy.MinimumExpanding,
                             QtW.QSizePolicy.MinimumExpanding)
@@ -376,8 +375,10 @@ class QWidgetFactory:
     def create_qtextedit(cls) -> QtW.QTextEdit:
         TEXTEDIT_FOCUS_PROB = 0.5
         textedit = QtW.QTextEdit()
-        textedit.insertHtml(cls._rand_text_gen.gen_random_html_doc())
-        if random() < TEXTEDIT_FOCUS_PROB:
+        # renders the same as insertHtml into the empty document and skips
+        # merging the fragment at the cursor
+        textedit.setHtml(cls._html_pool.get_document())
+        if _rng.random() < TEXTEDIT_FOCUS_PROB:
             textedit.setFocus()
 
         textedit.setSizePolicy(QtW.QSizePolicy.MinimumExpanding,
@@ -393,8 +394,8 @@ class QWidgetFactory:
         __QTREEVIEW_EXPAND_TREE_ITEM_PROB = 0.6
         __QTREEVIEW_FOCUS_PROB = 0.5
 
-        col_count = randint(*__QTREEVIEW_COL_RANGE)
-        top_level_items_count = randint(
+        col_count = _rng.randint(*__QTREEVIEW_COL_RANGE)
+        top_level_items_count = _rng.randint(
             *__QTREEVIEW_TOPLEVEL_ITEMS_COUNT_RANGE)
         top_level_items = []
         for i in range(top_level_items_count):
@@ -410,14 +411,13 @@ class QWidgetFactory:
                         .generate_random_line_of_numbers(1, 1, 1, 3)
                     item.setText(j, t)
 
-            inner_level_items_count = randint(
+            inner_level_items_count = _rng.randint(
                 *__QTREEVIEW_INNER_LEVEL_ITEMS_COUNT_RANGE)
             inner_items = []
-            for j in range(inner_level_items_count):
+            for text in cls._rand_text_gen.gen_random_words(
+                    inner_level_items_count):
                 inner_item = QtW.QTreeWidgetItem()
-                inner_item.setText(
-                    0, cls._rand_text_gen.gen_random_str_of_words(
-                        1, 1))
+                inner_item.setText(0, text)
                 inner_items.append(inner_item)
 
             item.insertChildren(0, inner_items)
@@ -426,15 +426,14 @@ class QWidgetFactory:
         qtreewidget = QtW.QTreeWidget()
         qtreewidget.setColumnCount(col_count)
         qtreewidget.insertTopLevelItems(0, top_level_items)
-        labels = [cls._rand_text_gen.gen_random_str_of_words(1, 1)
-                  for _ in range(col_count)]
-        qtreewidget.setHeaderLabels(labels)
-        if random() < __QTREEVIEW_EXPAND_TREE_ITEM_PROB:
+        qtreewidget.setHeaderLabels(
+            cls._rand_text_gen.gen_random_words(col_count))
+        if _rng.random() < __QTREEVIEW_EXPAND_TREE_ITEM_PROB:
             qtreewidget.topLevelItem(
-                randint(0,
+                _rng.randint(0,
                         qtreewidget.topLevelItemCount() - 1)).setExpanded(True)
-        if random() < __QTREEVIEW_FOCUS_PROB:
-            item_n = randint(0, qtreewidget.topLevelItemCount() - 1)
+        if _rng.random() < __QTREEVIEW_FOCUS_PROB:
+            item_n = _rng.randint(0, qtreewidget.topLevelItemCount() - 1)
             qtreewidget.topLevelItem(item_n).setSelected(True)
 
         qtreewidget.setSizePolicy(QtW.QSizePolicy.MinimumExpanding,
@@ -445,7 +444,7 @@ class QWidgetFactory:
     def create_qtabwidget(cls, main_widget: QtW.QWidget) -> QtW.QTabWidget:
         __QTAB_TAB_COUNT_RANGE = 2, 3
 
-        tab_count = randint(*__QTAB_TAB_COUNT_RANGE)
+        tab_count = _rng.randint(*__QTAB_TAB_COUNT_RANGE)
         qtab = QtW.QTabWidget()
         qtab.addTab(main_widget,
                     cls._rand_text_gen.gen_random_str_of_words(1, 1))
@@ -1,21 +1,91 @@
-from random import choice, random
+from typing import Dict, List, Tuple
 
 from PySide6 import QtGui as QtG
 
 from guigenerator.qt_guigen.config import PyQtGuiGenConfig
+from guigenerator.random_context import RandomContext
+
+_rng = RandomContext.get_rng()
 
 FONT_SIZES = PyQtGuiGenConfig.get_section("DatasetGeneration").get_list(
     "font_sizes")
 FONT_EXCEPT = PyQtGuiGenConfig.get_section("DatasetGeneration").get_list(
     "fonts_except_list")
+FONT_WARM_UP = PyQtGuiGenConfig.get_section("DatasetGeneration").get_boolean(
+    "font_warm_up")
+
+
+# Families of the font database without the excepted ones, their styles
+# and the fonts of the styles in every configured size. The catalogue is
+# built once per process, when the first font is drawn (the font database
+# needs the application), so drawing a font is a few choices. A bitmap
+# style is kept only when it has all the configured sizes. With warm-up
+# the glyphs of every font are laid out once when the catalogue is built.
+class FontCatalogue:
+    __WARM_UP_TEXT = "АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ" \
+                     "абвгдеёжзийклмнопрстуфхцчшщъыьэюя" \
+                     "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz" \
+                     "0123456789.,:;!?-()"
+
+    SIZES: Tuple[int, ...] = tuple(int(size) for size in FONT_SIZES)
+
+    __families: Tuple[str, ...] = ()
+    __styles: Dict[str, Tuple[str, ...]] = {}
+    __fonts: Dict[Tuple[str, str, int], QtG.QFont] = {}
+    __is_built = False
+
+    @classmethod
+    def get_families(cls) -> List[str]:
+        cls.__build_if_needed()
+        return list(cls.__families)
+
+    @classmethod
+    def get_styles(cls, family: str) -> List[str]:
+        cls.__build_if_needed()
+        return list(cls.__styles[family])
+
+    @classmethod
+    def draw_font(cls) -> QtG.QFont:
+        cls.__build_if_needed()
+        size = _rng.choice(cls.SIZES)
+        family = _rng.choice(cls.__families)
+        style = _rng.choice(cls.__styles[family])
+        return QtG.QFont(cls.__fonts[(family, style, size)])
+
+    @classmethod
+    def __build_if_needed(cls):
+        if cls.__is_built:
+            return
+        families = []
+        for family in QtG.QFontDatabase.families():
+            if family == "" or family in FONT_EXCEPT:
+                continue
+            styles = tuple(style for style in QtG.QFontDatabase.styles(family)
+                           if cls.__has_sizes(family, style))
+            if not styles:
+                continue
+            families.append(family)
+            cls.__styles[family] = styles
+            for style in styles:
+                for size in cls.SIZES:
+                    cls.__fonts[(family, style, size)] = \
+                        QtG.QFontDatabase.font(family, style, size)
+        if not families:
+            raise RuntimeError("No fonts left after fonts_except_list")
+        cls.__families = tuple(families)
+        cls.__is_built = True
+
+        if FONT_WARM_UP:
+            for font in cls.__fonts.values():
+                QtG.QFontMetrics(font).horizontalAdvance(cls.__WARM_UP_TEXT)
+
+    @classmethod
+    def __has_sizes(cls, family: str, style: str) -> bool:
+        if QtG.QFontDatabase.isSmoothlyScalable(family, style):
+            return True
+        point_sizes = set(QtG.QFontDatabase.pointSizes(family, style))
+        return all(size in point_sizes for size in cls.SIZES)
+
 
 def generate_random_font() -> QtG.QFont:
-    size = int(choice(FONT_SIZES))
-    family = ""
-    while (family == "" or family in FONT_EXCEPT):
-        family = choice(QtG.QFontDatabase.families())
-    style = choice(QtG.QFontDatabase.styles(family))
-    font = QtG.QFontDatabase.font(family, style, size)
-
-    print(f"Font -- {font}")
-    return font
+    return FontCatalogue.draw_font()
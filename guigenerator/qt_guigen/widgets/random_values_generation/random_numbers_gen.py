@@ -1,9 +1,11 @@
-from random import sample, randint
 from string import digits
 from typing import Tuple
 
 from guigenerator.dto.tree_dto import NodeDto
 from guigenerator.qt_guigen.widgets.widget_names import WidgetNames
+from guigenerator.random_context import RandomContext
+
+_rng = RandomContext.get_rng()
 
 
 class RandNumbersGeneration(object):
@@ -79,7 +81,7 @@ class RandNumbersGeneration(object):
 
     @classmethod
     def generate_random_number(cls, length: int) -> str:
-        return ''.join(sample(digits, length))
+        return ''.join(_rng.sample(digits, length))
 
     @classmethod
     def generate_random_line_of_numbers(cls, min_number_of_words: int,
@@ -87,8 +89,8 @@ class RandNumbersGeneration(object):
                                         min_word_len: int,
                                         max_word_len: int) -> str:
 
-        number_of_words = randint(min_number_of_words, max_number_of_words)
+        number_of_words = _rng.randint(min_number_of_words, max_number_of_words)
         words = [
-            cls.generate_random_number(randint(min_word_len, max_word_len))
+            cls.generate_random_number(_rng.randint(min_word_len, max_word_len))
             for _ in range(number_of_words)]
         return ' '.join(words)
\ No newline at end of file
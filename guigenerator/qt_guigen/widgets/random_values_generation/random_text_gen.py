@@ -2,13 +2,15 @@
 
 from abc import ABC
 from enum import Enum
-from random import choice, sample, randint, random
-from string import punctuation, whitespace
-from typing import Dict, Callable, List
+from typing import Dict, Callable, List, Tuple
 
-from guigenerator.http_requests import FishTextWebsiteHttpRequest
+from guigenerator.qt_guigen.text_corpus import TextCorpusManager, \
+    TextCorpusCache, TextKind
+from guigenerator.random_context import RandomContext
 from guigenerator.utils import Utils
 
+_rng = RandomContext.get_rng()
+
 
 class TextGenerationStrategy(Enum):
     RAND_CHARS = "rand_chars"
@@ -33,19 +35,17 @@ class RandomTextGeneration(object):
     def gen_random_str_of_words(self, min_words: int, max_words: int,
                                 strategy: TextGenerationStrategy = None):
         gen_engine = self.__apply_method_strategy(strategy)
-        words_count = randint(min_words, max_words)
-        words = [gen_engine.get_word() + " " for _ in range(words_count - 1)]
-        words.append(gen_engine.get_word())
-
-        n = randint(3, 7)
-        new_lines_count = len(words) // n
-        while new_lines_count > 0:
-            pos = randint(0, len(words) - 1)
-            if words[pos] and words[pos][-1] == " ":
-                words[pos] = words[pos].strip() + "\n"
-                new_lines_count -= 1
-
-        return "".join(words)
+        words_count = max(_rng.randint(min_words, max_words), 1)
+        words = gen_engine.get_words(words_count)
+
+        # every n-th space on average, at random places, is a line break
+        n = _rng.randint(3, 7)
+        line_breaks = set(_rng.sample(range(words_count - 1),
+                                      words_count // n))
+        separators = ["\n" if i in line_breaks else " "
+                      for i in range(words_count - 1)]
+        return "".join(word + separator for word, separator
+                       in zip(words, separators)) + words[-1]
 
     def gen_random_str_of_words_starting_with_letter(
             self,
@@ -54,12 +54,25 @@ class RandomTextGeneration(object):
             letter: str,
             strategy: TextGenerationStrategy = None):
         gen_engine = self.__apply_method_strategy(strategy)
-        words_count = randint(min_words, max_words)
+        words_count = _rng.randint(min_words, max_words)
         letter_word = gen_engine.get_word_staring_with_letter(letter)
-        words = [letter_word] \
-                + [gen_engine.get_word() for _ in range(words_count - 1)]
+        words = [letter_word] + gen_engine.get_words(words_count - 1)
         return " ".join(words)
 
+    def gen_random_words(self, count: int,
+                         strategy: TextGenerationStrategy = None) \
+            -> List[str]:
+        gen_engine = self.__apply_method_strategy(strategy)
+        return gen_engine.get_words(count)
+
+    def gen_random_words_starting_with_letter(
+            self,
+            count: int,
+            letter: str,
+            strategy: TextGenerationStrategy = None) -> List[str]:
+        gen_engine = self.__apply_method_strategy(strategy)
+        return gen_engine.get_words_staring_with_letter(count, letter)
+
     def gen_random_paragraph(self,
                              strategy: TextGenerationStrategy = None) -> str:
         gen_engine = self.__apply_method_strategy(strategy)
@@ -76,7 +89,7 @@ class RandomTextGeneration(object):
 
     def gen_random_html_doc(self, text_blocks_count: int = 5) -> str:
         def _gen_title() -> str:
-            h_type = randint(1, 3)
+            h_type = _rng.randint(1, 3)
             title_text = self.gen_random_title()
             return f"<h{h_type}>{title_text}</h{h_type}"
 
@@ -92,12 +105,12 @@ class RandomTextGeneration(object):
             return f"<li> {list_item_text} \n</li>"
 
         def _gen_ulist() -> str:
-            n_list_items = randint(2, 5)
+            n_list_items = _rng.randint(2, 5)
             return '\n'.join([_gen_list_item() for _ in range(n_list_items)])
 
         def try_gen_text_sub_block(possibility: float, gen_func: Callable,
                                    gen_text_list: List[str]):
-            if random() <= possibility:
+            if _rng.random() <= possibility:
                 gen_text_list.append(gen_func())
 
         if text_blocks_count < 0:
@@ -130,10 +143,50 @@ class RandomTextGeneration(object):
         return gen_engine
 
 
+# HTML documents for the text areas. Generating a document takes many
+# draws and joins, with a pool a text area takes one of size documents
+# instead. The pool is generated again for every block of refresh_items
+# items from the run seed and the block, before the item is seeded, so an
+# item still depends only on (seed, index). A pool of size 0, or one that
+# is not prepared, generates a document every time.
+class HtmlDocumentPool(object):
+    __STREAM = "html_documents"
+
+    def __init__(self, text_gen: RandomTextGeneration, size: int,
+                 refresh_items: int):
+        if refresh_items < 1:
+            raise RuntimeError("refresh_items must be positive")
+        self._text_gen = text_gen
+        self._size = size
+        self._refresh_items = refresh_items
+        self._block = None
+        self._documents: List[str] = []
+
+    def prepare(self, run_seed: int, item_index: int):
+        block = item_index // self._refresh_items
+        if self._size < 1 or block == self._block:
+            return
+        # the draws of the pool replace the state of the shared generator,
+        # the item seeds it again
+        _rng.seed(RandomContext.get_stream_seed(run_seed, self.__STREAM,
+                                                block))
+        self._documents = [self._text_gen.gen_random_html_doc()
+                           for _ in range(self._size)]
+        self._block = block
+
+    def get_document(self) -> str:
+        if not self._documents:
+            return self._text_gen.gen_random_html_doc()
+        return _rng.choice(self._documents)
+
+
 class RandTextMixin(ABC):
     def get_word(self) -> str:
         pass
 
+    def get_words(self, count: int) -> List[str]:
+        return [self.get_word() for _ in range(count)]
+
     def get_sentence(self) -> str:
         pass
 
@@ -146,6 +199,11 @@ class RandTextMixin(ABC):
     def get_word_staring_with_letter(self, letter: str) -> str:
         pass
 
+    def get_words_staring_with_letter(self, count: int,
+                                      letter: str) -> List[str]:
+        return [self.get_word_staring_with_letter(letter)
+                for _ in range(count)]
+
     def get_possible_starting_letters(self) -> List[str]:
         pass
 
@@ -158,12 +216,12 @@ class RandTextChars(RandTextMixin):
     __MIN_SENTENCES_IN_PARAGRAPH, __MAX_SENTENCES_IN_PARAGRAPH = 1, 15
 
     def get_word(self) -> str:
-        word_len = randint(self.__MIN_WORDS_IN_SENTENCE,
+        word_len = _rng.randint(self.__MIN_WORDS_IN_SENTENCE,
                            self.__MAX_WORDS_IN_SENTENCE)
-        return ''.join(sample(self.__LTTRS, word_len))
+        return ''.join(_rng.sample(self.__LTTRS, word_len))
 
     def get_sentence(self) -> str:
-        sentence_length = randint(self.__MIN_WORD_LEN, self.__MAX_WORD_LEN)
+        sentence_length = _rng.randint(self.__MIN_WORD_LEN, self.__MAX_WORD_LEN)
         words = [self.get_word() for _ in range(sentence_length)]
         return ' '.join(words)
 
@@ -171,7 +229,7 @@ class RandTextChars(RandTextMixin):
         return self.get_sentence().capitalize()
 
     def get_paragraph(self) -> str:
-        sentences_count = randint(self.__MIN_SENTENCES_IN_PARAGRAPH,
+        sentences_count = _rng.randint(self.__MIN_SENTENCES_IN_PARAGRAPH,
                                   self.__MAX_SENTENCES_IN_PARAGRAPH)
         sentences = [self.get_sentence() for _ in range(sentences_count)]
         return '\n'.join(sentences)
@@ -184,59 +242,87 @@ class RandTextChars(RandTextMixin):
         return self.__LTTRS.split(sep="")
 
 
+# Words of the rand_words generation in a single tuple. The words of the
+# local dictionary come first, grouped by their first letter, and every
+# letter keeps the index range of its words; the corpus words follow. Words
+# of any letter or of one letter are drawn count at a time in one call.
+class WordTable(object):
+    def __init__(self, words_by_letter: Dict[str, List[str]],
+                 other_words: List[str]):
+        words: List[str] = []
+        self._letter_ranges: Dict[str, range] = {}
+        for letter, letter_words in words_by_letter.items():
+            self._letter_ranges[letter] = range(
+                len(words), len(words) + len(letter_words))
+            words.extend(letter_words)
+        words.extend(other_words)
+        self._words: Tuple[str, ...] = tuple(words)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def get_letters(self) -> List[str]:
+        return list(self._letter_ranges.keys())
+
+    def sample(self, count: int) -> List[str]:
+        return _rng.choices(self._words, k=count)
+
+    def sample_starting_with_letter(self, count: int,
+                                    letter: str) -> List[str]:
+        if letter not in self._letter_ranges:
+            raise RuntimeError("No words starting with such letter")
+        words = self._words
+        return [words[i]
+                for i in _rng.choices(self._letter_ranges[letter], k=count)]
+
+
 class RandTextFishWebsite(RandTextMixin):
     __sentences: List[str] = []
     __titles: List[str] = []
     __paragraphs: List[str] = []
-    __words: List[str] = []
-    __same_first_letter_words: Dict[str, List[str]] = {}
+    __word_table: WordTable = None
 
-    REQUEST_COUNT = 1
     LOCAL_WORDS_DICT_PATH = Utils.RESOURCES_DIR / "words.json"
 
     def __init__(self):
-        website = FishTextWebsiteHttpRequest()
-        self.__init_words_from_local_file()
-        self.__init_text_from_request(website)
-        self.__init_words_from_request(website)
+        corpus = TextCorpusManager.get_cache()
+        self.__init_words(corpus)
+        self.__init_text_from_corpus(corpus)
 
-    def __init_words_from_local_file(self):
+    def __init_words(self, corpus: TextCorpusCache):
         word_lists = Utils.read_from_json(str(self.LOCAL_WORDS_DICT_PATH),
                                           None)
-        for letter, joint_words in word_lists.items():
-            splitted_words = joint_words.split(",")
-            self.__same_first_letter_words[letter] = splitted_words
-            self.__words.extend(splitted_words)
-
-    def __init_text_from_request(self, website: FishTextWebsiteHttpRequest):
-        for _ in range(self.REQUEST_COUNT):
-            self.__sentences.extend(website.request_sentences(100))
-            self.__titles.extend(website.request_titles(100))
-            self.__paragraphs.extend(website.request_paragraphs(100))
-
-    def __init_words_from_request(self, website: FishTextWebsiteHttpRequest):
-        sentences = website.request_sentences(100)
-        for sentence in sentences:
-            words = sentence.split()
-            for word in words:
-                self.__words.append(word.strip(punctuation).strip(whitespace))
+        words_by_letter = {letter: joint_words.split(",")
+                           for letter, joint_words in word_lists.items()}
+        RandTextFishWebsite.__word_table = WordTable(
+            words_by_letter, corpus.get_texts(TextKind.WORD))
+
+    def __init_text_from_corpus(self, corpus: TextCorpusCache):
+        self.__sentences.extend(corpus.get_texts(TextKind.SENTENCE))
+        self.__titles.extend(corpus.get_texts(TextKind.TITLE))
+        self.__paragraphs.extend(corpus.get_texts(TextKind.PARAGRAPH))
 
     def get_word(self) -> str:
-        return choice(self.__words)
+        return self.__word_table.sample(1)[0]
+
+    def get_words(self, count: int) -> List[str]:
+        return self.__word_table.sample(count)
 
     def get_sentence(self) -> str:
-        return choice(self.__sentences)
+        return _rng.choice(self.__sentences)
 
     def get_title(self) -> str:
-        return choice(self.__titles)
+        return _rng.choice(self.__titles)
 
     def get_paragraph(self) -> str:
-        return choice(self.__paragraphs)
+        return _rng.choice(self.__paragraphs)
 
-    def get_word_staring_with_letter(cls, letter: str) -> str:
-        if letter not in cls.__same_first_letter_words.keys():
-            raise RuntimeError("No words starting with such letter")
-        return choice(cls.__same_first_letter_words[letter])
+    def get_word_staring_with_letter(self, letter: str) -> str:
+        return self.__word_table.sample_starting_with_letter(1, letter)[0]
 
-    def get_possible_starting_letters(cls) -> List[str]:
-        return list(cls.__same_first_letter_words.keys())
+    def get_words_staring_with_letter(self, count: int,
+                                      letter: str) -> List[str]:
+        return self.__word_table.sample_starting_with_letter(count, letter)
+
+    def get_possible_starting_letters(self) -> List[str]:
+        return self.__word_table.get_letters()
@@ -0,0 +1,43 @@
+from types import MappingProxyType
+from typing import FrozenSet, Mapping, Tuple
+
+from guigenerator.qt_guigen.config import PyQtGuiGenConfig
+from guigenerator.qt_guigen.widgets.widget_names import WidgetNames
+
+_geometry_config = PyQtGuiGenConfig.get_section("GeometryDataExport")
+_attr_config = PyQtGuiGenConfig.get_section("AttributeDataExport")
+_values_config = PyQtGuiGenConfig.get_section("WidgetValuesDataExport")
+
+_excluded_names = frozenset(_geometry_config.get_list("widget_except_list"))
+_geometry_names = tuple(name for name in WidgetNames.get_possible_enum_names()
+                        if name not in _excluded_names)
+
+
+# The widget names the exporters write, read from the config once per
+# process. GEOMETRY_NAMES are the categories in label file order; YOLO
+# writes CLASS_INDEXES, COCO writes CATEGORY_IDS, which start at 1.
+class WidgetCategories:
+    EXCLUDED_NAMES: FrozenSet[str] = _excluded_names
+    GEOMETRY_NAMES: Tuple[str, ...] = _geometry_names
+    GEOMETRY_NAME_SET: FrozenSet[str] = frozenset(_geometry_names)
+    CLASS_INDEXES: Mapping[str, int] = MappingProxyType(
+        {name: index for index, name in enumerate(_geometry_names)})
+    CATEGORY_IDS: Mapping[str, int] = MappingProxyType(
+        {name: index + 1 for index, name in enumerate(_geometry_names)})
+
+    # widgets whose attributes are exported and whose crops are saved
+    ATTRIBUTE_NAMES: Tuple[str, ...] = \
+        tuple(_attr_config.get_list("widgets_for_export"))
+    ATTRIBUTE_NAME_SET: FrozenSet[str] = frozenset(ATTRIBUTE_NAMES)
+
+    VALUES_NAME_SET: FrozenSet[str] = \
+        frozenset(_values_config.get_list("widgets_for_export"))
+
+    # class ids of the geometry tables: every widget name, then the names
+    # of the config missing in WidgetNames. The table does not change
+    # after import, so the GUI and the writer threads share it.
+    NAMES: Tuple[str, ...] = tuple(dict.fromkeys(
+        WidgetNames.get_possible_enum_names() + sorted(
+            EXCLUDED_NAMES | ATTRIBUTE_NAME_SET | VALUES_NAME_SET)))
+    NAME_IDS: Mapping[str, int] = MappingProxyType(
+        {name: index for index, name in enumerate(NAMES)})
@@ -1,13 +1,16 @@
-from typing import Dict, List, Union, Any
+from typing import Dict, List, Union, Any, Tuple
 
 from guigenerator.qt_guigen.widgets import GeometryOutputDataFormat
 from guigenerator.qt_guigen.widgets.attributes import Attr
-from guigenerator.qt_guigen.widgets.widget_geometry import WidgetGeometry
-from guigenerator.qt_guigen.widgets.widget_geometry import WidgetGeometryUtils
+from guigenerator.qt_guigen.widgets.geometry_table import GeometryTable
+from guigenerator.qt_guigen.widgets.widget_geometry import WidgetGeometryUtils, CaptureContext
 from guigenerator.qt_guigen.widgets.widget_vals import WidgetContentName
 from guigenerator.qt_guigen.widgets.widgetobject.wo_abc import AbstractWidgetObjectMixin, WidgetObjectMixin, \
     ContainerWidgetObjectMixin
-# geometry dict: Widget name to Tuple of widget id and WidgetGeometry
+# geometry table: a row per widget with a geometry, see GeometryTable;
+# the geometries are taken once as pixel boxes and the tables of the
+# other formats are derived from them; the derived tables are cached, so
+# they are made on the GUI thread before the item goes to the writers
 # attribute dict: Widget name to Tuple of widget id and Attr
 # value dict: Widget name to Tuple of widget id and Dict of WidgetValueName
 # and corresponding type
@@ -15,19 +18,28 @@ from guigenerator.qt_guigen.widgets.widgetobject.wo_concrete import LabelWidget
 
 
 class WidgetDataDict:
+    PIXEL_FORMAT = GeometryOutputDataFormat.COCO
+
     def __init__(self, root_widget: 'WidgetObjectMixin'):
-        self._geom_dict: Dict[str, Dict[int, WidgetGeometry]] = {}
+        self._geom_records: List[Tuple] = []
+        self._geom_tables: Dict[GeometryOutputDataFormat, GeometryTable] = {}
         self._attr_dict: Dict[str, Dict[int, List[Attr]]] = {}
         self._content_dict: Dict[str, Dict[int, Dict[WidgetContentName, Any]]] = {}
-        self._geom_attr_dict: Dict[str, Dict[int, (WidgetGeometry, List[Attr])]] = {}
         self._label_input_link_ids: List['LabelInputIds'] = []
 
         self._max_width: int = WidgetGeometryUtils.get_relative_widget_frame_geometry(root_widget.widget).width()
         self._max_height: int = WidgetGeometryUtils.get_relative_widget_frame_geometry(root_widget.widget).height()
+        self._screen_size: Tuple[int, int] = WidgetGeometryUtils.calculate_screen_size()
         self._widget_id = 0
 
-    def get_geometry_items(self):
-        return self._geom_dict.items()
+    def get_geometry_table(self, format_: GeometryOutputDataFormat = PIXEL_FORMAT) -> GeometryTable:
+        if self.PIXEL_FORMAT not in self._geom_tables:
+            self._geom_tables[self.PIXEL_FORMAT] = GeometryTable.create(self.PIXEL_FORMAT, self._geom_records)
+        if format_ not in self._geom_tables:
+            if format_ != GeometryOutputDataFormat.YOLO:
+                raise RuntimeError(f"Wrong data format: {format_}")
+            self._geom_tables[format_] = self._geom_tables[self.PIXEL_FORMAT].normalize(*self._screen_size)
+        return self._geom_tables[format_]
 
     def get_attr_items(self):
         return self._attr_dict.items()
@@ -35,34 +47,23 @@ class WidgetDataDict:
     def get_vals_items(self):
         return self._content_dict.items()
 
-    def get_attr_geometry_items_for_coco(self):
-        return self._geom_attr_dict.items()
-
     def get_label_input_link_ids(self):
         return self._label_input_link_ids
 
-    def add_geometry_attributes_values(self, widget_object: AbstractWidgetObjectMixin, format_: GeometryOutputDataFormat):
-        geometry = widget_object.get_relative_geometry(format_)
+    def add_geometry_attributes_values(self, widget_object: AbstractWidgetObjectMixin):
+        geometry = widget_object.get_relative_geometry(self.PIXEL_FORMAT)
         if geometry.not_null():
-            self.__add_to_dict_geom_item_list(widget_object.widget_name, geometry)
+            self._geom_records.append(GeometryTable.create_record(
+                widget_object.widget_name, self._widget_id, geometry, widget_object.attr_list))
+            self._geom_tables = {}
             self.__add_to_dict_item_attr_list(widget_object.widget_name, widget_object.attr_list)
-            self.__add_to_dict_item_geom_attr_(widget_object.widget_name, geometry, widget_object.attr_list)
         if widget_object.values is not None:
             self.__add_to_dict_val(widget_object.widget_name, widget_object.values.get_vals_dict())
 
         self._widget_id += 1
 
     def get_geometry_distrib(self):
-        res = {}
-        for name, geometries_dict in self._geom_dict.items():
-            res[name] = len(geometries_dict)
-        return res
-
-
-    def __add_to_dict_geom_item_list(self, name_key: str, widget_geometry: WidgetGeometry):
-        if name_key not in self._geom_dict.keys():
-            self._geom_dict[name_key] = {}
-        self._geom_dict[name_key][self._widget_id] = widget_geometry
+        return self.get_geometry_table().get_distribution()
 
     def __add_to_dict_item_attr_list(self, name_key: str, attr_list: List[Attr]):
         if name_key not in self._attr_dict.keys():
@@ -74,11 +75,6 @@ class WidgetDataDict:
             self._content_dict[name_key] = {}
         self._content_dict[name_key][self._widget_id] = widget_values
 
-    def __add_to_dict_item_geom_attr_(self, name_key, geometry, attr_list):
-        if name_key not in self._geom_attr_dict.keys():
-            self._geom_attr_dict[name_key] = {}
-        self._geom_attr_dict[name_key][self._widget_id] = (geometry, attr_list)
-
     def add_two_last_added_as_label_input_link(self, label_index: int):
         if label_index == 0:
             self._label_input_link_ids.append(
@@ -112,26 +108,26 @@ class LabelInputIds:
 
 class WidgetDataDictFactory:
     @classmethod
-    def create_dict(cls, root_widget: Union[ContainerWidgetObjectMixin, WidgetObjectMixin],
-                    output_data_format: GeometryOutputDataFormat) -> WidgetDataDict:
-        dict_ = WidgetDataDict(root_widget)
-        cls.__update_dict_with_widget_tree(dict_, root_widget, output_data_format)
+    def create_dict(cls, root_widget: Union[ContainerWidgetObjectMixin, WidgetObjectMixin]) -> WidgetDataDict:
+        with CaptureContext(root_widget.widget.window()):
+            dict_ = WidgetDataDict(root_widget)
+            cls.__update_dict_with_widget_tree(dict_, root_widget)
         return dict_
 
     @classmethod
     def create_empty_dict(cls, root_widget: Union[ContainerWidgetObjectMixin, WidgetObjectMixin]):
-        return WidgetDataDict(root_widget)
+        with CaptureContext(root_widget.widget.window()):
+            return WidgetDataDict(root_widget)
 
     @classmethod
     def __update_dict_with_widget_tree(cls, dict_: WidgetDataDict,
-                                       widget: Union[ContainerWidgetObjectMixin, WidgetObjectMixin],
-                                       geom_format: GeometryOutputDataFormat):
-        dict_.add_geometry_attributes_values(widget, geom_format)
+                                       widget: Union[ContainerWidgetObjectMixin, WidgetObjectMixin]):
+        dict_.add_geometry_attributes_values(widget)
         if widget.is_label_input_container():
             for child in widget.get_children():
-                dict_.add_geometry_attributes_values(child, geom_format)
+                dict_.add_geometry_attributes_values(child)
             label_index = widget.find_child_index(LabelWidget)
             dict_.add_two_last_added_as_label_input_link(label_index)
         elif isinstance(widget, ContainerWidgetObjectMixin):
             for child in widget.get_children():
-                cls.__update_dict_with_widget_tree(dict_, child, geom_format)
+                cls.__update_dict_with_widget_tree(dict_, child)
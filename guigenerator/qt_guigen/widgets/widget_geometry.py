@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Tuple
+from typing import Dict, Tuple
 
 import PySide6.QtCore as QtC
 import PySide6.QtGui as QtG
@@ -428,14 +428,6 @@ class WidgetGeometryUtils:
     WIDGET_BBOX_PADDING = __config.get_int("default_widget_bbox_padding")
     SCREENSHOT_MARGIN = __config.get_int("default_screenshot_margin")
 
-    @classmethod
-    def convert_yolo_to_coco(cls, geom: WidgetGeometry, window_w: int,
-                             window_h: int) -> WidgetGeometry:
-        w, h = geom.width * window_w, geom.height * window_h
-        x, y = int(geom.x * window_w - w / 2.0), int(
-            geom.y * window_h - h / 2.0)
-        return WidgetGeometry(x, y, w, h)
-
     @classmethod
     def get_relative_widget_frame_geometry(cls,
                                            widget: QtW.QWidget) -> QtC.QRect:
@@ -455,20 +447,34 @@ class WidgetGeometryUtils:
     @classmethod
     def get_widget_window_frame_width_and_height(cls, widget: QtW.QWidget) -> \
             Tuple[int, int]:
-        g = widget.window().geometry()
-        fg = widget.window().frameGeometry()
+        window = widget.window()
+        context = CaptureContext.get_active()
+        if context is not None:
+            return context.get_frame_size(window)
+        return cls.read_window_frame_size(window)
+
+    @classmethod
+    def read_window_frame_size(cls, window: QtW.QWidget) -> Tuple[int, int]:
+        g = window.geometry()
+        fg = window.frameGeometry()
         return (fg.width() - g.width()), (fg.height() - g.height())
 
     @classmethod
     def calculate_screen_size(cls) -> Tuple[int, int]:
-        main_window = MainWindowAccessObject.get_main_window()
+        context = CaptureContext.get_active()
+        if context is not None:
+            return context.screen_size
+        return cls.read_screen_size(MainWindowAccessObject.get_main_window(),
+                                    cls.SCREENSHOT_MARGIN)
+
+    @classmethod
+    def read_screen_size(cls, main_window: QtW.QWidget,
+                         margin: int) -> Tuple[int, int]:
         root_frame_geometry: QtC.QRect = \
             WidgetGeometryUtils.get_relative_widget_frame_geometry(
                 main_window.window())
-        screen_width = root_frame_geometry.width() + 2 * \
-                       WidgetGeometryUtils.SCREENSHOT_MARGIN
-        screen_height = root_frame_geometry.height() + 2 * \
-                        WidgetGeometryUtils.SCREENSHOT_MARGIN
+        screen_width = root_frame_geometry.width() + 2 * margin
+        screen_height = root_frame_geometry.height() + 2 * margin
         return screen_width, screen_height
 
     @classmethod
@@ -478,8 +484,10 @@ class WidgetGeometryUtils:
         x_frame_offset, y_frame_offset = \
             cls.get_widget_window_frame_width_and_height(
                 widget)
-        x = center_x + x_frame_offset + cls.SCREENSHOT_MARGIN
-        y = center_y + y_frame_offset + cls.SCREENSHOT_MARGIN
+        context = CaptureContext.get_active()
+        margin = cls.SCREENSHOT_MARGIN if context is None else context.margin
+        x = center_x + x_frame_offset + margin
+        y = center_y + y_frame_offset + margin
         return x, y
 
     @classmethod
@@ -504,3 +512,49 @@ class WidgetGeometryUtils:
         if horizontal_scroll_bar.isVisible():
             shrank_height = geometry.height() - horizontal_scroll_bar.height()
             geometry.setHeight(shrank_height)
+
+
+# Frame sizes of the windows, screen size and screenshot margin of one
+# window capture. While the context is entered the geometry utils read
+# them from it, so a capture asks Qt for them once instead of several
+# times per widget. The widgets must not be moved or resized meanwhile.
+class CaptureContext:
+    __active: 'CaptureContext' = None
+
+    def __init__(self, main_window: QtW.QWidget,
+                 margin: int = WidgetGeometryUtils.SCREENSHOT_MARGIN):
+        self._main_window = main_window
+        self._margin = margin
+        self._frame_sizes: Dict[QtW.QWidget, Tuple[int, int]] = {}
+        self._screen_size: Tuple[int, int] = None
+        self._previous: 'CaptureContext' = None
+
+    @classmethod
+    def get_active(cls) -> 'CaptureContext':
+        return cls.__active
+
+    @property
+    def margin(self) -> int:
+        return self._margin
+
+    @property
+    def screen_size(self) -> Tuple[int, int]:
+        if self._screen_size is None:
+            self._screen_size = WidgetGeometryUtils.read_screen_size(
+                self._main_window, self._margin)
+        return self._screen_size
+
+    def get_frame_size(self, window: QtW.QWidget) -> Tuple[int, int]:
+        if window not in self._frame_sizes:
+            self._frame_sizes[window] = \
+                WidgetGeometryUtils.read_window_frame_size(window)
+        return self._frame_sizes[window]
+
+    def __enter__(self) -> 'CaptureContext':
+        self._previous = CaptureContext.__active
+        CaptureContext.__active = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        CaptureContext.__active = self._previous
+        self._previous = None
@@ -1,5 +1,4 @@
 from abc import ABC
-from random import random
 from typing import NoReturn, Union, Tuple
 
 from PySide6 import QtWidgets as QtW, QtCore as QtC
@@ -27,8 +26,11 @@ from guigenerator.qt_guigen.widgets.widgetobject.wo_abc import \
 # -----------------------------------------------------------------------------
 from guigenerator.qt_guigen.widgets.widgetobject.wo_enums import \
     ScrollbarButtonType
+from guigenerator.random_context import RandomContext
 from guigenerator.utils import Utils
 
+_rng = RandomContext.get_rng()
+
 
 class MainWindowWidget(ContainerWidgetObjectMixin):
     def __init__(self, widget_name: str, tree: TreeDto, max_row: int = 3,
@@ -947,9 +949,9 @@ class InputWidget(ContainerWidgetObjectMixin):
 
     def _default_widget_init(self):
         attr_holder_builder = AttrHolderBuilder()
-        if random() < 0.5:
+        if _rng.random() < 0.5:
             attr_holder_builder.type(1)
-            if random() < 0.5:
+            if _rng.random() < 0.5:
                 name = WidgetNames.get_description_name(
                     ComboBoxWidget.__name__)
                 widget_proxy = ComboBoxWidget(name)
@@ -961,7 +963,7 @@ class InputWidget(ContainerWidgetObjectMixin):
                     AttrName.CHECKABLE))
         else:
             attr_holder_builder.type(0)
-            if random() < 0.5:
+            if _rng.random() < 0.5:
                 name = WidgetNames.get_description_name(
                     LineEditWidget.__name__)
                 widget_proxy = LineEditWidget(name)
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from threading import BoundedSemaphore, Lock
+from typing import Callable, List
+
+
+# Runs image encoding and file writing off the Qt GUI thread.
+# Unordered tasks (image encodes) are spread over several threads, ordered
+# tasks (annotation writes) run one after another on a single thread.
+# At most max_pending tasks may be queued or running: submit blocks the
+# caller when the disk is slower than rendering, which keeps the memory
+# held by queued pixel buffers bounded. Once a task has failed, the ordered
+# tasks still queued are skipped: they would record items on top of the
+# partial output of the failed one.
+class BackgroundWriterPool:
+    def __init__(self, n_threads: int, max_pending: int):
+        if max_pending < 1:
+            raise RuntimeError("max_pending must be positive")
+        self._is_sync = n_threads < 1
+        self._executor = None if self._is_sync \
+            else ThreadPoolExecutor(max_workers=n_threads,
+                                    thread_name_prefix="encoder")
+        self._ordered_executor = None if self._is_sync \
+            else ThreadPoolExecutor(max_workers=1,
+                                    thread_name_prefix="writer")
+        self._pending = BoundedSemaphore(max_pending)
+        self._errors: List[BaseException] = []
+        self._errors_lock = Lock()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        return self.__submit(self._executor, fn, args)
+
+    def submit_ordered(self, fn: Callable, *args) -> Future:
+        return self.__submit(self._ordered_executor, self.__run_unless_failed,
+                             (fn, args))
+
+    def close(self):
+        if not self._is_sync:
+            self._executor.shutdown(wait=True)
+            self._ordered_executor.shutdown(wait=True)
+        self._raise_if_failed()
+
+    def __enter__(self) -> 'BackgroundWriterPool':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        elif not self._is_sync:
+            self._executor.shutdown(wait=True)
+            self._ordered_executor.shutdown(wait=True)
+
+    def __submit(self, executor: ThreadPoolExecutor, fn: Callable,
+                 args) -> Future:
+        self._raise_if_failed()
+        if self._is_sync:
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+        self._pending.acquire()
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._pending.release()
+            raise
+        future.add_done_callback(self._on_task_done)
+        return future
+
+    def __run_unless_failed(self, fn: Callable, args):
+        with self._errors_lock:
+            if self._errors:
+                return None
+        return fn(*args)
+
+    def _on_task_done(self, future: Future):
+        self._pending.release()
+        if future.exception() is not None:
+            with self._errors_lock:
+                self._errors.append(future.exception())
+
+    def _raise_if_failed(self):
+        with self._errors_lock:
+            if self._errors:
+                raise RuntimeError("Background writing failed") \
+                    from self._errors[0]
@@ -0,0 +1,38 @@
+import hashlib
+import random
+
+
+# The single source of randomness for tree, widget, text and font
+# generation. Before every dataset item the generator is reseeded from the
+# run seed and the item index, so an item depends only on (seed, index):
+# it can be generated again on its own and does not depend on the worker
+# or on the items generated before it.
+class RandomContext:
+    __rng = random.Random()
+
+    @classmethod
+    def get_rng(cls) -> random.Random:
+        return cls.__rng
+
+    @classmethod
+    def create_run_seed(cls) -> int:
+        return random.SystemRandom().getrandbits(63)
+
+    @classmethod
+    def get_item_seed(cls, run_seed: int, item_index: int) -> int:
+        digest = hashlib.sha256(f"{run_seed}:{item_index}".encode()).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    # seed of a named stream of draws shared by a block of items, e.g. the
+    # pool of HTML documents
+    @classmethod
+    def get_stream_seed(cls, run_seed: int, stream: str, index: int) -> int:
+        digest = hashlib.sha256(
+            f"{run_seed}:{stream}:{index}".encode()).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    @classmethod
+    def seed_item(cls, run_seed: int, item_index: int) -> int:
+        item_seed = cls.get_item_seed(run_seed, item_index)
+        cls.__rng.seed(item_seed)
+        return item_seed
@@ -22,13 +22,16 @@ json file
 import argparse
 import sys
 from pathlib import Path
-from random import randrange, shuffle
-from typing import List, Any, Set, NoReturn, Tuple
+from collections import Counter
+from typing import List, Any, Set, NoReturn, Tuple, Dict, FrozenSet
 
 from guigenerator.dto.tree_dto import TreeDto, NodeDto
 from guigenerator.dto.widget_description_dto import WidgetDescriptionDto
+from guigenerator.random_context import RandomContext
 from guigenerator.utils import Utils
 
+_rng = RandomContext.get_rng()
+
 
 class TreeGeneration:
     WIDGETS_PATH: Path = Utils.PROJ_ROOT_DIR / Path(
@@ -36,32 +39,52 @@ class TreeGeneration:
     OUTPUT_FILE_NAME: Path = Utils.PROJ_ROOT_DIR / Path(
         "temp/trees/widget_tree.json")
 
+    # compiled widget descriptions by description file path
+    __grammars: Dict[str, 'WidgetGrammar'] = {}
+
     @classmethod
     def generate_trees(cls, number_of_trees: int,
                        nmb_of_widgets_range: Tuple[int, int]):
-        from random import randint
+        from guigenerator.tree_guigen.tree_batch import BatchTreeGeneration
 
-        number_of_widgets = randint(*nmb_of_widgets_range)
+        number_of_widgets = _rng.randint(*nmb_of_widgets_range)
+        trees = BatchTreeGeneration.generate(number_of_trees,
+                                             number_of_widgets,
+                                             str(cls.WIDGETS_PATH))
 
         for tree_number in range(number_of_trees):
             tree_name = f"tree{tree_number + 1}.json"
             output_ = cls.OUTPUT_FILE_NAME.parent / Path(tree_name)
-            cls.generate_tree(number_of_widgets, str(cls.WIDGETS_PATH),
-                              str(output_))
+            Utils.write_to_json(trees.as_dto(tree_number).root_node,
+                                str(output_))
 
     @classmethod
     def generate_tree(cls, number_of_widgets: int,
                       input_path: str = WIDGETS_PATH,
                       output_path: str = OUTPUT_FILE_NAME):
-        possible_widgets_dto: List[WidgetDescriptionDto] \
-            = Utils.read_from_json(input_path,
-                                   object_hook_
-                                   =lambda d: WidgetDescriptionDto(**d))
-        possible_widgets = [
-            TreeWidgetDescriptionUtils.get_widget_desc_from_dto(dto) for dto in
-            possible_widgets_dto]
-        tree: Tree = Tree(possible_widgets, number_of_widgets)
-        Utils.write_to_json(tree.as_dto().root_node, output_path)
+        tree: TreeDto = cls.create_tree(number_of_widgets, input_path)
+        Utils.write_to_json(tree.root_node, output_path)
+
+    @classmethod
+    def create_tree(cls, number_of_widgets: int,
+                    input_path: str = WIDGETS_PATH) -> TreeDto:
+        grammar = cls.get_widget_grammar(input_path)
+        tree: Tree = Tree(grammar.widgets, number_of_widgets, grammar)
+        return tree.as_dto()
+
+    @classmethod
+    def get_widget_grammar(cls, input_path: str = WIDGETS_PATH) \
+            -> 'WidgetGrammar':
+        input_path = str(input_path)
+        if input_path not in cls.__grammars:
+            possible_widgets_dto: List[WidgetDescriptionDto] \
+                = Utils.read_from_json(input_path,
+                                       object_hook_
+                                       =lambda d: WidgetDescriptionDto(**d))
+            cls.__grammars[input_path] = WidgetGrammar([
+                TreeWidgetDescriptionUtils.get_widget_desc_from_dto(dto)
+                for dto in possible_widgets_dto])
+        return cls.__grammars[input_path]
 
     @classmethod
     def generate_empty_tree(cls, input_path: str = WIDGETS_PATH,
@@ -119,34 +142,73 @@ class TreeWidgetDescription:
                f"accept_list: {self.accept_list}>"
 
 
+# Widget descriptions compiled into the parent -> child relation, so that
+# tree sampling can draw directly from the valid choices instead of
+# drawing blindly and rejecting
+class WidgetGrammar:
+    def __init__(self, widgets: List[TreeWidgetDescription]):
+        self._widgets = widgets
+        self._child_names: Dict[str, FrozenSet[str]] = {}
+        self._accepting_any_names: Set[str] = set()
+        for widget in widgets:
+            if widget.is_container:
+                self._child_names[widget.name] = frozenset(
+                    widget.accept_list)
+                if widget.is_accepting_any_widget:
+                    self._accepting_any_names.add(widget.name)
+
+    @property
+    def widgets(self) -> List[TreeWidgetDescription]:
+        return self._widgets
+
+    def can_be_parent_of(self, parent_name: str, child_name: str) -> bool:
+        return parent_name in self._accepting_any_names \
+               or child_name in self._child_names.get(parent_name, ())
+
+    def get_child_names(self, parent_name: str) -> FrozenSet[str]:
+        return self._child_names.get(parent_name, frozenset())
+
+    def is_accepting_any_widget(self, parent_name: str) -> bool:
+        return parent_name in self._accepting_any_names
+
+
 class Tree:
     def __init__(self, reference_widgets: List[TreeWidgetDescription],
-                 number_of_widgets):
+                 number_of_widgets, grammar: WidgetGrammar = None):
+        if grammar is None:
+            grammar = WidgetGrammar(reference_widgets)
         self._tree: 'Node' = self._create_tree(reference_widgets,
-                                               number_of_widgets)
+                                               number_of_widgets, grammar)
 
     @property
     def tree(self) -> 'Node':
         return self._tree
 
     def _create_tree(self, ref_widgets: List[TreeWidgetDescription],
-                     number_of_widgets: int) -> 'Node':
+                     number_of_widgets: int, grammar: WidgetGrammar) \
+            -> 'Node':
         root_widget: TreeWidgetDescription = \
             TreeWidgetDescriptionUtils.get_first_container_widget(
                 ref_widgets)
         sample_nodes = WidgetsSample.create_sample(ref_widgets, root_widget,
                                                    number_of_widgets)
-        tree: Node = self._build_tree(sample_nodes)
-        shuffle(tree.children)
+        tree: Node = self._build_tree(sample_nodes, grammar)
+        _rng.shuffle(tree.children)
         return tree
 
+    # Every link is drawn uniformly from the (parent, child) pairs that are
+    # valid at that moment, as the former draw-and-reject loops did, but
+    # without the retries. Nodes that no parent can take are left out of
+    # the tree instead of being retried forever.
     @classmethod
-    def _build_tree(cls, widgets: List[TreeWidgetDescription]):
+    def _build_tree(cls, widgets: List[TreeWidgetDescription],
+                    grammar: WidgetGrammar):
         container_nodes: List[
             Node] = TreeWidgetDescriptionUtils.get_container_widgets_as_nodes(
             widgets)
         while len(container_nodes) > 1:
-            cls._link_two_container_nodes(container_nodes)
+            if not cls._link_two_container_nodes(container_nodes, grammar):
+                break
         tree_of_containers: Node = TreeWidgetDescriptionUtils.get_first_node(
             container_nodes)
 
@@ -154,27 +216,48 @@ class Tree:
             Node] = TreeWidgetDescriptionUtils.get_ordinary_widgets_as_nodes(
             widgets)
         container_tree_nodes = tree_of_containers.get_node_and_children()
-        while len(ordinary_tree_nodes) > 0:
-            cls._link_ordinary_node_to_container_node(container_tree_nodes,
-                                                      ordinary_tree_nodes)
+        cls._link_ordinary_nodes_to_container_nodes(container_tree_nodes,
+                                                    ordinary_tree_nodes,
+                                                    grammar)
 
         cls.remove_empty_containers(tree_of_containers)
         return tree_of_containers
 
     @classmethod
-    def _link_ordinary_node_to_container_node(cls, container_tree_nodes: List[
-        'Node'],
-                                              ordinary_tree_nodes: List[
-                                                  'Node']):
-        parent_index: int = randrange(0, len(container_tree_nodes))
-        child_index: int = randrange(0, len(ordinary_tree_nodes))
-
-        child = ordinary_tree_nodes[child_index]
-        parent = container_tree_nodes[parent_index]
-
-        if parent.can_be_parent_of(child) and cls._only_child_check(parent):
+    def _link_ordinary_nodes_to_container_nodes(
+            cls, container_tree_nodes: List['Node'],
+            ordinary_tree_nodes: List['Node'], grammar: WidgetGrammar):
+        children_by_name: Dict[str, List[Node]] = {}
+        for child in ordinary_tree_nodes:
+            children_by_name.setdefault(child.widget.name, []).append(child)
+        parents_by_name: Dict[str, List[Node]] = {
+            name: [parent for parent in container_tree_nodes
+                   if grammar.can_be_parent_of(parent.widget.name, name)
+                   and cls._only_child_check(parent)]
+            for name in children_by_name}
+
+        while children_by_name:
+            # a name is drawn with the number of valid pairs it is part of
+            names = [name for name in children_by_name
+                     if parents_by_name[name]]
+            if not names:
+                break
+            name = _rng.choices(
+                names, weights=[len(children_by_name[name])
+                                * len(parents_by_name[name])
+                                for name in names])[0]
+
+            children = children_by_name[name]
+            child = children.pop(_rng.randrange(0, len(children)))
+            parent = _rng.choice(parents_by_name[name])
             parent.children.append(child)
-            ordinary_tree_nodes.pop(child_index)
+
+            if not children:
+                children_by_name.pop(name)
+            if not cls._only_child_check(parent):
+                for parents in parents_by_name.values():
+                    if parent in parents:
+                        parents.remove(parent)
 
     @classmethod
     def _only_child_check(cls, parent: 'Node') -> bool:
@@ -182,18 +265,41 @@ class Tree:
                or (parent.widget.has_only_child and len(parent.children) == 0)
 
     @classmethod
-    def _link_two_container_nodes(cls, container_nodes: List['Node']):
-        parent_index: int = randrange(0, len(container_nodes))
-        child_index: int = randrange(0, len(container_nodes))
-        if parent_index != child_index:
-            parent_node = container_nodes[parent_index]
-            child_node = container_nodes[child_index]
-
-            if parent_node.can_be_parent_of(child_node):
-                parent_node.children.append(child_node)
-                cls._link_only_children(child_index, child_node,
-                                        container_nodes)
-                container_nodes.remove(child_node)
+    def _link_two_container_nodes(cls, container_nodes: List['Node'],
+                                  grammar: WidgetGrammar) -> bool:
+        # a parent is drawn with the number of valid children it has
+        count_by_name = Counter(node.widget.name for node in container_nodes)
+        parent_weights = []
+        for parent_node in container_nodes:
+            parent_name = parent_node.widget.name
+            if grammar.is_accepting_any_widget(parent_name):
+                n_children = len(container_nodes) - 1
+            else:
+                n_children = sum(
+                    count_by_name[name]
+                    for name in grammar.get_child_names(parent_name)) \
+                             - (1 if grammar.can_be_parent_of(parent_name,
+                                                              parent_name)
+                                else 0)
+            parent_weights.append(n_children)
+        if sum(parent_weights) == 0:
+            return False
+
+        parent_index: int = _rng.choices(range(len(container_nodes)),
+                                         weights=parent_weights)[0]
+        parent_node = container_nodes[parent_index]
+        child_indexes = [
+            index for index, node in enumerate(container_nodes)
+            if index != parent_index
+            and grammar.can_be_parent_of(parent_node.widget.name,
+                                         node.widget.name)]
+        child_index: int = _rng.choice(child_indexes)
+        child_node = container_nodes[child_index]
+
+        parent_node.children.append(child_node)
+        cls._link_only_children(child_index, child_node, container_nodes)
+        container_nodes.remove(child_node)
+        return True
 
     @classmethod
     def _link_only_children(cls, node_index, node, container_nodes):
@@ -324,26 +430,45 @@ class WidgetsSample:
         accepted_widget_names: Set[str] \
             = set(accepted_widget_name for accepted_widget_name in
                   root_widget.accept_list)
-        probabilities: List[float] = [rw.prob for rw in ref_widgets]
         widgets_sample: List[TreeWidgetDescription] = [root_widget]
-        while len(widgets_sample) < number_of_widgets:
-            cls._generate_widget_node(accepted_widget_names, probabilities,
-                                      ref_widgets, widgets_sample)
+        candidates, probabilities = cls._get_candidates(
+            accepted_widget_names, ref_widgets, widgets_sample)
+        while len(widgets_sample) < number_of_widgets and candidates:
+            n_accepted_names = len(accepted_widget_names)
+            rand_widget = cls._generate_widget_node(
+                accepted_widget_names, probabilities, candidates,
+                widgets_sample)
+            if rand_widget.is_solo \
+                    or len(accepted_widget_names) != n_accepted_names:
+                candidates, probabilities = cls._get_candidates(
+                    accepted_widget_names, ref_widgets, widgets_sample)
 
         cls._fix_only_child_widgets_number_ratio(widgets_sample)
 
         return widgets_sample
 
+    # the widgets that may be added to the sample now; drawing from them
+    # with their probabilities is what drawing from all widgets and
+    # rejecting the unacceptable ones amounted to
+    @classmethod
+    def _get_candidates(cls, accepted_widget_names, ref_widgets,
+                        widgets_sample) \
+            -> Tuple[List[TreeWidgetDescription], List[float]]:
+        candidates = [rw for rw in ref_widgets
+                      if rw.prob > 0
+                      and rw.name in accepted_widget_names
+                      and cls._solo_checked(rw, widgets_sample)]
+        return candidates, [rw.prob for rw in candidates]
+
     @classmethod
     def _generate_widget_node(cls, accepted_widget_names, probabilities,
-                              ref_widgets, widgets_sample):
-        from random import choices
+                              candidates, widgets_sample) \
+            -> TreeWidgetDescription:
         rand_widget: TreeWidgetDescription = \
-            choices(ref_widgets, weights=probabilities, k=1)[0]
-        if rand_widget.name in accepted_widget_names \
-                and cls._solo_checked(rand_widget, widgets_sample):
-            widgets_sample.append(rand_widget)
-            accepted_widget_names.update(rand_widget.accept_list)
+            _rng.choices(candidates, weights=probabilities, k=1)[0]
+        widgets_sample.append(rand_widget)
+        accepted_widget_names.update(rand_widget.accept_list)
+        return rand_widget
 
     @classmethod
     def _solo_checked(cls, widget, widget_sample):
@@ -354,7 +479,9 @@ class WidgetsSample:
     def _fix_only_child_widgets_number_ratio(cls, widgets_sample: List[
         TreeWidgetDescription]):
         # DUMB VERSION
-        parent_child_names = set(
+        # dict keeps the order of the sample, a set of strings would be
+        # iterated in an order that changes from process to process
+        parent_child_names = dict.fromkeys(
             (w.name, w.accept_list[0]) for w in widgets_sample if
             w.has_only_child)
         names = [widget.name for widget in widgets_sample]
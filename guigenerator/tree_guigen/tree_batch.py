@@ -0,0 +1,478 @@
+from pathlib import Path
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from guigenerator.dto.tree_dto import TreeDto, NodeDto
+from guigenerator.random_context import RandomContext
+from guigenerator.tree_guigen.gui_tree_gen import TreeGeneration, \
+    WidgetGrammar
+
+_rng = RandomContext.get_rng()
+
+
+# Many generated trees in three flat arrays instead of Node object graphs.
+# Tree i owns the nodes offsets[i]:offsets[i + 1]; the nodes are stored in
+# preorder with siblings in their order, type_ids index widget_names and
+# parents holds the index of the parent node inside the tree, -1 for the
+# root.
+class TreeBatch:
+    def __init__(self, widget_names: List[str], type_ids: np.ndarray,
+                 parents: np.ndarray, offsets: np.ndarray):
+        self._widget_names = widget_names
+        self._type_ids = type_ids
+        self._parents = parents
+        self._offsets = offsets
+
+    @property
+    def widget_names(self) -> List[str]:
+        return self._widget_names
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get_type_ids(self, tree_index: int) -> np.ndarray:
+        start, stop = self._offsets[tree_index:tree_index + 2]
+        return self._type_ids[start:stop]
+
+    def get_parents(self, tree_index: int) -> np.ndarray:
+        start, stop = self._offsets[tree_index:tree_index + 2]
+        return self._parents[start:stop]
+
+    def as_dto(self, tree_index: int) -> TreeDto:
+        nodes: List[NodeDto] = []
+        for type_id, parent in zip(self.get_type_ids(tree_index).tolist(),
+                                   self.get_parents(tree_index).tolist()):
+            node = NodeDto(self._widget_names[type_id])
+            if parent >= 0:
+                nodes[parent].children.append(node)
+            nodes.append(node)
+        return TreeDto(nodes[0])
+
+    def save(self, path: Path):
+        np.savez(path, widget_names=np.array(self._widget_names),
+                 type_ids=self._type_ids, parents=self._parents,
+                 offsets=self._offsets)
+
+    @classmethod
+    def load(cls, path: Path) -> 'TreeBatch':
+        with np.load(path) as data:
+            return cls(data["widget_names"].tolist(), data["type_ids"],
+                       data["parents"], data["offsets"])
+
+
+# Generates trees with the same distribution as Tree, a chunk of trees at
+# a time, every phase working on all nodes of the chunk at once:
+# - widget types are drawn as a matrix from the distribution valid in the
+#   sampling state of a tree; trees sharing a state draw together, and a
+#   tree keeps its draws up to the first widget that changes its state,
+# - container nodes are linked one link of every tree at a time,
+# - ordinary nodes get a uniformly drawn valid parent all at once,
+# - empty containers are dropped and the nodes are put into preorder level
+#   by level.
+class BatchTreeGeneration:
+    CHUNK_SIZE = 8192
+
+    @classmethod
+    def generate(cls, number_of_trees: int,
+                 number_of_widgets: Union[int, Tuple[int, int]],
+                 input_path: str = TreeGeneration.WIDGETS_PATH,
+                 seed: int = None) -> TreeBatch:
+        rng = np.random.default_rng(
+            _rng.getrandbits(64) if seed is None else seed)
+        arrays = _GrammarArrays(TreeGeneration.get_widget_grammar(input_path))
+
+        if isinstance(number_of_widgets, int):
+            tree_sizes = np.full(number_of_trees, number_of_widgets)
+        else:
+            tree_sizes = rng.integers(number_of_widgets[0],
+                                      number_of_widgets[1] + 1,
+                                      size=number_of_trees)
+
+        type_ids_list = []
+        parents_list = []
+        tree_lengths_list = []
+        for start in range(0, number_of_trees, cls.CHUNK_SIZE):
+            type_ids, parents, tree_lengths = cls._generate_chunk(
+                arrays, rng, tree_sizes[start:start + cls.CHUNK_SIZE])
+            type_ids_list.append(type_ids)
+            parents_list.append(parents)
+            tree_lengths_list.append(tree_lengths)
+
+        offsets = np.zeros(number_of_trees + 1, dtype=np.int64)
+        if number_of_trees:
+            np.cumsum(np.concatenate(tree_lengths_list), out=offsets[1:])
+        return TreeBatch(
+            arrays.names,
+            np.concatenate(type_ids_list or [[]]).astype(np.int16),
+            np.concatenate(parents_list or [[]]).astype(np.int32), offsets)
+
+    @classmethod
+    def _generate_chunk(cls, arrays: '_GrammarArrays',
+                        rng: np.random.Generator, tree_sizes: np.ndarray) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        samples = cls._create_samples(arrays, rng, tree_sizes)
+        cls._fix_only_child_widgets_number_ratio(arrays, samples)
+
+        # from here on a node is an index into the flat node arrays, a
+        # tree being its row in samples and its root the first node
+        is_node = samples >= 0
+        node_trees, node_columns = np.nonzero(is_node)
+        nodes = _Nodes(node_trees, samples[is_node], node_columns == 0,
+                       len(tree_sizes), int(tree_sizes.max(initial=1)))
+
+        cls._link_container_nodes(arrays, rng, nodes)
+        cls._link_ordinary_nodes(arrays, rng, nodes)
+        # the root children are shuffled, as Tree does
+        root_children = np.flatnonzero(nodes.get_parent_is_root())
+        nodes.order[root_children] = rng.random(len(root_children))
+
+        in_tree = cls._remove_empty_containers(arrays, nodes)
+        return cls._to_preorder(nodes, in_tree)
+
+    @classmethod
+    def _create_samples(cls, arrays: '_GrammarArrays',
+                        rng: np.random.Generator, tree_sizes: np.ndarray) \
+            -> np.ndarray:
+        n_trees = len(tree_sizes)
+        samples = np.full((n_trees, int(tree_sizes.max(initial=1))), -1,
+                          dtype=np.int64)
+        samples[:, 0] = arrays.root_type
+        n_sampled = np.ones(n_trees, dtype=np.int64)
+        target_sizes = np.maximum(tree_sizes, 1)
+        accepted = np.tile(arrays.root_accepted, (n_trees, 1))
+        used_solo = np.zeros_like(accepted)
+
+        active = np.flatnonzero(n_sampled < target_sizes)
+        while len(active):
+            allowed = accepted[active] & ~used_solo[active] \
+                      & arrays.is_drawable
+            # the allowed rows packed into bytes are grouped much faster
+            packed = np.packbits(allowed, axis=1)
+            _, first_rows, state_indexes = np.unique(
+                packed.view(np.dtype((np.void, packed.shape[1]))).ravel(),
+                return_index=True, return_inverse=True)
+            for state_index, first_row in enumerate(first_rows):
+                state = allowed[first_row]
+                rows = active[state_indexes.ravel() == state_index]
+                if not state.any():
+                    target_sizes[rows] = n_sampled[rows]
+                    continue
+
+                n_left = target_sizes[rows] - n_sampled[rows]
+                draws = arrays.draw(rng, state, (len(rows), n_left.max()))
+                is_left = np.arange(draws.shape[1]) < n_left[:, None]
+
+                # draws after a state changing widget came from an
+                # outdated distribution and are dropped
+                is_changing = arrays.get_changing(state)[draws] & is_left
+                has_change = is_changing.any(axis=1)
+                n_taken = np.where(has_change, is_changing.argmax(axis=1) + 1,
+                                   n_left)
+
+                draw_rows, draw_columns = np.nonzero(
+                    np.arange(draws.shape[1]) < n_taken[:, None])
+                samples[rows[draw_rows],
+                        n_sampled[rows][draw_rows] + draw_columns] = \
+                    draws[draw_rows, draw_columns]
+                n_sampled[rows] += n_taken
+
+                changed_rows = rows[has_change]
+                last = draws[has_change, n_taken[has_change] - 1]
+                accepted[changed_rows] |= arrays.accept_listed[last]
+                used_solo[changed_rows, last] |= arrays.is_solo[last]
+            active = active[n_sampled[active] < target_sizes[active]]
+        return samples
+
+    @classmethod
+    def _fix_only_child_widgets_number_ratio(cls, arrays: '_GrammarArrays',
+                                             samples: np.ndarray):
+        if not arrays.has_only_child.any():
+            return
+        for row in np.flatnonzero(
+                arrays.has_only_child[samples.clip(0)].any(axis=1)):
+            sample = samples[row]
+            name_ids = np.where(sample >= 0, arrays.name_ids[sample], -1)
+            only_child_parents = sample[(sample >= 0)
+                                        & arrays.has_only_child[sample]]
+            for parent_type in dict.fromkeys(only_child_parents.tolist()):
+                child_positions = np.flatnonzero(
+                    name_ids == arrays.only_child_name_ids[parent_type])
+                n_extra = len(child_positions) - int(
+                    (name_ids == arrays.name_ids[parent_type]).sum())
+                if n_extra > 0:
+                    name_ids[child_positions[:n_extra]] = -1
+                    sample[child_positions[:n_extra]] = -1
+
+    @classmethod
+    def _link_container_nodes(cls, arrays: '_GrammarArrays',
+                              rng: np.random.Generator, nodes: '_Nodes'):
+        containers = np.flatnonzero(arrays.is_container[nodes.types])
+        tree_containers = nodes.get_tree_rows(containers)
+        # the container nodes not linked yet of every tree, one link of
+        # every tree at a time
+        is_root = tree_containers >= 0
+        types = np.where(is_root, nodes.types[tree_containers.clip(0)], 0)
+        n_links = np.zeros(nodes.n_trees, dtype=np.int64)
+        columns = np.arange(tree_containers.shape[1])
+
+        rows = np.flatnonzero(is_root.sum(axis=1) > 1)
+        while len(rows):
+            row_is_root = is_root[rows]
+            can_link = arrays.can_be_parent[types[rows][:, :, None],
+                                            types[rows][:, None, :]] \
+                       & row_is_root[:, :, None] & row_is_root[:, None, :]
+            can_link[:, columns, columns] = False
+            # a parent is drawn with the number of valid children
+            weights = can_link.sum(axis=2)
+            has_link = weights.any(axis=1)
+            rows, can_link, weights = \
+                rows[has_link], can_link[has_link], weights[has_link]
+            if not len(rows):
+                break
+            parent_columns = cls._draw_columns(rng, weights)
+            child_columns = cls._draw_columns(
+                rng, can_link[np.arange(len(rows)), parent_columns])
+
+            parents = tree_containers[rows, parent_columns]
+            children = tree_containers[rows, child_columns]
+            nodes.parents[children] = parents
+            nodes.order[children] = n_links[rows]
+            n_links[rows] += 1
+            is_root[rows, child_columns] = False
+
+            # the roots the child lists as children become its children,
+            # as Tree._link_only_children does
+            is_grandchild = arrays.accept_listed[
+                nodes.types[children][:, None], types[rows]] \
+                & is_root[rows]
+            is_grandchild[np.arange(len(rows)), parent_columns] = False
+            grandchild_rows, grandchild_columns = np.nonzero(is_grandchild)
+            grandchildren = tree_containers[rows[grandchild_rows],
+                                            grandchild_columns]
+            nodes.parents[grandchildren] = children[grandchild_rows]
+            nodes.order[grandchildren] = n_links[rows[grandchild_rows]] \
+                + np.cumsum(is_grandchild, axis=1)[
+                    grandchild_rows, grandchild_columns] - 1
+            n_links[rows] += is_grandchild.sum(axis=1)
+            is_root[rows[grandchild_rows], grandchild_columns] = False
+
+            rows = rows[is_root[rows].sum(axis=1) > 1]
+
+    @classmethod
+    def _draw_columns(cls, rng: np.random.Generator,
+                      weights: np.ndarray) -> np.ndarray:
+        # a column of every row, drawn with the row weights
+        cumulative = weights.cumsum(axis=1)
+        picks = rng.random(len(weights)) * cumulative[:, -1]
+        return (cumulative <= picks[:, None]).sum(axis=1)
+
+    @classmethod
+    def _link_ordinary_nodes(cls, arrays: '_GrammarArrays',
+                             rng: np.random.Generator, nodes: '_Nodes'):
+        is_container = arrays.is_container[nodes.types]
+        containers = np.flatnonzero(is_container & (nodes.get_depths() >= 0))
+        tree_containers = nodes.get_tree_rows(containers)
+
+        # parents taking only one child change the valid pairs after every
+        # link, the trees having them are linked one pair at a time
+        is_sequential = np.bincount(
+            nodes.trees[containers[
+                arrays.has_only_child[nodes.types[containers]]]],
+            minlength=nodes.n_trees) > 0
+        ordinaries = np.flatnonzero(~is_container
+                                    & ~is_sequential[nodes.trees])
+
+        # every child independently gets a uniformly drawn valid parent,
+        # in a uniformly drawn link order after the container children
+        candidates = tree_containers[nodes.trees[ordinaries]]
+        is_valid = (candidates >= 0) & arrays.can_be_parent[
+            nodes.types[candidates.clip(0)],
+            nodes.types[ordinaries][:, None]]
+        is_placed = is_valid.any(axis=1)
+        parent_columns = cls._draw_columns(rng, is_valid[is_placed])
+        nodes.parents[ordinaries[is_placed]] = candidates[
+            is_placed, parent_columns]
+        nodes.order[ordinaries] = nodes.max_tree_size + rng.random(
+            len(ordinaries))
+
+        tree_ordinaries = nodes.get_tree_rows(np.flatnonzero(
+            ~is_container & is_sequential[nodes.trees]))
+        for tree_index in np.flatnonzero(is_sequential):
+            cls._link_ordinary_nodes_sequentially(
+                arrays, rng, nodes, tree_containers[tree_index],
+                tree_ordinaries[tree_index])
+
+    @classmethod
+    def _link_ordinary_nodes_sequentially(cls, arrays: '_GrammarArrays',
+                                          rng: np.random.Generator,
+                                          nodes: '_Nodes',
+                                          containers: np.ndarray,
+                                          ordinaries: np.ndarray):
+        containers = containers[containers >= 0]
+        ordinaries = ordinaries[ordinaries >= 0]
+        is_valid = arrays.can_be_parent[
+            np.ix_(nodes.types[containers], nodes.types[ordinaries])].T
+        only_child = arrays.has_only_child[nodes.types[containers]]
+        is_valid &= ~(only_child & np.isin(containers, nodes.parents))
+
+        n_links = nodes.max_tree_size
+        unplaced = np.ones(len(ordinaries), dtype=bool)
+        while unplaced.any():
+            pairs = np.argwhere(is_valid & unplaced[:, None])
+            if not len(pairs):
+                break
+            child_row, parent_column = pairs[rng.integers(len(pairs))]
+            nodes.parents[ordinaries[child_row]] = containers[parent_column]
+            nodes.order[ordinaries[child_row]] = n_links
+            n_links += 1
+            unplaced[child_row] = False
+            if only_child[parent_column]:
+                is_valid[:, parent_column] = False
+
+    @classmethod
+    def _remove_empty_containers(cls, arrays: '_GrammarArrays',
+                                 nodes: '_Nodes') -> np.ndarray:
+        # containers left without children are removed, as
+        # Tree.remove_empty_containers does
+        in_tree = nodes.get_depths() >= 0
+        is_removable = arrays.is_container[nodes.types] & ~nodes.is_root
+        while True:
+            linked = in_tree & (nodes.parents >= 0)
+            n_children = np.bincount(nodes.parents[linked],
+                                     minlength=len(nodes.types))
+            is_empty = in_tree & is_removable & (n_children == 0)
+            if not is_empty.any():
+                return in_tree
+            in_tree &= ~is_empty
+
+    @classmethod
+    def _to_preorder(cls, nodes: '_Nodes', in_tree: np.ndarray) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        depths = np.where(in_tree, nodes.get_depths(), -1)
+        levels = [np.flatnonzero(depths == depth)
+                  for depth in range(int(depths.max(initial=0)) + 1)]
+
+        subtree_sizes = in_tree.astype(np.int64)
+        for level in reversed(levels[1:]):
+            subtree_sizes += np.bincount(
+                nodes.parents[level], weights=subtree_sizes[level],
+                minlength=len(subtree_sizes)).astype(np.int64)
+
+        # a node comes after its parent and the subtrees of its earlier
+        # siblings
+        children = np.flatnonzero(in_tree & ~nodes.is_root)
+        children = children[np.lexsort((nodes.order[children],
+                                        nodes.parents[children]))]
+        sizes = subtree_sizes[children]
+        before = np.cumsum(sizes) - sizes
+        is_first = np.ones(len(children), dtype=bool)
+        is_first[1:] = nodes.parents[children[1:]] \
+                       != nodes.parents[children[:-1]]
+        offsets = np.zeros(len(subtree_sizes), dtype=np.int64)
+        offsets[children] = before - before[is_first][
+            np.cumsum(is_first) - 1]
+
+        positions = np.zeros(len(subtree_sizes), dtype=np.int64)
+        for level in levels[1:]:
+            positions[level] = positions[nodes.parents[level]] + 1 \
+                               + offsets[level]
+
+        tree_lengths = np.bincount(nodes.trees[in_tree],
+                                   minlength=nodes.n_trees)
+        kept = np.flatnonzero(in_tree)
+        indexes = (np.cumsum(tree_lengths) - tree_lengths)[
+                      nodes.trees[kept]] + positions[kept]
+        type_ids = np.empty(len(kept), dtype=np.int64)
+        type_ids[indexes] = nodes.types[kept]
+        parents = np.empty(len(kept), dtype=np.int64)
+        parents[indexes] = np.where(nodes.is_root[kept], -1,
+                                    positions[nodes.parents[kept]])
+        return type_ids, parents, tree_lengths
+
+
+# the nodes of a chunk of trees in flat arrays; order sorts the children
+# of a node
+class _Nodes:
+    def __init__(self, trees: np.ndarray, types: np.ndarray,
+                 is_root: np.ndarray, n_trees: int, max_tree_size: int):
+        self.trees = trees
+        self.types = types
+        self.is_root = is_root
+        self.n_trees = n_trees
+        self.max_tree_size = max_tree_size
+        self.parents = np.full(len(types), -1, dtype=np.int64)
+        self.order = np.zeros(len(types))
+
+    # the given nodes in a row per tree, in their order, -1 padded
+    def get_tree_rows(self, nodes: np.ndarray) -> np.ndarray:
+        node_trees = self.trees[nodes]
+        counts = np.bincount(node_trees, minlength=self.n_trees)
+        rows = np.full((self.n_trees, counts.max(initial=0)), -1,
+                       dtype=np.int64)
+        rows[node_trees, np.arange(len(nodes))
+             - (np.cumsum(counts) - counts)[node_trees]] = nodes
+        return rows
+
+    def get_parent_is_root(self) -> np.ndarray:
+        return (self.parents >= 0) & self.is_root[self.parents.clip(0)]
+
+    # the depth of every node reachable from its tree root, -1 for others
+    def get_depths(self) -> np.ndarray:
+        depths = np.where(self.is_root, 0, -1)
+        parents = self.parents.clip(0)
+        is_linked = self.parents >= 0
+        while True:
+            is_reached = is_linked & (depths < 0) & (depths[parents] >= 0)
+            if not is_reached.any():
+                return depths
+            depths[is_reached] = depths[parents[is_reached]] + 1
+
+
+# the widget grammar as lookup arrays indexed by widget type id, a type id
+# being the index of the description in the description file
+class _GrammarArrays:
+    def __init__(self, grammar: WidgetGrammar):
+        widgets = grammar.widgets
+        self.names = [widget.name for widget in widgets]
+        unique_names = list(dict.fromkeys(self.names))
+        self.name_ids = np.array([unique_names.index(name)
+                                  for name in self.names])
+        n_types = len(widgets)
+
+        self.probabilities = np.array([widget.prob for widget in widgets])
+        self.is_container = np.array([widget.is_container
+                                      for widget in widgets])
+        self.is_solo = np.array([widget.is_solo for widget in widgets])
+        self.has_only_child = np.array([widget.has_only_child
+                                        for widget in widgets])
+        self.is_drawable = self.probabilities > 0
+        self.only_child_name_ids = np.array([
+            unique_names.index(widget.accept_list[0])
+            if widget.has_only_child and widget.accept_list[0] in unique_names
+            else -1 for widget in widgets])
+
+        self.can_be_parent = np.zeros((n_types, n_types), dtype=bool)
+        self.accept_listed = np.zeros((n_types, n_types), dtype=bool)
+        for parent_type, parent in enumerate(widgets):
+            for child_type, child in enumerate(widgets):
+                self.can_be_parent[parent_type, child_type] = \
+                    parent.is_container and grammar.can_be_parent_of(
+                        parent.name, child.name)
+                self.accept_listed[parent_type, child_type] = \
+                    child.name in parent.accept_list
+        # the first container is the root, as in Tree
+        self.root_type = int(np.flatnonzero(self.is_container)[0])
+        self.root_accepted = self.accept_listed[self.root_type].copy()
+        self.root_allowed = self.root_accepted & self.is_drawable
+
+    def draw(self, rng: np.random.Generator, allowed: np.ndarray,
+             size) -> np.ndarray:
+        weights = np.where(allowed, self.probabilities, 0.0)
+        return rng.choice(len(self.names), size=size,
+                          p=weights / weights.sum())
+
+    # the widget types drawing which changes the sampling state allowed
+    def get_changing(self, allowed: np.ndarray) -> np.ndarray:
+        return self.is_solo | (self.accept_listed & self.is_drawable
+                               & ~allowed).any(axis=1)
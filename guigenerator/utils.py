@@ -44,20 +44,22 @@ class Utils:
 
     @classmethod
     def write_to_json(cls, obj, path: str) -> None:
-        def get_object_dict(d):
-            return d.__dict__
-
         from ntpath import split
         from os import makedirs
-        from json import dumps
 
         filepath, _ = split(path)
         if filepath:
             makedirs(filepath, exist_ok=True)
         with open(path, "w") as out:
-            json_string = dumps(obj, default=get_object_dict,
-                                ensure_ascii=False)
-            out.write(json_string)
+            out.write(cls.to_json_string(obj))
+
+    @classmethod
+    def to_json_string(cls, obj) -> str:
+        def get_object_dict(d):
+            return d.__dict__
+
+        from json import dumps
+        return dumps(obj, default=get_object_dict, ensure_ascii=False)
 
     @classmethod
     def read_from_json(cls, input_path: str,
@@ -96,3 +98,39 @@ class Utils:
         dir_path.mkdir(parents=True, exist_ok=True)
         with open(file_path, mode) as out:
             out.write(text)
+
+    @classmethod
+    def move_file(cls, src_path: Path, dst_path: Path):
+        from os import replace
+        from shutil import move
+
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replace(src_path, dst_path)
+        except OSError:
+            move(str(src_path), str(dst_path))
+
+    @classmethod
+    def append_file(cls, src_path: Path, dst_path: Path):
+        from shutil import copyfileobj
+
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(src_path, 'rb') as fin, open(dst_path, 'ab') as out:
+            copyfileobj(fin, out)
+
+    @classmethod
+    def get_file_sizes(cls, dir_path: Path, pattern: str) -> Dict[str, int]:
+        return {file_path.name: file_path.stat().st_size
+                for file_path in dir_path.glob(pattern)}
+
+    @classmethod
+    def truncate_files(cls, dir_path: Path, pattern: str,
+                       file_sizes: Dict[str, int]):
+        # files matching the pattern go back to the given sizes, files
+        # missing from file_sizes were created later and are removed
+        for file_path in dir_path.glob(pattern):
+            if file_path.name in file_sizes:
+                with open(file_path, 'r+b') as fout:
+                    fout.truncate(file_sizes[file_path.name])
+            else:
+                file_path.unlink()
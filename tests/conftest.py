@@ -0,0 +1,17 @@
+import os
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from guigenerator.qt_guigen.text_corpus import TextCorpusCache, \
+    TextCorpusManager, TextKind
+
+# the widget modules read the text corpus when they are imported, the
+# tests use a small local one instead of fetching it
+_corpus_path = Path(tempfile.mkdtemp()) / "text_corpus.bin"
+TextCorpusCache.write(_corpus_path,
+                      {kind: [f"{kind.value} {i}" for i in range(10)]
+                       for kind in TextKind},
+                      "tests")
+TextCorpusManager.CACHE_PATH = _corpus_path
@@ -0,0 +1,67 @@
+import json
+
+from guigenerator.qt_guigen.export_data import CocoGeomDataExporter, \
+    ExportGeomDataFactory
+from guigenerator.qt_guigen.widgets import GeometryOutputDataFormat
+
+
+def _write_shard(dir_path, images, annotations, links):
+    # annotations as (id, image id, bbox), the bbox tells them apart
+    dir_path.mkdir()
+    coco_dict = {"images": [{"id": image_id, "file_name": name}
+                            for image_id, name in images],
+                 "annotations": [{"id": id_, "image_id": image_id,
+                                  "category_id": 1, "bbox": bbox}
+                                 for id_, image_id, bbox in annotations]}
+    (dir_path / (CocoGeomDataExporter.GEOMETRY_FILE_NAME + ".json")) \
+        .write_text(json.dumps(coco_dict))
+    (dir_path / CocoGeomDataExporter.LABEL_INPUT_LINK_FILE_NAME) \
+        .write_text(json.dumps({"links": [
+            {"image_id": image_id, "label_id": label_id,
+             "input_id": input_id}
+            for image_id, label_id, input_id in links]}))
+
+
+# the label-input links of every shard point at the same annotations
+# after the merge; a widget id, left where the widget has no annotation,
+# is kept
+def test_coco_merge_keeps_links_on_their_annotations(tmp_path):
+    _write_shard(tmp_path / "shard-0",
+                 [(1, "img-000000.png"), (2, "img-000001.png")],
+                 [(1, 1, [0, 0, 1, 1]), (2, 1, [0, 0, 2, 2]),
+                  (3, 2, [0, 0, 3, 3])],
+                 [(1, 1, 2), (2, 3, 9)])
+    _write_shard(tmp_path / "shard-1",
+                 [(1, "img-000002.png"), (2, "img-000003.png")],
+                 [(1, 1, [1, 1, 1, 1]), (2, 1, [1, 1, 2, 2]),
+                  (3, 2, [1, 1, 3, 3])],
+                 [(1, 2, 1), (2, 3, 1)])
+    exporter = ExportGeomDataFactory.get_exporter(
+        GeometryOutputDataFormat.COCO, tmp_path / "merged")
+
+    exporter.merge_shards([tmp_path / "shard-0", tmp_path / "shard-1"])
+
+    with open(tmp_path / "merged" / "coco.json", "r") as fin:
+        coco_dict = json.load(fin)
+    with open(tmp_path / "merged" / "label_input_link.json", "r") as fin:
+        links = json.load(fin)["links"]
+    images = {image["id"]: image["file_name"]
+              for image in coco_dict["images"]}
+    annotations = {annotation["id"]: (annotation["image_id"],
+                                      annotation["bbox"])
+                   for annotation in coco_dict["annotations"]}
+    assert sorted(images) == [1, 2, 3, 4]
+    assert sorted(annotations) == [1, 2, 3, 4, 5, 6]
+
+    linked = [(images[link["image_id"]],
+               annotations.get(link["label_id"]),
+               annotations.get(link["input_id"])) for link in links]
+    assert linked[0] == ("img-000000.png", (1, [0, 0, 1, 1]),
+                         (1, [0, 0, 2, 2]))
+    assert linked[1][:2] == ("img-000001.png", (2, [0, 0, 3, 3]))
+    assert linked[2] == ("img-000002.png", (3, [1, 1, 2, 2]),
+                         (3, [1, 1, 1, 1]))
+    assert linked[3][:2] == ("img-000003.png", (4, [1, 1, 3, 3]))
+    # widget ids of widgets without an annotation
+    assert links[1]["input_id"] == 9
+    assert links[3]["input_id"] == 1
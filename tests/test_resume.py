@@ -0,0 +1,101 @@
+import json
+import tarfile
+
+from guigenerator.qt_guigen.export_data import ExportAttrDataFactory, \
+    ExportGeomDataFactory, ExportWidgetContentFactory
+from guigenerator.qt_guigen.packed_labels import PackedLabelReader, \
+    PackedLabelWriter
+from guigenerator.qt_guigen.run_manifest import RunManifest
+from guigenerator.qt_guigen.tar_shards import TarShardWriter
+from guigenerator.qt_guigen.widgets import AttributesDataFormat, \
+    GeometryOutputDataFormat, ValuesDataFormat
+
+
+def _create_exporters(dir_path):
+    return [ExportGeomDataFactory.get_exporter(
+                GeometryOutputDataFormat.YOLO, dir_path),
+            ExportGeomDataFactory.get_exporter(
+                GeometryOutputDataFormat.COCO, dir_path),
+            ExportAttrDataFactory.get_exporter(
+                AttributesDataFormat.CSV, dir_path),
+            ExportWidgetContentFactory.get_exporter(
+                ValuesDataFormat.CSV, dir_path)]
+
+
+# a run that crashed during its first item leaves a manifest with the
+# header only, resuming it starts the exporters afresh
+def test_resume_from_header_only_manifest(tmp_path):
+    manifest_path = tmp_path / "run_manifest.json"
+    manifest = RunManifest(manifest_path)
+    manifest.start(range(3), 123)
+    manifest.close()
+
+    manifest = RunManifest(manifest_path)
+    manifest.load(range(3))
+    assert manifest.exporter_states == {}
+    assert not manifest.is_item_done(0)
+
+    for exporter in _create_exporters(tmp_path):
+        exporter.restore_state(manifest.exporter_states.get(
+            type(exporter).__name__, {}))
+        exporter.begin()
+        exporter.finish()
+    manifest.close()
+
+    with open(tmp_path / "coco.json", "r") as fin:
+        coco_dict = json.load(fin)
+    assert coco_dict["images"] == []
+    assert coco_dict["annotations"] == []
+
+
+# a run that crashed after starting more shards than its last recorded
+# item used leaves them behind, resuming it must not keep their samples
+def test_tar_shards_resume_drops_later_shards(tmp_path):
+    members = [("png", bytes(600)), ("json", b"{}")]
+    writer = TarShardWriter(tmp_path, "shard", 4 * tarfile.BLOCKSIZE)
+    writer.open()
+    writer.write("img-000000", members)
+    writer.flush()
+    state = writer.get_state()
+    for item in range(1, 4):
+        writer.write(f"img-{item:06d}", members)
+    writer.close()
+    assert len(list(tmp_path.glob("shard-*.tar"))) == 4
+
+    writer = TarShardWriter(tmp_path, "shard", 4 * tarfile.BLOCKSIZE)
+    writer.open(state)
+    writer.write("img-000001", members)
+    writer.close()
+
+    names = []
+    for shard_path in sorted(tmp_path.glob("shard-*.tar")):
+        with tarfile.open(shard_path) as tar:
+            names += tar.getnames()
+    assert names == ["img-000000.png", "img-000000.json",
+                     "img-000001.png", "img-000001.json"]
+
+
+def test_packed_labels_resume_drops_later_shards(tmp_path):
+    writer = PackedLabelWriter(tmp_path, "labels", 2)
+    writer.open()
+    for item in range(3):
+        writer.write(f"img-{item:06d}", f"0 {item} 0 1 1\n")
+    writer.flush()
+    state = writer.get_state()
+    for item in range(3, 6):
+        writer.write(f"img-{item:06d}", f"0 {item} 0 1 1\n")
+    writer.close()
+    assert len(list(tmp_path.glob("labels-*.pack"))) == 3
+
+    writer = PackedLabelWriter(tmp_path, "labels", 2)
+    writer.open(state)
+    writer.write("img-000003", "1 3 0 1 1\n")
+    writer.close()
+
+    assert sorted(path.name for path in tmp_path.glob("labels-*.pack")) \
+        == ["labels-00000.pack", "labels-00001.pack"]
+    reader = PackedLabelReader(tmp_path, "labels")
+    assert reader.get_stems() == [f"img-{item:06d}" for item in range(4)]
+    assert reader.read("img-000003") == "1 3 0 1 1\n"
+    assert len(PackedLabelReader.read_index(
+        PackedLabelWriter.get_index_path(tmp_path, "labels"))) == 4
@@ -0,0 +1,269 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from guigenerator.http_requests import HTTPConnectionPool
+from guigenerator.qt_guigen.text_corpus import TextCorpusCache, \
+    TextCorpusManager, TextKind
+
+
+# Stand-in of the text website. A request of a text type takes the next
+# action of the type: "ok" answers with the texts, "drop" closes the
+# connection without an answer, a number answers with that status. The
+# server records the time, type and client port of every request and the
+# most requests it served at once.
+class _TextHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlparse(self.path).query)
+        text_type = query["type"][0]
+        with server.lock:
+            server.requests.append(
+                (time.monotonic(), text_type, self.client_address[1]))
+            actions = server.actions.get(text_type, [])
+            action = actions.pop(0) if actions else "ok"
+            server.n_active += 1
+            server.max_active = max(server.max_active, server.n_active)
+        try:
+            time.sleep(server.delay)
+            if action == "drop":
+                self.close_connection = True
+                return
+            if action == "ok":
+                status = 200
+                body = json.dumps({"text": server.texts[text_type]})
+            else:
+                status = action
+                body = "{}"
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with server.lock:
+                server.n_active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def text_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TextHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.texts = {"sentence": "One. Two. One",
+                    "title": "Title",
+                    "paragraph": "Paragraph"}
+    server.actions = {}
+    server.requests = []
+    server.delay = 0.0
+    server.n_active = 0
+    server.max_active = 0
+    server.address = f"127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def corpus_manager(monkeypatch):
+    # one request of every kind, fetched one after another
+    monkeypatch.setattr(TextCorpusManager, "REQUEST_COUNT", 1)
+    monkeypatch.setattr(TextCorpusManager, "TEXTS_PER_REQUEST", 3)
+    monkeypatch.setattr(TextCorpusManager, "FETCH_ATTEMPTS", 3)
+    monkeypatch.setattr(TextCorpusManager, "FETCH_RETRY_DELAY", 0.1)
+    monkeypatch.setattr(TextCorpusManager, "REQUEST_TIMEOUT", 5.0)
+    monkeypatch.setattr(TextCorpusManager, "FETCH_CONNECTIONS", 1)
+    monkeypatch.setattr(TextCorpusManager, "REQUESTS_PER_SECOND", 0.0)
+    return TextCorpusManager
+
+
+def _get_request_times(server, text_type):
+    return [request_time for request_time, request_type, _
+            in server.requests if request_type == text_type]
+
+
+def _request_from_threads(pool, n_requests):
+    threads = [threading.Thread(target=pool.get_request,
+                                args=("type=sentence",))
+               for _ in range(n_requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_refresh_retries_with_backoff(text_server, corpus_manager,
+                                      tmp_path):
+    text_server.actions = {"title": [500, "drop"]}
+
+    corpus_manager.refresh(text_server.address, False,
+                           tmp_path / "corpus.bin")
+
+    first, second, third = _get_request_times(text_server, "title")
+    assert second - first >= 0.1
+    assert third - second >= 0.2
+    cache = TextCorpusCache(tmp_path / "corpus.bin")
+    assert cache.get_texts(TextKind.TITLE) == ["Title"]
+    cache.close()
+
+
+def test_refresh_fails_after_last_attempt(text_server, corpus_manager,
+                                          tmp_path):
+    text_server.actions = {"paragraph": [503, "drop", 503]}
+
+    with pytest.raises(RuntimeError, match="Can not fetch"):
+        corpus_manager.refresh(text_server.address, False,
+                               tmp_path / "corpus.bin")
+    assert len(_get_request_times(text_server, "paragraph")) == 3
+    assert not (tmp_path / "corpus.bin").exists()
+
+
+def test_refresh_keeps_every_text_once(text_server, corpus_manager,
+                                       tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_manager, "REQUEST_COUNT", 3)
+    monkeypatch.setattr(corpus_manager, "FETCH_CONNECTIONS", 4)
+
+    counts = corpus_manager.refresh(text_server.address, False,
+                                    tmp_path / "corpus.bin")
+
+    cache = TextCorpusCache(tmp_path / "corpus.bin")
+    assert cache.get_texts(TextKind.SENTENCE) == ["One", "Two"]
+    assert cache.get_texts(TextKind.TITLE) == ["Title"]
+    assert cache.get_texts(TextKind.PARAGRAPH) == ["Paragraph"]
+    cache.close()
+    assert counts[TextKind.SENTENCE] == 2
+
+
+def test_pool_opens_at_most_max_connections(text_server):
+    text_server.delay = 0.1
+    pool = HTTPConnectionPool(text_server.address, False, 5.0,
+                              max_connections=2)
+
+    _request_from_threads(pool, 6)
+    pool.close()
+
+    assert len(text_server.requests) == 6
+    assert text_server.max_active == 2
+    # the connections are kept alive and reused
+    assert len({port for _, _, port in text_server.requests}) == 2
+
+
+def test_pool_limits_request_rate(text_server):
+    pool = HTTPConnectionPool(text_server.address, False, 5.0,
+                              max_connections=4, requests_per_second=20)
+
+    _request_from_threads(pool, 6)
+    pool.close()
+
+    request_times = sorted(_get_request_times(text_server, "sentence"))
+    assert len(request_times) == 6
+    # 5 intervals of 50 ms, less a little for the scheduling of the
+    # server threads
+    assert request_times[-1] - request_times[0] >= 0.22
+
+
+def test_refresh_writes_every_kind(text_server, corpus_manager, tmp_path):
+    text_server.texts["sentence"] = "One, two. Two. One"
+
+    counts = corpus_manager.refresh(text_server.address, False,
+                                    tmp_path / "corpus.bin")
+
+    cache = TextCorpusCache(tmp_path / "corpus.bin")
+    assert cache.source == text_server.address
+    assert cache.get_texts(TextKind.SENTENCE) == ["One, two", "Two", "One"]
+    # the words of the sentences, without punctuation
+    assert cache.get_texts(TextKind.WORD) == ["One", "two", "Two", "One"]
+    assert counts == {kind: len(cache.get_texts(kind)) for kind in TextKind}
+    cache.close()
+
+
+def test_missing_cache_is_fetched(text_server, corpus_manager, tmp_path,
+                                  monkeypatch):
+    monkeypatch.setattr(corpus_manager, "CACHE_PATH",
+                        tmp_path / "cache" / "corpus.bin")
+    monkeypatch.setattr(corpus_manager, "_TextCorpusManager__cache", None)
+    monkeypatch.setattr(corpus_manager, "WEBSITE", text_server.address)
+    monkeypatch.setattr(corpus_manager, "USE_HTTPS", False)
+    monkeypatch.setattr(corpus_manager, "REFRESH_IF_MISSING", True)
+
+    cache = corpus_manager.get_cache()
+
+    assert cache.get_texts(TextKind.TITLE) == ["Title"]
+    assert corpus_manager.get_cache() is cache
+    n_requests = len(text_server.requests)
+    corpus_manager.refresh()
+    assert len(text_server.requests) > n_requests
+    assert corpus_manager.get_cache() is not cache
+    corpus_manager.get_cache().close()
+
+
+def test_missing_cache_without_refresh(corpus_manager, tmp_path,
+                                       monkeypatch):
+    monkeypatch.setattr(corpus_manager, "CACHE_PATH",
+                        tmp_path / "corpus.bin")
+    monkeypatch.setattr(corpus_manager, "_TextCorpusManager__cache", None)
+    monkeypatch.setattr(corpus_manager, "REFRESH_IF_MISSING", False)
+
+    with pytest.raises(RuntimeError, match="is missing"):
+        corpus_manager.get_cache()
+
+
+def _write_corpus(path):
+    TextCorpusCache.write(path, {TextKind.SENTENCE: ["One", "T\0wo"],
+                                 TextKind.TITLE: [],
+                                 TextKind.WORD: ["Один", "Два"]},
+                          "tests")
+
+
+def test_cache_is_reloaded(tmp_path):
+    _write_corpus(tmp_path / "corpus.bin")
+
+    cache = TextCorpusCache(tmp_path / "corpus.bin")
+    assert cache.source == "tests"
+    assert cache.get_texts(TextKind.SENTENCE) == ["One", "Two"]
+    assert cache.get_texts(TextKind.TITLE) == []
+    assert cache.get_texts(TextKind.WORD) == ["Один", "Два"]
+    with pytest.raises(RuntimeError, match="no paragraph texts"):
+        cache.get_texts(TextKind.PARAGRAPH)
+    cache.close()
+    assert not (tmp_path / "corpus.bin.tmp").exists()
+
+
+@pytest.mark.parametrize("offset, data, message", [
+    (0, b"XXXX", "not a text corpus"),
+    (4, (TextCorpusCache.VERSION + 1).to_bytes(4, "little"), "version"),
+    (12, b"[", "corrupt"),
+    (-8, b"\xff" * 8, "corrupt")])
+def test_cache_rejects_bad_file(tmp_path, offset, data, message):
+    path = tmp_path / "corpus.bin"
+    _write_corpus(path)
+    content = bytearray(path.read_bytes())
+    content[offset:offset + len(data) if offset >= 0 else None] = data
+    path.write_bytes(bytes(content))
+
+    with pytest.raises(RuntimeError, match=message):
+        cache = TextCorpusCache(path)
+        cache.get_texts(TextKind.WORD)
+        cache.close()
+
+
+@pytest.mark.parametrize("size, message", [(0, "empty"), (6, "truncated")])
+def test_cache_rejects_short_file(tmp_path, size, message):
+    path = tmp_path / "corpus.bin"
+    _write_corpus(path)
+    path.write_bytes(path.read_bytes()[:size])
+
+    with pytest.raises(RuntimeError, match=message):
+        TextCorpusCache(path)
@@ -0,0 +1,180 @@
+import json
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from guigenerator.tree_guigen.gui_tree_gen import Node, Tree, \
+    TreeGeneration
+from guigenerator.tree_guigen.tree_batch import BatchTreeGeneration, \
+    TreeBatch
+from guigenerator.utils import Utils
+
+DESCRIPTION_PATHS = [
+    Utils.PROJ_ROOT_DIR / "config/tree_widgets_description.json",
+    Utils.PROJ_ROOT_DIR / "config/tree_widgets_description_qt.json"]
+
+# a grammar with nested containers, a solo widget and a container taking
+# only one widget child
+_TEST_WIDGETS = [
+    {"_name": "Window", "_container": True, "_prob": 0.0,
+     "_accept_list": ["Box", "Tabs", "StatusBar", "Button"]},
+    {"_name": "Box", "_container": True, "_prob": 0.2,
+     "_accept_list": ["Box", "Button", "Label"]},
+    {"_name": "Tabs", "_container": True, "_prob": 0.1,
+     "_has_only_child": True, "_accept_list": ["Tab"]},
+    {"_name": "Tab", "_container": False, "_prob": 0.2},
+    {"_name": "StatusBar", "_container": False, "_prob": 0.05,
+     "_solo": True},
+    {"_name": "Button", "_container": False, "_prob": 0.4},
+    {"_name": "Label", "_container": False, "_prob": 0.2}]
+
+
+@pytest.fixture(params=[None] + DESCRIPTION_PATHS,
+                ids=["test"] + [path.stem for path in DESCRIPTION_PATHS])
+def description_path(request, tmp_path):
+    if request.param is None:
+        path = tmp_path / "tree_widgets_description.json"
+        path.write_text(json.dumps(_TEST_WIDGETS))
+        return str(path)
+    return str(request.param)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # several chunks, the last one partial
+    monkeypatch.setattr(BatchTreeGeneration, "CHUNK_SIZE", 64)
+
+
+def _generate(description_path, seed=7):
+    return BatchTreeGeneration.generate(300, (1, 40), description_path,
+                                        seed)
+
+
+def _get_children(parents):
+    children = {index: [] for index in range(len(parents))}
+    for child, parent in enumerate(parents.tolist()):
+        if parent >= 0:
+            children[parent].append(child)
+    return children
+
+
+def _to_nested(node_dto):
+    return node_dto.name, [_to_nested(child) for child in node_dto.children]
+
+
+def test_nodes_are_in_preorder(description_path, small_chunks):
+    trees = _generate(description_path)
+
+    assert len(trees) == 300
+    for tree_index in range(len(trees)):
+        parents = trees.get_parents(tree_index).tolist()
+        assert parents[0] == -1
+        for child in range(1, len(parents)):
+            assert 0 <= parents[child] < child
+            # the parent is the previous node or one of its ancestors
+            ancestor = child - 1
+            while ancestor != parents[child]:
+                ancestor = parents[ancestor]
+                assert ancestor >= 0
+
+
+def test_links_are_allowed_by_grammar(description_path, small_chunks):
+    grammar = TreeGeneration.get_widget_grammar(description_path)
+    widgets = {widget.name: widget for widget in grammar.widgets}
+    trees = _generate(description_path)
+
+    for tree_index in range(len(trees)):
+        names = [trees.widget_names[type_id] for type_id
+                 in trees.get_type_ids(tree_index).tolist()]
+        parents = trees.get_parents(tree_index).tolist()
+        assert names[0] == grammar.widgets[0].name
+        for child in range(1, len(names)):
+            parent_name = names[parents[child]]
+            assert widgets[parent_name].is_container
+            assert grammar.can_be_parent_of(parent_name, names[child])
+
+
+def test_tree_limits_hold(description_path, small_chunks):
+    grammar = TreeGeneration.get_widget_grammar(description_path)
+    widgets = {widget.name: widget for widget in grammar.widgets}
+    trees = _generate(description_path)
+
+    for tree_index in range(len(trees)):
+        names = [trees.widget_names[type_id] for type_id
+                 in trees.get_type_ids(tree_index).tolist()]
+        parents = trees.get_parents(tree_index)
+        children = _get_children(parents)
+        assert 1 <= len(names) <= 40
+        for node, name in enumerate(names):
+            widget = widgets[name]
+            if not widget.is_container:
+                assert not children[node]
+            elif node:
+                # empty containers are removed, the root is kept
+                assert children[node]
+            if widget.has_only_child:
+                assert len(children[node]) <= 1
+        for name, count in Counter(names).items():
+            if widgets[name].is_solo:
+                assert count == 1
+
+
+def test_fixed_size_is_not_exceeded(description_path):
+    trees = BatchTreeGeneration.generate(100, 12, description_path, 3)
+
+    assert all(len(trees.get_type_ids(tree_index)) <= 12
+               for tree_index in range(len(trees)))
+
+
+def test_fixed_seed_gives_same_trees(description_path, small_chunks):
+    first = _generate(description_path, seed=11)
+    second = _generate(description_path, seed=11)
+    other = _generate(description_path, seed=12)
+
+    for tree_index in range(len(first)):
+        assert np.array_equal(first.get_type_ids(tree_index),
+                              second.get_type_ids(tree_index))
+        assert np.array_equal(first.get_parents(tree_index),
+                              second.get_parents(tree_index))
+    assert any(not np.array_equal(first.get_type_ids(tree_index),
+                                  other.get_type_ids(tree_index))
+               for tree_index in range(len(first)))
+
+
+def test_as_dto_matches_node_tree(description_path):
+    grammar = TreeGeneration.get_widget_grammar(description_path)
+    trees = BatchTreeGeneration.generate(50, (1, 40), description_path, 5)
+
+    for tree_index in range(len(trees)):
+        # the same tree as Node objects, turned into a DTO by Tree
+        nodes = []
+        for type_id, parent in zip(
+                trees.get_type_ids(tree_index).tolist(),
+                trees.get_parents(tree_index).tolist()):
+            node = Node(grammar.widgets[type_id])
+            if parent >= 0:
+                nodes[parent].children.append(node)
+            nodes.append(node)
+        tree = Tree(grammar.widgets, 0, grammar)
+        tree._tree = nodes[0]
+
+        assert _to_nested(trees.as_dto(tree_index).root_node) \
+            == _to_nested(tree.as_dto().root_node)
+
+
+def test_saved_batch_is_loaded(description_path, tmp_path):
+    trees = BatchTreeGeneration.generate(20, (1, 40), description_path, 9)
+    trees.save(tmp_path / "trees.npz")
+
+    loaded = TreeBatch.load(tmp_path / "trees.npz")
+    assert loaded.widget_names == trees.widget_names
+    for tree_index in range(len(trees)):
+        assert _to_nested(loaded.as_dto(tree_index).root_node) \
+            == _to_nested(trees.as_dto(tree_index).root_node)
+
+
+def test_no_trees(description_path):
+    trees = BatchTreeGeneration.generate(0, 10, description_path, 1)
+
+    assert len(trees) == 0
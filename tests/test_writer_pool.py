@@ -0,0 +1,28 @@
+from threading import Event
+
+import pytest
+
+from guigenerator.qt_guigen.writer_pool import BackgroundWriterPool
+
+
+def _fail():
+    raise OSError("disk full")
+
+
+# an item must not be recorded after a failed one, a resumed run would
+# generate the failed item again after it
+def test_ordered_tasks_after_failure_are_skipped():
+    recorded = []
+    # the tasks are queued before the first one runs
+    is_queued = Event()
+    writer_pool = BackgroundWriterPool(2, 8)
+    writer_pool.submit_ordered(is_queued.wait)
+    writer_pool.submit_ordered(recorded.append, 0)
+    writer_pool.submit_ordered(_fail)
+    writer_pool.submit_ordered(recorded.append, 2)
+    writer_pool.submit_ordered(recorded.append, 3)
+    is_queued.set()
+
+    with pytest.raises(RuntimeError):
+        writer_pool.close()
+    assert recorded == [0]